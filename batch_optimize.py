@@ -0,0 +1,210 @@
+"""요구사항 명세 파일 일괄 최적화
+
+JSONL 또는 CSV 파일의 명세(service_type, users, performance, additional_info, budget, region)를
+HTTP 없이 AWSOptimizer 로 직접 실행하고, 끝나는 대로 결과를 JSONL 로 기록합니다.
+
+    python3 batch_optimize.py specs.jsonl --output results.jsonl --concurrency 8
+    python3 batch_optimize.py specs.csv --output results.jsonl            # 같은 명령을 다시 실행하면 완료된 항목은 건너뜀
+
+- 같은 명세(예산 포함)는 한 번만 실행하고 결과를 해당하는 모든 항목에 기록합니다.
+- 예산만 다른 명세는 1, 2단계(서비스 목록/가격 조회) 결과를 공유합니다.
+- 출력 파일이 체크포인트입니다: 이미 completed 로 기록된 id 는 다시 실행하지 않습니다 (failed 는 재시도).
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SPEC_FIELDS = ['service_type', 'users', 'performance', 'additional_info', 'budget', 'region']
+SPEC_DEFAULTS = {'service_type': '', 'users': '소규모', 'performance': '기본', 'additional_info': '', 'budget': 100, 'region': 'us-east-1'}
+
+logger = logging.getLogger('clops.batch')
+
+def read_specs(path):
+    """입력 파일에서 (id, 원본 레코드, 오류) 목록 읽기 (id 열이 없으면 줄 번호)
+
+    JSON 으로 읽을 수 없거나 객체가 아닌 줄은 실행을 멈추지 않고 오류 메시지와 함께 반환 (결과에는 failed 로 기록)
+    """
+    records = []
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = csv.DictReader(f)
+            for number, row in enumerate(rows, start=1):
+                records.append((row.get('id') or f'line-{number}', row, None))
+        else:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    records.append((f'line-{number}', line.strip(), f'invalid JSON: {e}'))
+                    continue
+                if not isinstance(row, dict):
+                    records.append((f'line-{number}', row, 'invalid spec: expected a JSON object'))
+                    continue
+                records.append((str(row.get('id') or f'line-{number}'), row, None))
+    return records
+
+def normalize_spec(row):
+    """입력 레코드를 /optimize 요청과 같은 기본값/형식의 명세로 변환"""
+    spec = {field: row.get(field) if row.get(field) not in (None, '') else SPEC_DEFAULTS[field] for field in SPEC_FIELDS}
+    spec['budget'] = float(spec['budget'])
+    return spec
+
+def spec_key(spec):
+    raw = json.dumps(spec, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def load_checkpoint(path):
+    """출력 파일에서 완료된 id 집합 읽기 (마지막 줄이 잘린 경우 무시)"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('status') == 'completed':
+                done.add(entry['id'])
+    return done
+
+class BatchRunner:
+    """고유 명세별 작업을 제한된 동시성으로 실행하고 결과를 JSONL 로 스트리밍"""
+    def __init__(self, backend, output, concurrency=8, timeout=600):
+        self.backend = backend
+        self.output = output
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.write_lock = threading.Lock()
+        self.prepared = {}  # 1, 2단계 입력 해시 -> Future(priced_services)
+        self.prepared_lock = threading.Lock()
+        self.counts = {'completed': 0, 'failed': 0}
+
+    def priced_services(self, spec):
+        """예산과 무관한 1, 2단계 결과를 입력 해시별로 한 번만 계산 (먼저 온 작업이 계산하고 나머지는 대기)"""
+        input_hash = self.backend.artifact_input_hash(spec)
+        with self.prepared_lock:
+            future = self.prepared.get(input_hash)
+            owner = future is None
+            if owner:
+                future = self.prepared[input_hash] = Future()
+        if not owner:
+            return future.result()
+
+        try:
+            priced = self.backend.optimizer.prepare_priced_services(
+                spec['service_type'], spec['users'], spec['performance'], spec['additional_info'], spec['region'])
+        except Exception as e:
+            future.set_exception(e)
+            with self.prepared_lock:
+                self.prepared.pop(input_hash, None)  # 다음 작업이 다시 시도하도록
+            raise
+        future.set_result(priced)
+        return priced
+
+    def run_spec(self, spec, job_id):
+        backend = self.backend
+        deadline = backend.JobDeadline(f'batch-{job_id}', self.timeout)
+        backend.bind_deadline(deadline)
+        started = time.perf_counter()
+        try:
+            priced = self.priced_services(spec)
+            optimized_services, total_cost = backend.optimizer.plan_for_budget(
+                priced, spec['budget'], spec['service_type'], spec['users'], spec['performance'], spec['additional_info'], spec['region'])
+            result = backend.finalize_plan(optimized_services, total_cost, spec['budget'], spec['service_type'], spec['users'],
+                                           spec['performance'], spec['additional_info'], spec['region'])
+            if deadline.fallbacks:
+                result['deadline_fallbacks'] = deadline.fallbacks
+            return {'status': 'completed', 'result': result, 'elapsed': round(time.perf_counter() - started, 3)}
+        except Exception as e:
+            logger.warning("Batch spec %s failed: %s", job_id, e)
+            return {'status': 'failed', 'error': str(e), 'elapsed': round(time.perf_counter() - started, 3)}
+        finally:
+            backend.bind_deadline(None)
+
+    def write(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, default=str) + '\n'
+        with self.write_lock:
+            self.output.write(line)
+            self.output.flush()
+            self.counts[entry['status']] += 1
+
+    def run(self, groups):
+        """groups: [(명세, [id, ...])] 고유 명세별 작업 실행"""
+        # 먼저 기록한 잘못된 입력 줄도 진행률에 포함
+        total = sum(len(ids) for _, ids in groups) + self.counts['completed'] + self.counts['failed']
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self.run_spec, spec, ids[0]): (spec, ids) for spec, ids in groups}
+            for future in as_completed(futures):
+                spec, ids = futures[future]
+                outcome = future.result()
+                for job_id in ids:
+                    entry = {'id': job_id, 'spec': spec, **outcome}
+                    if job_id != ids[0]:
+                        entry['duplicate_of'] = ids[0]
+                    self.write(entry)
+                done = self.counts['completed'] + self.counts['failed']
+                logger.info("Batch progress %d/%d", done, total, extra={'fields': dict(self.counts)})
+        return self.counts
+
+def main():
+    parser = argparse.ArgumentParser(description='명세 파일(JSONL/CSV)을 일괄 최적화하여 JSONL 로 기록')
+    parser.add_argument('input', help='입력 파일 (.jsonl 또는 .csv)')
+    parser.add_argument('--output', '-o', required=True, help='결과 JSONL (이미 있으면 이어서 기록)')
+    parser.add_argument('--concurrency', type=int, default=8, help='동시에 실행할 고유 명세 수')
+    parser.add_argument('--timeout', type=int, default=600, help='명세별 마감 시간 (초)')
+    parser.add_argument('--limit', type=int, default=None, help='앞에서부터 이 개수만 처리')
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import imsi_new as backend
+
+    records = read_specs(args.input)[:args.limit]
+    done = load_checkpoint(args.output)
+
+    groups = {}
+    invalid = []
+    for job_id, row, error in records:
+        if job_id in done:
+            continue
+        if error:
+            invalid.append({'id': job_id, 'spec': row, 'status': 'failed', 'error': error})
+            continue
+        try:
+            spec = normalize_spec(row)
+        except (TypeError, ValueError) as e:
+            invalid.append({'id': job_id, 'spec': row, 'status': 'failed', 'error': f'invalid spec: {e}'})
+            continue
+        groups.setdefault(spec_key(spec), (spec, []))[1].append(job_id)
+
+    started = time.perf_counter()
+    with open(args.output, 'a', encoding='utf-8') as output:
+        runner = BatchRunner(backend, output, max(1, args.concurrency), args.timeout)
+        for entry in invalid:
+            runner.write(entry)
+        counts = runner.run(list(groups.values()))
+
+    summary = {
+        'input_records': len(records),
+        'skipped_completed': sum(1 for job_id, _, _ in records if job_id in done),
+        'unique_specs': len(groups),
+        'shared_step1_2': len(runner.prepared),
+        'completed': counts['completed'],
+        'failed': counts['failed'],
+        'elapsed_seconds': round(time.perf_counter() - started, 2)
+    }
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0 if counts['failed'] == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
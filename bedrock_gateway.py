@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.config import Config
+
+import metrics
+from bedrock_limiter import bedrock_limiter, invoke_model
+from job_deadline import current_deadline
+from local_backends import create_client
+from shared_cache import shared_store, SharedDict
+
+logger = logging.getLogger('clops.bedrock')
+
+# 공용 Bedrock 클라이언트 설정 (파이프라인 단계와 BedrockService 가 같은 클라이언트/제한기/실행기를 사용)
+BEDROCK_REGION = os.environ.get('BEDROCK_REGION', 'us-east-1')
+BEDROCK_POOL_CONNECTIONS = int(os.environ.get('BEDROCK_POOL_CONNECTIONS', 0))  # 0이면 동시 호출 상한(BEDROCK_MAX_CONCURRENCY)과 같게
+BEDROCK_CONNECT_TIMEOUT = float(os.environ.get('BEDROCK_CONNECT_TIMEOUT', 10))
+BEDROCK_READ_TIMEOUT = float(os.environ.get('BEDROCK_READ_TIMEOUT', 300))  # 긴 응답 생성 시간을 고려
+# SDK 자체 재시도 (1이면 재시도 없음): 스로틀링과 일시적 오류(연결/읽기 오류, 5xx)는 invoke_model 이 제한기를 거쳐
+# 백오프로 재시도하므로 SDK 가 다시 시도하면 호출이 겹침
+BEDROCK_SDK_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_SDK_MAX_ATTEMPTS', 1))
+BEDROCK_EXECUTOR_WORKERS = int(os.environ.get('BEDROCK_EXECUTOR_WORKERS', 4))  # 백그라운드 분석 작업 동시 실행 수
+BEDROCK_EXECUTOR_QUEUE = int(os.environ.get('BEDROCK_EXECUTOR_QUEUE', 32))  # 실행 대기 중인 분석 작업 상한
+BEDROCK_RESULT_TTL = int(os.environ.get('BEDROCK_RESULT_TTL', 3600))  # 분석 결과 보관 시간 (초)
+BEDROCK_RESPONSE_CACHE_TTL = int(os.environ.get('BEDROCK_RESPONSE_CACHE_TTL', 3600))  # 같은 요청 응답 재사용 시간 (0이면 사용 안 함)
+
+class BedrockGateway:
+    """프로세스 공용 Bedrock 호출 경로
+
+    - client: 연결 풀/타임아웃/재시도를 설정한 클라이언트 하나 (fork 된 프로세스에서는 새로 생성)
+    - invoke / invoke_text: 공용 동시성 제한기와 작업 마감 시간을 거쳐 호출, 호출자(caller)별 지표 기록
+    - submit: 백그라운드 작업을 크기가 제한된 실행기에서 실행하고 결과를 TTL 저장소에 기록
+    """
+    def __init__(self, region=BEDROCK_REGION, limiter=bedrock_limiter, pool_connections=BEDROCK_POOL_CONNECTIONS,
+                 connect_timeout=BEDROCK_CONNECT_TIMEOUT, read_timeout=BEDROCK_READ_TIMEOUT, sdk_max_attempts=BEDROCK_SDK_MAX_ATTEMPTS,
+                 max_workers=BEDROCK_EXECUTOR_WORKERS, max_queued=BEDROCK_EXECUTOR_QUEUE,
+                 result_ttl=BEDROCK_RESULT_TTL, response_cache_ttl=BEDROCK_RESPONSE_CACHE_TTL):
+        self.region = region
+        self.limiter = limiter
+        self.config = Config(
+            max_pool_connections=pool_connections or limiter.maximum,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            retries={'mode': 'standard', 'total_max_attempts': max(1, sdk_max_attempts)}
+        )
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.results = SharedDict(shared_store, 'bedrock_results', ttl=result_ttl, l1_ttl=0)
+        self.responses = SharedDict(shared_store, 'bedrock_responses', ttl=response_cache_ttl) if response_cache_ttl else None
+        self.lock = threading.Lock()
+        self._client = None
+        self._executor = None
+        self._pid = None
+        self.pending = 0
+
+    def _ensure_process(self):
+        """fork 된 프로세스에서는 부모의 클라이언트(연결 풀)와 실행기 스레드를 쓰지 않고 새로 만듦"""
+        if self._pid != os.getpid():
+            self._client = None
+            self._executor = None
+            self.pending = 0
+            self._pid = os.getpid()
+
+    def client(self):
+        with self.lock:
+            self._ensure_process()
+            if self._client is None:
+                self._client = create_client('bedrock-runtime', self.region, self.config)
+            return self._client
+
+    def reset(self):
+        """클라이언트를 다시 만들도록 비움 (테스트/설정 변경 시)"""
+        with self.lock:
+            self._client = None
+
+    def invoke(self, body, model_id, caller='pipeline', timeout=None):
+        """invoke_model 호출 (현재 스레드에 작업 마감 시간이 있으면 그 안에서, 없으면 timeout 안에서 대기/재시도)
+
+        슬롯 대기 중에 작업이 취소되면 실패가 아닌 취소로 기록되도록 JobCancelled
+        """
+        deadline = current_deadline()
+        with metrics.span('bedrock', operation='invoke_model', caller=caller):
+            try:
+                return invoke_model(
+                    self.client(),
+                    limiter=self.limiter,
+                    timeout=deadline.remaining() if deadline else timeout,
+                    abort=deadline.cancelled.is_set if deadline else None,
+                    modelId=model_id,
+                    body=body,
+                    contentType="application/json"
+                )
+            except TimeoutError:
+                if deadline:
+                    deadline.check()
+                raise
+
+    def invoke_text(self, prompt, model_id, max_tokens, temperature, caller='pipeline', cache=False, timeout=None):
+        """단일 사용자 메시지로 호출하고 응답 텍스트 반환 (cache=True 면 같은 요청의 응답을 공유 캐시에서 재사용)"""
+        body = json.dumps({
+            "messages": [{"role": "user", "content": [{"text": prompt}]}],
+            "inferenceConfig": {"max_new_tokens": max_tokens, "temperature": temperature}
+        })
+        cache_key = None
+        if cache and self.responses is not None:
+            cache_key = hashlib.sha256(f"{model_id}\n{body}".encode('utf-8')).hexdigest()
+            cached = self.responses.get(cache_key)
+            metrics.cache_result('bedrock_response', cached is not None)
+            if cached is not None:
+                return cached
+
+        response = self.invoke(body, model_id, caller=caller, timeout=timeout)
+        result = json.loads(response['body'].read())
+        text = result['output']['message']['content'][0]['text']
+        if cache_key:
+            self.responses[cache_key] = text
+        return text
+
+    def submit(self, request_uuid, task):
+        """task() 를 제한된 실행기에서 실행하고 결과를 request_uuid 로 기록 (대기 작업이 상한이면 failed 로 기록하고 False)"""
+        with self.lock:
+            self._ensure_process()
+            if self.pending >= self.max_workers + self.max_queued:
+                accepted = False
+            else:
+                accepted = True
+                self.pending += 1
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bedrock-task')
+            executor = self._executor
+
+        if not accepted:
+            logger.warning("Bedrock task queue full, rejecting %s", request_uuid)
+            metrics.failure('bedrock_queue')
+            self.results[request_uuid] = {'status': 'failed', 'error': 'Bedrock task queue is full'}
+            return False
+
+        self.results[request_uuid] = {'status': 'processing'}
+        executor.submit(self._run, request_uuid, task)
+        return True
+
+    def _run(self, request_uuid, task):
+        try:
+            self.results[request_uuid] = {'status': 'completed', 'result': task()}
+        except Exception as e:
+            logger.warning("Bedrock task %s failed: %s", request_uuid, e)
+            self.results[request_uuid] = {'status': 'failed', 'error': str(e)}
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def get_result(self, request_uuid):
+        return self.results.get(request_uuid, {'status': 'not_found'})
+
+    def stats(self):
+        with self.lock:
+            pending = self.pending if self._pid == os.getpid() else 0
+        return {
+            'tasks_pending': pending,
+            'tasks_capacity': self.max_workers + self.max_queued,
+            'pool_connections': self.config.max_pool_connections,
+            'limiter': self.limiter.stats()
+        }
+
+bedrock_gateway = BedrockGateway()
@@ -0,0 +1,114 @@
+import logging
+import os
+import random
+import threading
+import time
+from botocore.exceptions import BotoCoreError, ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
+
+THROTTLING_CODES = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException'
+}
+# 동시성을 줄이지 않고 그대로 다시 시도하는 일시적 오류 (5xx 응답, 연결 실패/끊김, 읽기 타임아웃)
+TRANSIENT_CODES = {'InternalServerException', 'ModelTimeoutException'}
+TRANSIENT_ERRORS = (BotoConnectionError, HTTPClientError)
+
+logger = logging.getLogger('clops.bedrock')
+
+class AdaptiveLimiter:
+    """AIMD 방식의 동시 실행 제한: 성공 시 조금씩 늘리고, 스로틀링 시 절반으로 줄임"""
+    def __init__(self, initial=4, minimum=1, maximum=16):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.waiting = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, timeout=None, abort=None):
+        """슬롯이 빌 때까지 대기 (timeout 초과 또는 abort()가 참이면 TimeoutError)"""
+        deadline = time.time() + timeout if timeout is not None else None
+        with self.condition:
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.time() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError('Timed out waiting for a Bedrock slot')
+                    if abort is not None and abort():
+                        raise TimeoutError('Aborted while waiting for a Bedrock slot')
+                    self.condition.wait(min(remaining, 1.0) if remaining is not None else 1.0)
+                self.in_flight += 1
+            finally:
+                self.waiting -= 1
+
+    def release(self, outcome='success'):
+        """outcome: 'success' (증가), 'throttled' (감소), 'error' (유지)"""
+        with self.condition:
+            self.in_flight -= 1
+            if outcome == 'throttled':
+                self.limit = max(self.minimum, self.limit / 2)
+            elif outcome == 'success':
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'waiting': self.waiting
+            }
+
+bedrock_limiter = AdaptiveLimiter(
+    initial=int(os.environ.get('BEDROCK_INITIAL_CONCURRENCY', 4)),
+    maximum=int(os.environ.get('BEDROCK_MAX_CONCURRENCY', 16))
+)
+BEDROCK_MAX_RETRIES = int(os.environ.get('BEDROCK_MAX_RETRIES', 5))
+BEDROCK_TRANSIENT_RETRIES = int(os.environ.get('BEDROCK_TRANSIENT_RETRIES', 2))  # 그중 일시적 오류 재시도 상한
+BEDROCK_BACKOFF_BASE = float(os.environ.get('BEDROCK_BACKOFF_BASE', 1.0))
+BEDROCK_BACKOFF_CAP = float(os.environ.get('BEDROCK_BACKOFF_CAP', 30.0))
+
+def retry_kind(error):
+    """'throttled' (동시성 감소 후 재시도), 'transient' (동시성 유지하고 재시도), None (재시도 안 함)"""
+    if isinstance(error, ClientError):
+        code = error.response.get('Error', {}).get('Code')
+        if code in THROTTLING_CODES:
+            return 'throttled'
+        status = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        return 'transient' if code in TRANSIENT_CODES or status >= 500 else None
+    return 'transient' if isinstance(error, TRANSIENT_ERRORS) else None
+
+def invoke_model(client, limiter=bedrock_limiter, max_retries=BEDROCK_MAX_RETRIES, timeout=None, abort=None,
+                 transient_retries=BEDROCK_TRANSIENT_RETRIES, **kwargs):
+    """제한기를 거쳐 invoke_model 호출, 스로틀링과 일시적 오류는 지터 백오프로 재시도 (timeout: 대기+재시도 총 한도)"""
+    give_up_at = time.time() + timeout if timeout is not None else None
+    transient_attempts = 0
+    for attempt in range(max_retries + 1):
+        limiter.acquire(give_up_at - time.time() if give_up_at is not None else None, abort)
+        outcome = 'error'
+        try:
+            response = client.invoke_model(**kwargs)
+            outcome = 'success'
+            return response
+        except (ClientError, BotoCoreError) as e:
+            kind = retry_kind(e)
+            if kind == 'throttled':
+                outcome = 'throttled'
+            elif kind == 'transient':
+                transient_attempts += 1
+            if kind is None or attempt == max_retries or transient_attempts > transient_retries:
+                raise
+            code = e.response.get('Error', {}).get('Code') if isinstance(e, ClientError) else e.__class__.__name__
+            reason = 'throttled' if kind == 'throttled' else f'failed ({code})'
+        finally:
+            limiter.release(outcome)
+
+        delay = random.uniform(0, min(BEDROCK_BACKOFF_CAP, BEDROCK_BACKOFF_BASE * 2 ** attempt))
+        if give_up_at is not None and time.time() + delay >= give_up_at:
+            raise TimeoutError('Bedrock retries exceeded the remaining time budget')
+        logger.warning("Bedrock %s (attempt %d/%d), retrying in %.1fs", reason, attempt + 1, max_retries + 1, delay)
+        time.sleep(delay)
@@ -1,19 +1,11 @@
-import boto3
-import json
-import threading
-import time
+import os
+from bedrock_gateway import bedrock_gateway
 
-class BedrockService:
-    def __init__(self, region='us-east-1'):
-        self.client = boto3.client("bedrock-runtime", region_name=region)
-        self.results = {}
-    
-    def analyze_aws_requirements(self, prompt, request_uuid):
-        """백그라운드에서 Bedrock 분석 실행"""
-        def run_analysis():
-            try:
-                # AWS 서비스 추천을 위한 시스템 프롬프트 추가
-                system_prompt = """당신은 AWS 클라우드 아키텍트입니다. 사용자의 요구사항을 분석하여 최적의 AWS 서비스 구성을 추천해주세요.
+ANALYSIS_MODEL_ID = "amazon.nova-premier-v1:0"
+ANALYSIS_TIMEOUT = int(os.environ.get('BEDROCK_ANALYSIS_TIMEOUT', 300))  # 분석 1건의 대기+재시도 총 한도 (초)
+
+# AWS 서비스 추천을 위한 시스템 프롬프트
+ANALYSIS_SYSTEM_PROMPT = """당신은 AWS 클라우드 아키텍트입니다. 사용자의 요구사항을 분석하여 최적의 AWS 서비스 구성을 추천해주세요.
 
 응답 형식:
 1. 추천 서비스 구성
@@ -22,49 +14,27 @@ class BedrockService:
 4. 비용 최적화 팁
 
 구체적이고 실용적인 조언을 제공해주세요."""
-                
-                body = json.dumps({
-                    "messages": [
-                        {
-                            "role": "user", 
-                            "content": [
-                                {"text": f"{system_prompt}\n\n{prompt}"}
-                            ]
-                        }
-                    ],
-                    "inferenceConfig": {
-                        "max_new_tokens": 1000,
-                        "temperature": 0.3
-                    }
-                })
-                
-                response = self.client.invoke_model(
-                    modelId="amazon.nova-premier-v1:0",
-                    body=body,
-                    contentType="application/json"
-                )
-                
-                result = json.loads(response['body'].read())
-                ai_response = result['output']['message']['content'][0]['text']
-                
-                self.results[request_uuid] = {
-                    'status': 'completed',
-                    'result': ai_response
-                }
-                
-            except Exception as e:
-                self.results[request_uuid] = {
-                    'status': 'failed',
-                    'error': str(e)
-                }
-        
-        # 백그라운드 스레드에서 실행
-        thread = threading.Thread(target=run_analysis)
-        thread.start()
-        
-        # 초기 상태 설정
-        self.results[request_uuid] = {'status': 'processing'}
-    
+
+class BedrockService:
+    """요구사항 분석: 파이프라인과 같은 Bedrock 게이트웨이(클라이언트/동시성 제한기/제한된 실행기/결과 저장소)를 사용"""
+    def __init__(self, gateway=bedrock_gateway):
+        self.gateway = gateway
+
+    def analyze_aws_requirements(self, prompt, request_uuid):
+        """백그라운드에서 Bedrock 분석 실행 (실행 대기열이 가득 차면 failed 로 기록하고 False)"""
+        def run_analysis():
+            return self.gateway.invoke_text(
+                f"{ANALYSIS_SYSTEM_PROMPT}\n\n{prompt}",
+                ANALYSIS_MODEL_ID,
+                max_tokens=1000,
+                temperature=0.3,
+                caller='analysis',
+                cache=True,
+                timeout=ANALYSIS_TIMEOUT
+            )
+
+        return self.gateway.submit(request_uuid, run_analysis)
+
     def get_result(self, request_uuid):
         """결과 조회"""
-        return self.results.get(request_uuid, {'status': 'not_found'})
\ No newline at end of file
+        return self.gateway.get_result(request_uuid)
@@ -0,0 +1,269 @@
+"""최적화 파이프라인 종단간 벤치마크
+
+기본은 가짜 AWS 백엔드(CLOPS_BACKEND=local)로 백엔드/프론트 서버를 프로세스 안에서 띄우고
+/optimize 요청 후 /status 를 폴링하는 작업을 지정한 동시성으로 실행합니다.
+
+    python3 benchmark.py --jobs 50 --concurrency 8 --via both --output bench.json
+    python3 benchmark.py --backend-url http://host:5000 --front-url http://host:8080   # 실행 중인 서버 대상
+    python3 benchmark.py --compare bench-before.json bench-after.json
+"""
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+TERMINAL_STATUSES = ('completed', 'failed', 'cancelled', 'archived')
+
+DEFAULT_MIX = [
+    {'weight': 5, 'request': {'service_type': '웹 게임 서버', 'users': '10000', 'performance': '높음', 'additional_info': '', 'budget': 500, 'region': 'us-east-1'}},
+    {'weight': 3, 'request': {'service_type': '블로그', 'users': '1000', 'performance': '보통', 'additional_info': '이미지 위주', 'budget': 100, 'region': 'ap-northeast-2'}},
+    {'weight': 2, 'request': {'service_type': '모바일 API', 'users': '50000', 'performance': '높음', 'additional_info': '', 'budget': 50, 'region': 'us-west-2'}}
+]
+
+def percentiles(values, points=(50, 90, 99)):
+    if not values:
+        return {f'p{p}': None for p in points} | {'mean': None, 'max': None, 'count': 0}
+    ordered = sorted(values)
+    result = {f'p{p}': round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 4) for p in points}
+    result.update({'mean': round(sum(ordered) / len(ordered), 4), 'max': round(ordered[-1], 4), 'count': len(ordered)})
+    return result
+
+def rss_bytes():
+    """현재 프로세스 RSS (리눅스 /proc 기준, 없으면 None)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
+
+def scrape_counts(backend_url, metric='clops_span_seconds_count'):
+    """백엔드 /metrics 에서 kind/operation 별 span 횟수 수집"""
+    counts = {}
+    try:
+        text = requests.get(f'{backend_url}/metrics', timeout=5).text
+    except requests.RequestException:
+        return counts
+    for line in text.splitlines():
+        if not line.startswith(metric + '{'):
+            continue
+        labels, value = line[len(metric) + 1:].rsplit('} ', 1)
+        parsed = dict(part.split('=', 1) for part in labels.split(','))
+        key = (parsed.get('kind', '').strip('"'), parsed.get('operation', parsed.get('stage', '')).strip('"'))
+        counts[key] = counts.get(key, 0) + float(value)
+    return counts
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def serve(app, port):
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def start_local_servers(args):
+    """가짜 AWS 백엔드로 백엔드와 프론트를 프로세스 안에서 실행"""
+    os.environ.setdefault('CLOPS_BACKEND', 'local')
+    os.environ.setdefault('LOCAL_DB_PATH', os.path.join(tempfile.mkdtemp(prefix='clops-bench-'), 'bench.db'))
+    os.environ.setdefault('LOCAL_BEDROCK_LATENCY', str(args.bedrock_latency))
+    os.environ.setdefault('LOCAL_PRICING_LATENCY', str(args.pricing_latency))
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    sys.path.insert(0, ROOT)
+
+    import imsi_new
+    imsi_new.init_db()
+    if imsi_new.JOB_QUEUE_ENABLED:
+        imsi_new.job_queue.start()
+    backend_url = f'http://127.0.0.1:{free_port()}'
+    serve(imsi_new.app, int(backend_url.rsplit(':', 1)[1]))
+
+    spec = importlib.util.spec_from_file_location('clops_front', os.path.join(ROOT, 'front', 'app.py'))
+    front = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(front)
+    front.BACKEND_URL = backend_url
+    front_url = f'http://127.0.0.1:{free_port()}'
+    serve(front.app, int(front_url.rsplit(':', 1)[1]))
+    return backend_url, front_url
+
+def load_mix(path):
+    if not path:
+        return DEFAULT_MIX
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def run_job(base_url, backend_url, payload, poll_interval, timeout):
+    """요청 1건 제출 후 종료 상태까지 폴링, 단계별 소요 시간은 이벤트 이력에서 수집"""
+    session = requests.Session()
+    started = time.perf_counter()
+    response = session.post(f'{base_url}/optimize', json=payload, timeout=30)
+    submit_latency = time.perf_counter() - started
+    request_uuid = response.json().get('uuid')
+    if not request_uuid:
+        return {'status': 'submit_failed', 'submit_latency': submit_latency, 'latency': submit_latency, 'polls': 0, 'steps': {}}
+
+    polls = 0
+    status = None
+    while time.perf_counter() - started < timeout:
+        polls += 1
+        status = session.get(f'{base_url}/status/{request_uuid}', timeout=30).json().get('status')
+        if status in TERMINAL_STATUSES:
+            break
+        time.sleep(poll_interval)
+    latency = time.perf_counter() - started
+
+    steps = {}
+    try:
+        events = session.get(f'{backend_url}/status/{request_uuid}/events', timeout=30).json().get('events', [])
+        for event in events:
+            duration = (event.get('payload') or {}).get('duration')
+            if duration is not None:
+                steps[event['step']] = duration
+    except (requests.RequestException, ValueError):
+        pass
+
+    return {'status': status if status in TERMINAL_STATUSES else 'timeout', 'submit_latency': submit_latency,
+            'latency': latency, 'polls': polls, 'steps': steps}
+
+def run_scenario(name, base_url, backend_url, mix, args):
+    rng = random.Random(args.seed)
+    weights = [entry.get('weight', 1) for entry in mix]
+    payloads = [rng.choices(mix, weights)[0]['request'] for _ in range(args.jobs)]
+
+    before_counts = scrape_counts(backend_url)
+    rss_before = rss_bytes()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(
+            lambda payload: run_job(base_url, backend_url, payload, args.poll_interval, args.timeout), payloads
+        ))
+    elapsed = time.perf_counter() - started
+    rss_after = rss_bytes()
+    after_counts = scrape_counts(backend_url)
+
+    deltas = {key: after_counts.get(key, 0) - before_counts.get(key, 0) for key in after_counts}
+    db_operations = {op: round(count / args.jobs, 2) for (kind, op), count in sorted(deltas.items()) if kind == 'db' and count}
+    external_calls = {f'{kind}.{op}': round(count / args.jobs, 2) for (kind, op), count in sorted(deltas.items())
+                      if kind in ('bedrock', 'pricing') and count}
+
+    step_names = sorted({step for result in results for step in result['steps']})
+    statuses = {}
+    for result in results:
+        statuses[result['status']] = statuses.get(result['status'], 0) + 1
+
+    return {
+        'scenario': name,
+        'jobs': args.jobs,
+        'concurrency': args.concurrency,
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_jobs_per_second': round(args.jobs / elapsed, 3) if elapsed else None,
+        'statuses': statuses,
+        'job_latency': percentiles([r['latency'] for r in results if r['status'] == 'completed']),
+        'submit_latency': percentiles([r['submit_latency'] for r in results]),
+        'polls_per_job': percentiles([r['polls'] for r in results]),
+        'step_latency': {step: percentiles([r['steps'][step] for r in results if step in r['steps']]) for step in step_names},
+        'db_connections_per_job': db_operations.pop('connect', 0),
+        'db_round_trips_per_job': round(sum(db_operations.values()), 2),
+        'db_operations_per_job': db_operations,
+        'external_calls_per_job': external_calls,
+        'rss_bytes': {'before': rss_before, 'after': rss_after,
+                      'growth': rss_after - rss_before if rss_before is not None and rss_after is not None else None}
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(before_path, after_path):
+    """두 결과 파일의 주요 지표 비교 출력"""
+    with open(before_path, encoding='utf-8') as f:
+        before = {s['scenario']: s for s in json.load(f)['scenarios']}
+    with open(after_path, encoding='utf-8') as f:
+        after = {s['scenario']: s for s in json.load(f)['scenarios']}
+
+    for name in sorted(set(before) & set(after)):
+        print(f"[{name}]")
+        rows = [
+            ('throughput_jobs_per_second', before[name]['throughput_jobs_per_second'], after[name]['throughput_jobs_per_second']),
+            ('job_latency.p50', before[name]['job_latency']['p50'], after[name]['job_latency']['p50']),
+            ('job_latency.p99', before[name]['job_latency']['p99'], after[name]['job_latency']['p99']),
+            ('db_round_trips_per_job', before[name]['db_round_trips_per_job'], after[name]['db_round_trips_per_job']),
+            ('rss_growth', before[name]['rss_bytes']['growth'], after[name]['rss_bytes']['growth'])
+        ]
+        for label, old, new in rows:
+            change = f"{(new - old) / old * 100:+.1f}%" if old and new is not None else '-'
+            print(f"  {label:30} {old!s:>14} -> {new!s:>14}  {change}")
+
+def main():
+    parser = argparse.ArgumentParser(description='ClOps 최적화 파이프라인 벤치마크')
+    parser.add_argument('--jobs', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--via', choices=['direct', 'front', 'both'], default='direct')
+    parser.add_argument('--mix', help='[{"weight": n, "request": {...}}] 형식의 요청 구성 파일')
+    parser.add_argument('--backend-url', help='실행 중인 백엔드 주소 (지정 시 로컬 서버를 띄우지 않음)')
+    parser.add_argument('--front-url', help='실행 중인 프론트 주소')
+    parser.add_argument('--bedrock-latency', type=float, default=1.5, help='가짜 Bedrock 호출당 지연(초)')
+    parser.add_argument('--pricing-latency', type=float, default=0.15, help='가짜 Pricing 호출당 지연(초)')
+    parser.add_argument('--poll-interval', type=float, default=0.5)
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='결과 JSON 저장 경로')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.backend_url:
+        backend_url, front_url = args.backend_url.rstrip('/'), (args.front_url or '').rstrip('/')
+    else:
+        backend_url, front_url = start_local_servers(args)
+
+    mix = load_mix(args.mix)
+    targets = {'direct': backend_url, 'front': front_url}
+    scenarios = []
+    for name in (['direct', 'front'] if args.via == 'both' else [args.via]):
+        if not targets[name]:
+            parser.error(f'--{name}-url is required for --via {name}')
+        scenario = run_scenario(name, targets[name], backend_url, mix, args)
+        scenarios.append(scenario)
+        print(f"[{name}] {scenario['throughput_jobs_per_second']} jobs/s, p50 {scenario['job_latency']['p50']}s, "
+              f"p99 {scenario['job_latency']['p99']}s, db {scenario['db_round_trips_per_job']}/job, {scenario['statuses']}")
+
+    result = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'config': {
+            'backend': os.environ.get('CLOPS_BACKEND', 'aws') if not args.backend_url else 'remote',
+            'bedrock_latency': args.bedrock_latency,
+            'pricing_latency': args.pricing_latency,
+            'poll_interval': args.poll_interval,
+            'mix': mix
+        },
+        'scenarios': scenarios
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    else:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+
+if __name__ == '__main__':
+    main()
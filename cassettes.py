@@ -0,0 +1,167 @@
+import atexit
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger('clops.cassettes')
+
+# CLOPS_CASSETTE_MODE=record 이면 Bedrock/Pricing 호출을 파일에 기록, replay 이면 기록된 응답을 재생
+CLOPS_CASSETTE_MODE = os.environ.get('CLOPS_CASSETTE_MODE', '')
+CLOPS_CASSETTE_PATH = os.environ.get('CLOPS_CASSETTE_PATH', 'cassettes/clops.jsonl.gz')
+CASSETTE_TIMING_SCALE = float(os.environ.get('CASSETTE_TIMING_SCALE', 0))  # 1.0 이면 기록된 응답 시간 재현
+CASSETTE_STRICT = os.environ.get('CASSETTE_STRICT', 'false').lower() == 'true'
+
+RECORDED_OPERATIONS = {
+    'bedrock-runtime': ('invoke_model',),
+    'pricing': ('get_products', 'describe_services')
+}
+
+class CassetteMiss(Exception):
+    pass
+
+def request_key(service, operation, params):
+    """요청 정규화 키: 파라미터 순서/필터 순서/본문 JSON 공백 차이를 무시"""
+    normalized = dict(params)
+    if 'body' in normalized:
+        body = normalized['body']
+        try:
+            normalized['body'] = json.loads(body)
+        except (TypeError, ValueError):
+            normalized['body'] = body.decode('utf-8') if isinstance(body, bytes) else body
+    if 'Filters' in normalized:
+        normalized['Filters'] = sorted(normalized['Filters'], key=lambda f: (f.get('Field', ''), f.get('Value', '')))
+    raw = json.dumps([service, operation, normalized], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+def encode_response(operation, response):
+    response = {k: v for k, v in response.items() if k != 'ResponseMetadata'}
+    if operation == 'invoke_model':
+        response['body'] = response['body'].read().decode('utf-8')
+    return response
+
+def decode_response(operation, response):
+    response = dict(response)
+    if operation == 'invoke_model':
+        response['body'] = io.BytesIO(response['body'].encode('utf-8'))
+    return response
+
+class Cassette:
+    """gzip JSON Lines 형식의 요청/응답 기록 (한 줄에 호출 1건)"""
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+        self.entries = {}     # key -> [entry, ...] (같은 요청이 여러 번 기록되면 순서대로 재생)
+        self.sequence = {}    # (service, operation) -> [entry, ...] (비엄격 재생 시 키가 없을 때 사용)
+        self.cursors = {}
+
+    def load(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                self.entries.setdefault(entry['key'], []).append(entry)
+                self.sequence.setdefault((entry['service'], entry['operation']), []).append(entry)
+        logger.info("Loaded %d cassette entries from %s", sum(len(v) for v in self.entries.values()), self.path)
+        return self
+
+    def record(self, entry):
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self.lock:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self.file = gzip.open(self.path, 'at', encoding='utf-8')
+                atexit.register(self.close)
+            self.file.write(line)
+
+    def lookup(self, service, operation, key, strict=CASSETTE_STRICT):
+        with self.lock:
+            candidates = self.entries.get(key)
+            cursor_key = key
+            if not candidates and not strict:
+                candidates = self.sequence.get((service, operation))
+                cursor_key = (service, operation)
+            if not candidates:
+                raise CassetteMiss(f"No recorded {service}.{operation} for key {key}")
+            index = self.cursors.get(cursor_key, 0)
+            self.cursors[cursor_key] = index + 1
+            return candidates[index % len(candidates)]
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+class RecordingClient:
+    """실제(또는 가짜) 클라이언트 호출을 그대로 수행하면서 카세트에 기록"""
+    def __init__(self, client, service, cassette):
+        self.client = client
+        self.service = service
+        self.cassette = cassette
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name not in RECORDED_OPERATIONS.get(self.service, ()):
+            return attr
+
+        def call(**params):
+            started = time.perf_counter()
+            entry = {'service': self.service, 'operation': name, 'key': request_key(self.service, name, params), 'ts': time.time()}
+            try:
+                response = attr(**params)
+            except ClientError as e:
+                entry.update(elapsed=round(time.perf_counter() - started, 4), error=e.response.get('Error', {}))
+                self.cassette.record(entry)
+                raise
+            entry['elapsed'] = round(time.perf_counter() - started, 4)
+            entry['response'] = encode_response(name, response)
+            self.cassette.record(entry)
+            return decode_response(name, entry['response'])
+        return call
+
+class ReplayClient:
+    """카세트에 기록된 응답을 정규화된 요청 키로 재생 (네트워크/비용 없이 부하 재현)"""
+    def __init__(self, service, cassette, timing_scale=CASSETTE_TIMING_SCALE):
+        self.service = service
+        self.cassette = cassette
+        self.timing_scale = timing_scale
+
+    def __getattr__(self, name):
+        if name not in RECORDED_OPERATIONS.get(self.service, ()):
+            raise AttributeError(f"{self.service}.{name} is not available in replay mode")
+
+        def call(**params):
+            entry = self.cassette.lookup(self.service, name, request_key(self.service, name, params))
+            if self.timing_scale > 0:
+                time.sleep(entry.get('elapsed', 0) * self.timing_scale)
+            if 'error' in entry:
+                raise ClientError({'Error': entry['error']}, name)
+            return decode_response(name, entry['response'])
+        return call
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+def get_cassette():
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(CLOPS_CASSETTE_PATH)
+            if CLOPS_CASSETTE_MODE == 'replay':
+                _cassette.load()
+        return _cassette
+
+def wrap_client(service_name, create):
+    """카세트 모드에 따라 클라이언트를 기록/재생 래퍼로 감쌈 (대상이 아닌 서비스는 그대로 생성)"""
+    if CLOPS_CASSETTE_MODE not in ('record', 'replay') or service_name not in RECORDED_OPERATIONS:
+        return create()
+    if CLOPS_CASSETTE_MODE == 'replay':
+        return ReplayClient(service_name, get_cassette())
+    return RecordingClient(create(), service_name, get_cassette())
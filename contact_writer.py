@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger('clops.contacts')
+
+CONTACT_COLUMNS = ['uuid', 'name', 'email', 'subject', 'message', 'status', 'created_at']
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class ContactWriter:
+    """문의 내용을 로컬 추가 전용(append-only) 파일에 먼저 기록하고, 백그라운드에서 DB에 배치로 반영
+
+    - add: 현재 세그먼트 파일에 JSON 한 줄을 추가 (요청 스레드는 DB를 기다리지 않음)
+    - flush: 세그먼트를 닫고 닫힌 세그먼트만 여러 행 INSERT 로 기록, 커밋된 세그먼트만 삭제 (실패 시 파일을 남겨 다음에 재시도)
+    - 종료된 프로세스가 남긴 세그먼트는 다른 프로세스가 이름을 바꿔 가져가 반영
+    """
+    def __init__(self, connect, spool_dir, flush_size=100, flush_interval=1.0, batch_size=500, fsync=False):
+        """
+        connect: DB 연결을 반환하는 함수 (연결 불가 시 None)
+        """
+        self.connect = connect
+        self.spool_dir = spool_dir
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.file = None
+        self.file_path = None
+        self.file_pid = None
+        self.pending = 0
+        self.flusher = None
+        self.flusher_pid = None
+
+    def add(self, contact_uuid, data):
+        """문의 1건을 로컬 세그먼트에 기록 (DB 반영은 백그라운드)"""
+        entry = {
+            'uuid': contact_uuid,
+            'name': data.get('name'),
+            'email': data.get('email'),
+            'subject': data.get('subject'),
+            'message': data.get('message'),
+            'status': 'received',
+            'created_at': datetime.utcnow().isoformat()
+        }
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self.lock:
+            # fork 된 프로세스는 부모의 세그먼트에 이어 쓰지 않고 자기 세그먼트를 새로 만듦
+            if self.file is None or self.file_pid != os.getpid():
+                os.makedirs(self.spool_dir, exist_ok=True)
+                path = os.path.join(self.spool_dir, f"{os.getpid()}-{time.time_ns()}.jsonl")
+                self.file = open(path, 'a', encoding='utf-8')
+                self.file_path = path
+                self.file_pid = os.getpid()
+            self.file.write(line)
+            self.file.flush()
+            if self.fsync:
+                os.fsync(self.file.fileno())
+            self.pending += 1
+            should_flush = self.pending >= self.flush_size
+        self.start()
+        if should_flush:
+            self.wakeup.set()
+
+    def start(self):
+        """백그라운드 기록 스레드 시작 (fork 된 프로세스에서는 새로 시작)"""
+        with self.lock:
+            if self.flusher is not None and self.flusher_pid == os.getpid():
+                return self.flusher
+            self.flusher = threading.Thread(target=self._run, name='contact-writer', daemon=True)
+            self.flusher_pid = os.getpid()
+            self.flusher.start()
+        return self.flusher
+
+    def _seal(self):
+        with self.lock:
+            if self.file is not None and self.file_pid == os.getpid():
+                self.file.close()
+                self.file = None
+                self.file_path = None
+            self.pending = 0
+
+    def _claim_segments(self):
+        """이 프로세스가 반영할 세그먼트 목록: 자기의 닫힌 세그먼트 + 종료된 프로세스의 세그먼트(이름을 바꿔 선점)
+
+        add() 가 쓰고 있는 세그먼트는 읽거나 지우지 않도록 목록과 현재 파일 경로를 같은 잠금 안에서 확인
+        """
+        pid = os.getpid()
+        with self.lock:
+            live = self.file_path if self.file is not None and self.file_pid == pid else None
+            try:
+                names = sorted(os.listdir(self.spool_dir))
+            except FileNotFoundError:
+                return []
+
+        segments = []
+        for name in names:
+            if not name.endswith('.jsonl'):
+                continue
+            owner = int(name.split('-', 1)[0])
+            path = os.path.join(self.spool_dir, name)
+            if owner == pid:
+                if path != live:
+                    segments.append(path)
+            elif not _pid_alive(owner):
+                claimed = os.path.join(self.spool_dir, f"{pid}-{name}")
+                try:
+                    os.rename(path, claimed)
+                except FileNotFoundError:
+                    continue  # 다른 프로세스가 먼저 가져감
+                logger.info("Recovered contact segment %s", name)
+                segments.append(claimed)
+        return segments
+
+    def flush(self):
+        """닫힌 세그먼트를 DB에 반영 (반영한 건수 반환)"""
+        with self.flush_lock:
+            self._seal()
+            written = 0
+            for path in self._claim_segments():
+                rows = self._read(path)
+                if rows and not self._write(rows):
+                    break  # DB 장애: 파일을 그대로 두고 다음 주기에 재시도
+                os.remove(path)
+                written += len(rows)
+            return written
+
+    def _read(self, path):
+        rows = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 기록 도중 종료되어 잘린 마지막 줄
+                    logger.warning("Skipping truncated contact entry in %s", path)
+                    continue
+                entry['created_at'] = datetime.fromisoformat(entry['created_at'])
+                rows.append(tuple(entry.get(column) for column in CONTACT_COLUMNS))
+        return rows
+
+    def _write(self, rows):
+        conn = self.connect()
+        if not conn:
+            return False
+        try:
+            cursor = conn.cursor()
+            for i in range(0, len(rows), self.batch_size):
+                # executemany 는 INSERT ... VALUES 를 여러 행 INSERT 한 문장으로 묶어 전송
+                # uuid 고유 인덱스로 재시도 시 이미 반영된 행은 무시
+                cursor.executemany('''
+                    INSERT IGNORE INTO contacts (uuid, name, email, subject, message, status, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ''', rows[i:i + self.batch_size])
+            conn.commit()
+            return True
+        except Exception as e:
+            logger.warning("Contact flush failed, keeping %d contacts in the local spool: %s", len(rows), e)
+            return False
+        finally:
+            conn.close()
+
+    def stats(self):
+        """로컬에 남아 있는 (아직 DB에 반영되지 않은) 세그먼트 수와 크기"""
+        try:
+            paths = [os.path.join(self.spool_dir, name) for name in os.listdir(self.spool_dir) if name.endswith('.jsonl')]
+        except FileNotFoundError:
+            paths = []
+        size = 0
+        for path in paths:
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return {'segments': len(paths), 'bytes': size}
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning("Contact writer flush failed: %s", e)
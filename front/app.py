@@ -1,10 +1,63 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g
 import requests
+import threading
+import time
 
 app = Flask(__name__)
 
 BACKEND_URL = 'http://localhost:5000'  # imsi.py 서버 주소
 
+# 프록시 메트릭 (Prometheus 형식으로 /metrics 에 노출)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+request_counts = {}     # (endpoint, status) -> count
+request_latency = {}    # endpoint -> [bucket_counts, sum, count]
+metrics_lock = threading.Lock()
+
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    if request.endpoint == 'metrics':
+        return response
+    elapsed = time.perf_counter() - g.get('started', time.perf_counter())
+    endpoint = request.endpoint or 'unknown'
+    with metrics_lock:
+        key = (endpoint, response.status_code)
+        request_counts[key] = request_counts.get(key, 0) + 1
+        latency = request_latency.setdefault(endpoint, [[0] * len(LATENCY_BUCKETS), 0.0, 0])
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                latency[0][i] += 1
+        latency[1] += elapsed
+        latency[2] += 1
+    return response
+
+@app.route('/metrics')
+def metrics():
+    lines = ['# TYPE clops_front_requests_total counter']
+    with metrics_lock:
+        for (endpoint, status), count in sorted(request_counts.items()):
+            lines.append(f'clops_front_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+        lines.append('# TYPE clops_front_request_seconds histogram')
+        for endpoint, (bucket_counts, total, count) in sorted(request_latency.items()):
+            for bound, bucket_count in zip(LATENCY_BUCKETS, bucket_counts):
+                lines.append(f'clops_front_request_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {bucket_count}')
+            lines.append(f'clops_front_request_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {count}')
+            lines.append(f'clops_front_request_seconds_sum{{endpoint="{endpoint}"}} {total:.6f}')
+            lines.append(f'clops_front_request_seconds_count{{endpoint="{endpoint}"}} {count}')
+    return '\n'.join(lines) + '\n', 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+FORWARDED_HEADERS = ('X-Clops-Profile', 'Idempotency-Key', 'X-Client-Id')
+
+def forwarded_headers():
+    """백엔드로 그대로 전달할 요청 헤더 (재시도 중복 방지 키, 클라이언트별 공평 분배용 식별자 등)"""
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    forwarded = request.headers.get('X-Forwarded-For')
+    headers['X-Forwarded-For'] = f"{forwarded}, {request.remote_addr}" if forwarded else request.remote_addr
+    return headers
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -17,8 +70,10 @@ def optimize():
     try:
         response = requests.post(f'{BACKEND_URL}/optimize', 
                                json=data, 
+                               params=request.args,
+                               headers=forwarded_headers(),
                                timeout=10)
-        return jsonify(response.json())
+        return jsonify(response.json()), response.status_code
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -32,6 +87,16 @@ def get_status(request_uuid):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/cancel/<request_uuid>', methods=['POST'])
+def cancel(request_uuid):
+    # imsi.py 백엔드로 작업 취소 요청 전달
+    try:
+        response = requests.post(f'{BACKEND_URL}/cancel/{request_uuid}', 
+                               timeout=10)
+        return jsonify(response.json()), response.status_code
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/contact', methods=['POST'])
 def contact():
     data = request.json
@@ -40,8 +105,9 @@ def contact():
     try:
         response = requests.post(f'{BACKEND_URL}/contact', 
                                json=data, 
+                               headers=forwarded_headers(),
                                timeout=10)
-        return jsonify(response.json())
+        return jsonify(response.json()), response.status_code
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
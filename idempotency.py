@@ -0,0 +1,83 @@
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('clops.idempotency')
+
+MAX_KEY_LENGTH = 255
+
+def request_fingerprint(data):
+    """요청 본문 해시 (같은 키로 다른 내용을 보낸 경우를 구분)"""
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class IdempotencyStore:
+    """Idempotency-Key → 최초 요청 uuid/응답 매핑: 재시도 요청은 새 작업 대신 최초 결과를 돌려받음
+
+    - claim: INSERT IGNORE 로 키를 선점하면서 응답 본문도 함께 저장 (요청당 DB 연결 한 번)
+    - DB를 쓸 수 없거나 DB 오류가 나면 fallback(SharedDict) 에 같은 형식으로 보관
+    """
+    def __init__(self, connect, fallback, ttl=24 * 3600):
+        """
+        connect: DB 연결을 반환하는 함수 (연결 불가 시 None, 요청 스레드에서 호출하므로 재시도 없이 빨리 실패해야 함)
+        fallback: setdefault 를 지원하는 공유 dict (DB 장애 시 사용)
+        """
+        self.connect = connect
+        self.fallback = fallback
+        self.ttl = ttl
+
+    def claim(self, endpoint, key, fingerprint, request_uuid, response):
+        """키를 request_uuid/response 로 선점하거나, 이미 있으면 기존 기록 {'uuid', 'fingerprint', 'response'} 반환"""
+        record = {'uuid': request_uuid, 'fingerprint': fingerprint, 'response': response}
+        try:
+            existing = self._claim_db(endpoint, key, record)
+        except Exception as e:
+            logger.warning("Idempotency store unavailable, using the shared cache: %s", e)
+            existing = None
+        if existing is None:
+            return self.fallback.setdefault(f"{endpoint}:{key}", record)
+        return existing
+
+    def _claim_db(self, endpoint, key, record):
+        """DB 에서 선점 (연결할 수 없으면 None)"""
+        conn = self.connect()
+        if not conn:
+            return None
+        now = datetime.utcnow()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM idempotency_keys WHERE endpoint = %s AND idem_key = %s AND expires_at < %s', (endpoint, key, now))
+            cursor.execute('''
+                INSERT IGNORE INTO idempotency_keys (endpoint, idem_key, uuid, fingerprint, response, created_at, expires_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            ''', (endpoint, key, record['uuid'], record['fingerprint'], json.dumps(record['response'], ensure_ascii=False),
+                  now, now + timedelta(seconds=self.ttl)))
+            if cursor.rowcount == 1:
+                conn.commit()
+                return record
+
+            cursor.execute('''
+                SELECT uuid, fingerprint, response FROM idempotency_keys
+                WHERE endpoint = %s AND idem_key = %s
+            ''', (endpoint, key))
+            row = cursor.fetchone()
+            conn.commit()
+        finally:
+            conn.close()
+        if not row:
+            return record
+        return {'uuid': row[0], 'fingerprint': row[1], 'response': json.loads(row[2]) if row[2] else None}
+
+    def purge_expired(self):
+        """만료된 키 삭제 (삭제 건수 반환)"""
+        conn = self.connect()
+        if not conn:
+            return 0
+        try:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM idempotency_keys WHERE expires_at < %s', (datetime.utcnow(),))
+            conn.commit()
+            return cursor.rowcount
+        finally:
+            conn.close()
@@ -3,16 +3,96 @@ import boto3
 import json
 import uuid
 import time
-from datetime import datetime
-from threading import Thread
+from datetime import datetime, timedelta
+from threading import Thread, Lock, Event
+from concurrent.futures import ThreadPoolExecutor
 import pymysql
 import os
+import gzip
+import hashlib
+from price_refresher import PriceRefresher
+from price_catalog import PriceCatalog
+from bedrock_limiter import bedrock_limiter
+from bedrock_gateway import bedrock_gateway
+import metrics
+import logging
+from log_config import setup_logging, get_logger, log_sampled
+from local_backends import create_client, local_backend_enabled, connect_sqlite
+from job_profiler import profiling_requested, start_profile, stop_profile
+from job_queue import JobQueue
+from shared_cache import shared_store, SharedDict
+from contact_writer import ContactWriter
+from structured_output import StructuredOutputError, parse_model_json, optional, NUMBER, ANY
+from idempotency import IdempotencyStore, request_fingerprint, MAX_KEY_LENGTH
+from job_deadline import JobDeadline, JobCancelled, bind_deadline, with_deadline, deadline_near, remaining_time
 app = Flask(__name__)
 
-# AWS 클라이언트
-bedrock = boto3.client('bedrock-runtime', region_name='us-east-1')
-pricing_client = boto3.client('pricing', region_name='us-east-1')
-rds_client = boto3.client('rds', region_name='us-east-1')
+setup_logging()
+logger = get_logger('backend')
+
+# AWS 클라이언트 (최초 사용 시 생성)
+AWS_REGION = 'us-east-1'
+aws_clients = {}
+aws_clients_lock = Lock()
+
+def get_aws_client(service_name):
+    """boto3 클라이언트를 지연 생성 (기본 세션은 스레드 안전하지 않으므로 생성 시 잠금, CLOPS_BACKEND=local 이면 가짜 클라이언트)"""
+    client = aws_clients.get(service_name)
+    if client is None:
+        with aws_clients_lock:
+            client = aws_clients.get(service_name)
+            if client is None:
+                client = create_client(service_name, AWS_REGION)
+                aws_clients[service_name] = client
+    return client
+
+def reset_aws_clients():
+    """fork 된 워커 프로세스에서 부모가 만든 클라이언트(연결 풀)를 공유하지 않도록 비움"""
+    aws_clients.clear()
+
+os.register_at_fork(after_in_child=reset_aws_clients)
+
+def get_bedrock_client():
+    """Bedrock 은 BedrockService 와 함께 쓰는 공용 게이트웨이의 클라이언트 사용 (연결 풀/타임아웃/재시도 설정 포함)"""
+    return bedrock_gateway.client()
+
+def get_pricing_client():
+    return get_aws_client('pricing')
+
+def get_rds_client():
+    return get_aws_client('rds')
+
+BEDROCK_MODEL_ID = 'us.amazon.nova-premier-v1:0'
+
+def invoke_bedrock(body):
+    """공용 Bedrock 게이트웨이(동시성 제한기, 스로틀링 재시도)를 거쳐 호출 (작업 마감 시간 적용)"""
+    return bedrock_gateway.invoke(body, BEDROCK_MODEL_ID)
+
+# 모델 응답 JSON 이 형식에 맞지 않을 때 깨진 부분만 다시 요청하는 짧은 호출 설정
+STRUCTURED_REPAIR_MAX_TOKENS = int(os.environ.get('STRUCTURED_REPAIR_MAX_TOKENS', 4096))
+
+def repair_model_output(prompt):
+    """구조화 출력 수리용 Bedrock 호출 (작은 토큰 한도, 온도 0, 마감 임박 시 생략)"""
+    if deadline_near('json_repair', REPAIR_CALL_RESERVE):
+        raise StructuredOutputError('deadline too close for repair call')
+    with metrics.span('stage', stage='json_repair'):
+        return bedrock_gateway.invoke_text(prompt, BEDROCK_MODEL_ID, STRUCTURED_REPAIR_MAX_TOKENS, 0, caller='json_repair')
+
+# 단계별 모델 응답 형식 (parse_model_json 으로 검증, 선택 키는 기본값으로 채움)
+STEP1_SCHEMA = {'disaster_ready_services': [{'name': str, 'reason': optional(str, '')}]}
+STEP3_SCHEMA = {'disaster_ready_services': [{'name': str, 'type': str, 'quantity': optional(int, 1), 'reason': optional(str, '')}]}
+RECALCULATION_SCHEMA = {
+    'recalculated_services': [{
+        'name': str,
+        'type': str,
+        'unit_monthly_cost': ANY,  # 4단계에서 가격을 못 찾은 서비스는 "pricing unavailable"
+        'quantity': optional(int, 1),
+        'user_based_usage_cost': optional(NUMBER, 0),
+        'total_monthly_cost': ANY,
+        'reason': optional(str, '')
+    }],
+    'total_cost': NUMBER
+}
 
 # RDS 설정
 RDS_CONFIG = {
@@ -24,16 +104,124 @@ RDS_CONFIG = {
     'charset': 'utf8mb4'
 }
 
-# 메모리 저장소 (폴백)
-memory_storage = {}
+# 메모리 저장소 (폴백, SHARED_CACHE_PATH 가 있으면 워커 프로세스 간 공유)
+memory_storage = SharedDict(shared_store, 'memory_storage', l1_ttl=0)
+
+# 워커 프로세스별 메트릭 (serve.py 의 각 워커가 주기적으로 기록하고 /metrics 가 합쳐서 응답)
+METRICS_PUBLISH_INTERVAL = float(os.environ.get('METRICS_PUBLISH_INTERVAL', 10))
+worker_metrics = SharedDict(shared_store, 'worker_metrics', l1_ttl=0)  # "pid-시작시각" -> registry.export()
+metrics_worker = {'pid': None, 'key': None}
+
+# 준비 상태 (스키마 초기화는 백그라운드에서 진행)
+db_state = {'initialized': False, 'available': False, 'error': None}
+READINESS_CACHE_SECONDS = int(os.environ.get('READINESS_CACHE_SECONDS', 30))
+dependency_checks = {}
+
+# 보존 기간 설정 (상태별 일 수, 0이면 삭제하지 않음)
+RETENTION_DAYS = {
+    'completed': int(os.environ.get('RETENTION_DAYS_COMPLETED', 90)),
+    'failed': int(os.environ.get('RETENTION_DAYS_FAILED', 14)),
+    'processing': int(os.environ.get('RETENTION_DAYS_PROCESSING', 7)),
+    'cancelled': int(os.environ.get('RETENTION_DAYS_CANCELLED', 14))
+}
+RETENTION_INTERVAL = int(os.environ.get('RETENTION_INTERVAL', 3600))
+RETENTION_BATCH_SIZE = int(os.environ.get('RETENTION_BATCH_SIZE', 500))
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive'))
+
+# Pricing API location 이름 (지원 리전)
+REGION_LOCATIONS = {
+    'us-east-1': 'US East (N. Virginia)',
+    'us-east-2': 'US East (Ohio)',
+    'us-west-1': 'US West (N. California)',
+    'us-west-2': 'US West (Oregon)',
+    'ca-central-1': 'Canada (Central)',
+    'sa-east-1': 'South America (Sao Paulo)',
+    'eu-west-1': 'EU (Ireland)',
+    'eu-central-1': 'EU (Frankfurt)',
+    'ap-south-1': 'Asia Pacific (Mumbai)',
+    'ap-southeast-1': 'Asia Pacific (Singapore)',
+    'ap-southeast-2': 'Asia Pacific (Sydney)',
+    'ap-northeast-1': 'Asia Pacific (Tokyo)',
+    'ap-northeast-2': 'Asia Pacific (Seoul)'
+}
+REGION_PRICE_WORKERS = int(os.environ.get('REGION_PRICE_WORKERS', 16))
+
+# 가격 사전 로딩/갱신 설정
+PRICE_REFRESH_INTERVAL = int(os.environ.get('PRICE_REFRESH_INTERVAL', 6 * 3600))
+# 오프라인 가격 카탈로그 (price_catalog.py build 로 생성, 있으면 Pricing API 보다 먼저 조회)
+PRICE_CATALOG_PATH = os.environ.get('PRICE_CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run', 'price_catalog.bin'))
+FALLBACK_PRICE_REGION = os.environ.get('FALLBACK_PRICE_REGION', 'us-east-1')  # 폴백 가격표를 만들 카탈로그 리전
+PRICE_WARMUP_REGIONS = [r for r in os.environ.get('PRICE_WARMUP_REGIONS', 'us-east-1,us-west-2,ap-northeast-2').split(',') if r]
+PRICE_WARMUP_WORKERS = int(os.environ.get('PRICE_WARMUP_WORKERS', 4))
+RECENT_STEP1_LIMIT = int(os.environ.get('RECENT_STEP1_LIMIT', 200))
+STEP1_CACHE_TTL = int(os.environ.get('STEP1_CACHE_TTL', 3600))  # 같은 입력의 1단계 결과 재사용 시간 (0이면 사용 안 함)
+
+# 작업 마감 시간 설정 (초)
+JOB_TIMEOUT = int(os.environ.get('JOB_TIMEOUT', 600))
+JOB_TIMEOUT_MAX = int(os.environ.get('JOB_TIMEOUT_MAX', 1800))
+BEDROCK_CALL_RESERVE = int(os.environ.get('BEDROCK_CALL_RESERVE', 60))  # 남은 시간이 이보다 적으면 Bedrock 호출 대신 폴백
+PRICING_CALL_RESERVE = int(os.environ.get('PRICING_CALL_RESERVE', 10))  # 남은 시간이 이보다 적으면 캐시/폴백 가격만 사용
+DB_RETRY_RESERVE = int(os.environ.get('DB_RETRY_RESERVE', 15))  # 남은 시간이 이보다 적으면 DB 연결 재시도 안 함
+REPAIR_CALL_RESERVE = int(os.environ.get('REPAIR_CALL_RESERVE', 20))  # 남은 시간이 이보다 적으면 JSON 수리 호출 안 함
+active_jobs = {}
+
+# DB 작업 큐 설정 (여러 백엔드 노드가 jobs 테이블의 작업을 나눠 처리)
+# 문의 저장: 로컬 추가 전용 파일에 먼저 기록 후 백그라운드에서 DB에 배치 반영
+CONTACT_SPOOL_DIR = os.environ.get('CONTACT_SPOOL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'run', 'contacts'))
+CONTACT_FLUSH_SIZE = int(os.environ.get('CONTACT_FLUSH_SIZE', 100))
+CONTACT_FLUSH_INTERVAL = float(os.environ.get('CONTACT_FLUSH_INTERVAL', 1.0))
+CONTACT_SPOOL_FSYNC = os.environ.get('CONTACT_SPOOL_FSYNC', 'false').lower() == 'true'  # true 이면 전원 장애에도 유실 없음 (요청당 fsync)
+
+# Idempotency-Key 보관 시간 (초): 이 시간 안의 재시도는 최초 요청의 uuid/응답을 돌려받음
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600))
+
+JOB_QUEUE_ENABLED = os.environ.get('JOB_QUEUE_ENABLED', 'true').lower() == 'true'
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 8))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1.0))
+JOB_HEARTBEAT_INTERVAL = int(os.environ.get('JOB_HEARTBEAT_INTERVAL', 10))
+JOB_HEARTBEAT_TIMEOUT = int(os.environ.get('JOB_HEARTBEAT_TIMEOUT', 60))  # 이 시간 동안 heartbeat 가 없으면 다른 워커가 다시 실행
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_POLL_MAX_INTERVAL = float(os.environ.get('JOB_POLL_MAX_INTERVAL', 30))  # 빈/실패한 확보가 이어질 때 폴링 간격 상한 (지수 백오프)
+JOB_DB_CONNECT_TIMEOUT = int(os.environ.get('JOB_DB_CONNECT_TIMEOUT', 3))  # 큐 폴링/작업 등록용 연결 타임아웃 (재시도 없이 한 번)
+
+# RDS 엔드포인트 조회(DescribeDBInstances) 결과 재사용 시간 (초): 실패/비밀번호 없음은 더 짧게 기억
+RDS_INFO_TTL = int(os.environ.get('RDS_INFO_TTL', 300))
+RDS_INFO_RETRY_TTL = int(os.environ.get('RDS_INFO_RETRY_TTL', 30))
+
+# 작업 우선순위 등급 (작을수록 먼저) 과 클라이언트별 공평 분배
+JOB_PRIORITIES = {'interactive': 0, 'batch': 1}
+JOB_DEFAULT_PRIORITY = {'optimize': 'interactive', 'compare': 'interactive', 'sweep': 'batch'}
+JOB_CLIENT_MAX_RUNNING = int(os.environ.get('JOB_CLIENT_MAX_RUNNING', 4))  # 클라이언트별 동시 실행 상한 (0이면 제한 없음)
+JOB_BATCH_MAX_RUNNING = int(os.environ.get('JOB_BATCH_MAX_RUNNING', 4))  # batch 등급 동시 실행 상한 (interactive 작업용 워커 확보, 0이면 제한 없음)
+JOB_PRIORITY_AGING = int(os.environ.get('JOB_PRIORITY_AGING', 300))  # 이 시간(초)만큼 기다린 작업은 한 등급 위로 (0이면 사용 안 함)
+
+# 예산 스윕 설정
+SWEEP_MAX_POINTS = int(os.environ.get('SWEEP_MAX_POINTS', 50))
+SWEEP_MAX_WORKERS = int(os.environ.get('SWEEP_MAX_WORKERS', 4))
+
+# 작업 이벤트 버퍼 설정
+EVENT_FLUSH_SIZE = int(os.environ.get('EVENT_FLUSH_SIZE', 50))
+EVENT_FLUSH_INTERVAL = float(os.environ.get('EVENT_FLUSH_INTERVAL', 2.0))
+
+rds_lookup = {'info': None, 'info_expires_at': 0, 'password_retry_at': 0}
+rds_lookup_lock = Lock()
 
 def get_rds_info():
+    """RDS 엔드포인트 정보 (조회 결과를 RDS_INFO_TTL 동안, 실패는 RDS_INFO_RETRY_TTL 동안 재사용)"""
+    with rds_lookup_lock:
+        if time.time() < rds_lookup['info_expires_at']:
+            return rds_lookup['info']
+        info = describe_rds_info()
+        rds_lookup['info'] = info
+        rds_lookup['info_expires_at'] = time.time() + (RDS_INFO_TTL if info else RDS_INFO_RETRY_TTL)
+        return info
+
+def describe_rds_info():
     try:
-        response = rds_client.describe_db_instances()
+        response = get_rds_client().describe_db_instances()
         for db in response['DBInstances']:
             if 'team02-hackathon-db' in db['DBInstanceIdentifier'] and db['DBInstanceStatus'] == 'available':
-                print(f"RDS Status: {db['DBInstanceStatus']}")
-                print(f"RDS Endpoint: {db['Endpoint']['Address']}")
+                logger.debug("RDS %s is %s", db['Endpoint']['Address'], db['DBInstanceStatus'])
                 return {
                     'endpoint': db['Endpoint']['Address'],
                     'port': db['Endpoint']['Port'],
@@ -42,22 +230,21 @@ def get_rds_info():
                 }
         return None
     except Exception as e:
-        print(f"Failed to get RDS info: {e}")
+        logger.warning("Failed to get RDS info: %s", e)
         return None
 
 def get_rds_password_from_secrets():
     """Try to get RDS password from multiple sources"""
     # Try Parameter Store first
     try:
-        ssm_client = boto3.client('ssm', region_name='us-east-1')
-        response = ssm_client.get_parameter(
+        response = get_aws_client('ssm').get_parameter(
             Name='/team02-hackathon/rds/password',
             WithDecryption=True
         )
-        print("Retrieved password from Parameter Store")
+        logger.info("Retrieved RDS password from Parameter Store")
         return response['Parameter']['Value']
     except Exception as e:
-        print(f"Parameter Store failed: {e}")
+        logger.warning("Parameter Store failed: %s", e)
     
     # Try to read from local terraform state as fallback
     try:
@@ -67,16 +254,20 @@ def get_rds_password_from_secrets():
                               cwd='/home/ec2-user/terraform', capture_output=True, text=True)
         if result.returncode == 0:
             password = json.loads(result.stdout)['value']
-            print("Retrieved password from Terraform state")
+            logger.info("Retrieved RDS password from Terraform state")
             return password
     except Exception as e:
-        print(f"Terraform state read failed: {e}")
+        logger.warning("Terraform state read failed: %s", e)
     
     return None
 
-def get_db_connection():
-    import time
-    max_retries = 3
+@metrics.timed('db', operation='connect')
+def get_db_connection(max_retries=3, connect_timeout=10):
+    # 작업 마감 시간이 임박하면 재시도 없이 짧게 시도
+    remaining = remaining_time()
+    if remaining is not None and remaining < DB_RETRY_RESERVE:
+        max_retries = 1
+        connect_timeout = min(connect_timeout, 5)
     
     # Get RDS info from AWS API
     rds_info = get_rds_info()
@@ -85,7 +276,7 @@ def get_db_connection():
         RDS_CONFIG['port'] = rds_info['port']
         RDS_CONFIG['user'] = rds_info['username']
         RDS_CONFIG['database'] = rds_info['database']
-        print(f"Updated RDS config from AWS API: {rds_info['endpoint']}")
+        logger.debug("Updated RDS config from AWS API: %s", rds_info['endpoint'])
     
     # Handle case where host includes port (e.g., "host:3306")
     if ':' in RDS_CONFIG['host']:
@@ -96,36 +287,50 @@ def get_db_connection():
     
     # Try to get password from environment first, then from AWS
     if not RDS_CONFIG['password']:
+        # 조회에 실패했으면 RDS_INFO_RETRY_TTL 동안은 다시 조회하지 않음 (폴링마다 SSM/terraform 호출 방지)
+        if time.time() < rds_lookup['password_retry_at']:
+            return None
         password = get_rds_password_from_secrets()
         if password:
             RDS_CONFIG['password'] = password
         else:
-            print("❌ Could not retrieve RDS password from any source")
+            rds_lookup['password_retry_at'] = time.time() + RDS_INFO_RETRY_TTL
+            logger.error("Could not retrieve RDS password from any source")
             return None
     
     for attempt in range(max_retries):
         try:
-            print(f"Connecting to RDS: {RDS_CONFIG['host']}:{RDS_CONFIG['port']}")
-            print(f"Username: {RDS_CONFIG['user']}, Database: {RDS_CONFIG['database']}")
-            print(f"Password set: {'Yes' if RDS_CONFIG['password'] else 'No'}")
-            return pymysql.connect(**RDS_CONFIG)
+            logger.debug("Connecting to RDS %s:%s as %s (database %s)", RDS_CONFIG['host'], RDS_CONFIG['port'], RDS_CONFIG['user'], RDS_CONFIG['database'])
+            return connect_database(connect_timeout)
         except Exception as e:
-            print(f"RDS connection attempt {attempt + 1} failed: {e}")
+            logger.warning("RDS connection attempt %d failed: %s", attempt + 1, e)
             if attempt < max_retries - 1:
                 time.sleep(5)
             else:
-                print("RDS connection failed, using fallback mode")
+                logger.warning("RDS connection failed, using fallback mode")
                 return None
 
+def get_quick_db_connection():
+    """재시도 없이 짧게 한 번만 연결 (큐 폴링/작업 등록용: DB 장애 시 워커와 요청이 오래 막히지 않도록)"""
+    return get_db_connection(max_retries=1, connect_timeout=JOB_DB_CONNECT_TIMEOUT)
+
+def connect_database(connect_timeout):
+    """MySQL 연결 (로컬 백엔드에서는 같은 인터페이스의 SQLite 연결)"""
+    if local_backend_enabled():
+        return connect_sqlite()
+    return pymysql.connect(**RDS_CONFIG, connect_timeout=connect_timeout)
+
 def init_db():
     try:
         conn = get_db_connection()
         if not conn:
-            print("Running in fallback mode without database")
+            logger.warning("Running in fallback mode without database")
+            db_state.update({'initialized': True, 'available': False, 'error': 'connection unavailable'})
             return
         cursor = conn.cursor()
     except Exception as e:
-        print(f"Database connection failed: {e}")
+        logger.warning("Database connection failed: %s", e)
+        db_state.update({'initialized': True, 'available': False, 'error': str(e)})
         return
     
     
@@ -152,45 +357,187 @@ def init_db():
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
-        
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_events (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            uuid VARCHAR(36) NOT NULL,
+            step VARCHAR(50) NOT NULL,
+            created_at TIMESTAMP(3) NOT NULL,
+            payload JSON,
+            INDEX idx_job_events_uuid (uuid, created_at)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS requests_archive (
+            uuid VARCHAR(36) PRIMARY KEY,
+            status VARCHAR(20),
+            created_at TIMESTAMP NULL,
+            updated_at TIMESTAMP NULL,
+            archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            archive_file VARCHAR(255),
+            INDEX idx_requests_archive_created_at (created_at)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS job_artifacts (
+            uuid VARCHAR(36) NOT NULL,
+            stage VARCHAR(30) NOT NULL,
+            input_hash CHAR(64) NOT NULL,
+            data JSON NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (uuid, stage)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            uuid VARCHAR(36) PRIMARY KEY,
+            kind VARCHAR(20) NOT NULL,
+            payload JSON NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            attempts INT NOT NULL DEFAULT 0,
+            worker_id VARCHAR(100),
+            heartbeat_at TIMESTAMP(3) NULL,
+            priority SMALLINT NOT NULL DEFAULT 0,
+            client_id VARCHAR(100) NOT NULL DEFAULT 'anonymous',
+            cancel_requested TINYINT NOT NULL DEFAULT 0,
+            created_at TIMESTAMP(3) NOT NULL,
+            INDEX idx_jobs_status (status, created_at)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            endpoint VARCHAR(30) NOT NULL,
+            idem_key VARCHAR(255) NOT NULL,
+            uuid VARCHAR(36) NOT NULL,
+            fingerprint CHAR(64) NOT NULL,
+            response JSON,
+            created_at TIMESTAMP(3) NOT NULL,
+            expires_at TIMESTAMP(3) NOT NULL,
+            PRIMARY KEY (endpoint, idem_key),
+            INDEX idx_idempotency_keys_expires_at (expires_at)
+        )
+    ''')
+
+    ensure_index(cursor, 'requests', 'idx_requests_status', 'status')
+    ensure_index(cursor, 'requests', 'idx_requests_created_at', 'created_at')
+    ensure_index(cursor, 'contacts', 'idx_contacts_uuid', 'uuid', unique=True)
+    # 우선순위/클라이언트 열이 생기기 전에 만든 jobs 테이블 업그레이드
+    ensure_column(cursor, 'jobs', 'priority', "SMALLINT NOT NULL DEFAULT 0")
+    ensure_column(cursor, 'jobs', 'client_id', "VARCHAR(100) NOT NULL DEFAULT 'anonymous'")
+    ensure_index(cursor, 'jobs', 'idx_jobs_schedule', 'status, priority, client_id, created_at')
+    ensure_column(cursor, 'jobs', 'cancel_requested', "TINYINT NOT NULL DEFAULT 0")
+
     conn.commit()
     conn.close()
-    print("Database initialized successfully")
+    db_state.update({'initialized': True, 'available': True, 'error': None})
+    logger.info("Database initialized successfully")
+
+def initialize_database():
+    try:
+        init_db()
+    except Exception as e:
+        logger.exception("Database initialization failed: %s", e)
+        db_state.update({'initialized': True, 'available': False, 'error': str(e)})
+
+def start_db_init():
+    """서버 바인딩을 막지 않도록 스키마 초기화를 백그라운드에서 실행"""
+    thread = Thread(target=initialize_database, daemon=True)
+    thread.start()
+    return thread
+
+def ensure_index(cursor, table, index_name, columns, unique=False):
+    """인덱스가 없을 때만 생성 (MySQL은 CREATE INDEX IF NOT EXISTS 미지원)"""
+    cursor.execute('''
+        SELECT COUNT(*) FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    ''', (table, index_name))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f'CREATE {"UNIQUE " if unique else ""}INDEX {index_name} ON {table} ({columns})')
+        logger.info("Created index %s on %s(%s)", index_name, table, columns)
+
+def ensure_column(cursor, table, column, definition):
+    """열이 없을 때만 추가 (MySQL은 ADD COLUMN IF NOT EXISTS 미지원)"""
+    cursor.execute('''
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    ''', (table, column))
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        logger.info("Added column %s.%s", table, column)
+
+# 기본 폴백 가격표 (월 USD): 카탈로그에 같은 서비스/옵션 가격이 있으면 카탈로그 값 사용
+BUILTIN_FALLBACK_COSTS = {
+    'AmazonEC2': {'t2.nano': 4.2, 't2.micro': 8.5, 't2.small': 17, 't2.medium': 34, 't3.medium': 38, 't3.large': 76},
+    'AmazonRDS': {'db.t3.micro': 15, 'db.t3.small': 30, 'db.t3.medium': 60, 'db.t3.large': 120},
+    'ElasticLoadBalancing': {'application': 22},
+    'AmazonS3': {'standard': 23},
+    'AmazonSageMaker': {'ml.t3.medium': 45, 'ml.t3.large': 90},
+    'AWSLambda': {'requests': 0.2}
+}
+
+price_catalog = PriceCatalog.open(PRICE_CATALOG_PATH)
 
 class AWSOptimizer:
-    def __init__(self):
-        self.pricing_cache = {}
-        self.aws_services_cache = None
-        self.fallback_costs = {
-            'AmazonEC2': {'t2.nano': 4.2, 't2.micro': 8.5, 't2.small': 17, 't2.medium': 34, 't3.medium': 38, 't3.large': 76},
-            'AmazonRDS': {'db.t3.micro': 15, 'db.t3.small': 30, 'db.t3.medium': 60, 'db.t3.large': 120},
-            'ElasticLoadBalancing': {'application': 22},
-            'AmazonS3': {'standard': 23},
-            'AmazonSageMaker': {'ml.t3.medium': 45, 'ml.t3.large': 90},
-            'AWSLambda': {'requests': 0.2}
-        }
+    def __init__(self, catalog=None):
+        self.pricing_cache = SharedDict(shared_store, 'pricing')
+        self.options_cache = SharedDict(shared_store, 'options')
+        self.step1_cache = SharedDict(shared_store, 'step1', ttl=STEP1_CACHE_TTL)
+        self.recent_step1_services = {}  # 최근 1단계 결과 서비스 이름 (가격 사전 로딩 대상)
+        self.recent_lock = Lock()
+        self.aws_services_cache = SharedDict(shared_store, 'aws_services')
+        self.catalog = catalog
+        self.fallback_costs = {service: dict(costs) for service, costs in BUILTIN_FALLBACK_COSTS.items()}
+        if catalog:
+            # 서비스별로 기본 가격표 위에 카탈로그 가격을 덮어씀 (카탈로그에 없는 서비스/옵션은 기본값 유지)
+            for service, costs in catalog.region_costs(FALLBACK_PRICE_REGION).items():
+                self.fallback_costs.setdefault(service, {}).update(costs)
+    
+    def catalog_price(self, service, instance_type, region):
+        """카탈로그 조회: (카탈로그에 있는지, 월 가격 또는 None)"""
+        if self.catalog is None:
+            return False, None
+        found, price = self.catalog.lookup(service, instance_type, region)
+        metrics.cache_result('catalog', found)
+        return found, price
     
     def get_pricing(self, service, instance_type, region='us-east-1'):
         cache_key = f"{service}_{instance_type}_{region}"
-        if cache_key in self.pricing_cache:
+        hit = cache_key in self.pricing_cache
+        metrics.cache_result('pricing', hit)
+        if hit:
             return self.pricing_cache[cache_key]
         
+        found, price = self.catalog_price(service, instance_type, region)
+        if found:
+            return price
+        
         try:
             price = self._get_aws_service_price(service, instance_type, region)
             self.pricing_cache[cache_key] = price
-            print(f"Price fetched: {service} {instance_type} = ${price}/month")
+            log_sampled(logger, logging.DEBUG, "Price fetched: %s %s = $%s/month", service, instance_type, price)
             return price
         except Exception as e:
-            print(f"Pricing API failed for {service} {instance_type}: {e}")
+            logger.warning("Pricing API failed for %s %s: %s", service, instance_type, e)
+            metrics.failure('pricing')
             return None
     
+    def get_cached_pricing(self, service, instance_type, region='us-east-1'):
+        """API 호출 없이 캐시 또는 폴백 가격만 조회"""
+        cache_key = f"{service}_{instance_type}_{region}"
+        if cache_key in self.pricing_cache:
+            return self.pricing_cache[cache_key]
+        found, price = self.catalog_price(service, instance_type, region)
+        if found:
+            return price
+        return self.fallback_costs.get(service, {}).get(instance_type)
+    
+    @metrics.timed('pricing', operation='get_products')
     def _get_aws_service_price(self, service, instance_type, region):
-        location_map = {
-            'us-east-1': 'US East (N. Virginia)',
-            'us-west-2': 'US West (Oregon)',
-            'ap-northeast-2': 'Asia Pacific (Seoul)'
-        }
-        
         service_configs = {
             'AmazonEC2': {
                 'ServiceCode': 'AmazonEC2',
@@ -210,10 +557,10 @@ class AWSOptimizer:
         }
         
         if service not in service_configs:
-            response = pricing_client.get_products(
+            response = get_pricing_client().get_products(
                 ServiceCode=service,
                 Filters=[
-                    {'Type': 'TERM_MATCH', 'Field': 'location', 'Value': location_map.get(region, 'US East (N. Virginia)')}
+                    {'Type': 'TERM_MATCH', 'Field': 'location', 'Value': REGION_LOCATIONS.get(region, 'US East (N. Virginia)')}
                 ]
             )
         else:
@@ -222,10 +569,10 @@ class AWSOptimizer:
             filters.append({
                 'Type': 'TERM_MATCH', 
                 'Field': 'location', 
-                'Value': location_map.get(region, 'US East (N. Virginia)')
+                'Value': REGION_LOCATIONS.get(region, 'US East (N. Virginia)')
             })
         
-            response = pricing_client.get_products(
+            response = get_pricing_client().get_products(
                 ServiceCode=config['ServiceCode'],
                 Filters=filters
             )
@@ -249,11 +596,13 @@ class AWSOptimizer:
     
     def get_all_aws_services(self):
         """AWS의 모든 서비스 목록을 가져오기"""
-        if self.aws_services_cache:
-            return self.aws_services_cache
+        cached = self.aws_services_cache.get('all')
+        if cached:
+            return cached
         
         try:
-            response = pricing_client.describe_services()
+            with metrics.span('pricing', operation='describe_services'):
+                response = get_pricing_client().describe_services()
             services = []
             for service in response['Services']:
                 services.append({
@@ -261,15 +610,33 @@ class AWSOptimizer:
                     'ServiceName': service.get('ServiceName', service['ServiceCode'])
                 })
             
-            self.aws_services_cache = services
-            print(f"Loaded {len(services)} AWS services")
+            self.aws_services_cache['all'] = services
+            logger.info("Loaded %d AWS services", len(services))
             return services
         except Exception as e:
-            print(f"Failed to get AWS services: {e}")
+            logger.warning("Failed to get AWS services: %s", e)
             return []
     
     def step1_disaster_ready_services(self, service_type, users, performance, additional_info, region='us-east-1'):
         """1단계: 재해상황 대비 필수 AWS 서비스 목록 추출"""
+        cache_key = artifact_input_hash({
+            'service_type': service_type,
+            'users': users,
+            'performance': performance,
+            'additional_info': additional_info,
+            'region': region
+        }) if STEP1_CACHE_TTL > 0 else None
+        if cache_key:
+            cached = self.step1_cache.get(cache_key)
+            metrics.cache_result('step1', cached is not None)
+            if cached is not None:
+                logger.info("Step 1 served from cache: %d services", len(cached))
+                return cached
+        
+        if deadline_near('step1', BEDROCK_CALL_RESERVE):
+            metrics.fallback('step1')
+            return self._fallback_disaster_services(service_type)
+        
         try:
             bedrock_prompt = f"""
             # 목적
@@ -327,99 +694,113 @@ class AWSOptimizer:
                 }
             })
             
-            response = bedrock.invoke_model(
-                modelId="us.amazon.nova-premier-v1:0",
-                body=body,
-                contentType="application/json"
-            )
+            response = invoke_bedrock(body)
             
             result = json.loads(response['body'].read())
             content = result['output']['message']['content'][0]['text']
             
-            # ```json 블록에서 JSON 추출
-            if '```json' in content:
-                start = content.find('```json') + 7
-                end = content.find('```', start)
-                json_str = content[start:end].strip()
-            else:
-                start = content.find('{')
-                end = content.rfind('}') + 1
-                json_str = content[start:end]
-            
-            services_data = json.loads(json_str)
+            services_data = parse_model_json(content, STEP1_SCHEMA, 'step1', repair=repair_model_output)
             services = services_data['disaster_ready_services']
             
-            print(f"\n=== Step 1 Complete: {len(services)} disaster-ready services identified ===")
-            for service in services:
-                print(f"  - {service['name']}: {service['reason']}")
-            print()
+            logger.info("Step 1 complete: %d disaster-ready services identified", len(services),
+                        extra={'fields': {'services': [service['name'] for service in services]}})
             
+            # 폴백 결과는 캐시하지 않음 (Bedrock 복구 후 바로 다시 분석되도록)
+            if cache_key:
+                self.step1_cache[cache_key] = services
             return services
         except Exception as e:
-            print(f"Step 1 disaster-ready analysis failed: {e}")
+            logger.warning("Step 1 disaster-ready analysis failed: %s", e)
+            metrics.failure('step1')
         
+        metrics.fallback('step1')
         return self._fallback_disaster_services(service_type)
     
     def get_service_options(self, service_code, region='us-east-1'):
-        """특정 서비스의 모든 옵션을 가져오기"""
-        location_map = {
-            'us-east-1': 'US East (N. Virginia)',
-            'us-west-2': 'US West (Oregon)',
-            'ap-northeast-2': 'Asia Pacific (Seoul)'
-        }
+        """특정 서비스의 모든 옵션을 가져오기 (캐시 우선)"""
+        cache_key = f"{service_code}_{region}"
+        hit = cache_key in self.options_cache
+        metrics.cache_result('options', hit)
+        if hit:
+            return self.options_cache[cache_key]
+        
+        options = self.catalog.service_options(service_code, region) if self.catalog else None
+        if options:
+            return options
         
         try:
-            filters = [{
-                'Type': 'TERM_MATCH',
-                'Field': 'location',
-                'Value': location_map.get(region, 'US East (N. Virginia)')
-            }]
-            
-            response = pricing_client.get_products(
-                ServiceCode=service_code,
-                Filters=filters,
-                MaxResults=100
-            )
-            
-            options = set()
-            for product_str in response['PriceList']:
-                product = json.loads(product_str)
-                attributes = product.get('product', {}).get('attributes', {})
-                
-                # EC2 인스턴스 타입
-                if 'instanceType' in attributes:
-                    options.add(attributes['instanceType'])
-                # RDS 인스턴스 타입
-                elif 'instanceClass' in attributes:
-                    options.add(attributes['instanceClass'])
-                # S3 스토리지 클래스
-                elif 'storageClass' in attributes:
-                    options.add(attributes['storageClass'])
-                # 기타 서비스는 기본값
-                else:
-                    options.add('standard')
-            
-            return list(options)
+            products = self.fetch_service_products(service_code, region)
+            options = self.extract_service_options(products)
+            self.options_cache[cache_key] = options
+            return options
             
         except Exception as e:
-            print(f"Failed to get options for {service_code}: {e}")
+            logger.warning("Failed to get options for %s: %s", service_code, e)
+            metrics.failure('pricing')
             return ['standard']  # 기본값 반환
     
-    def step2_get_service_prices(self, services, region='us-east-1'):
-        """2단계: 각 서비스의 다양한 옵션별 가격 조회"""
+    @metrics.timed('pricing', operation='get_products')
+    def fetch_service_products(self, service_code, region='us-east-1'):
+        """Pricing API에서 리전별 서비스 상품 목록 조회"""
+        filters = [{
+            'Type': 'TERM_MATCH',
+            'Field': 'location',
+            'Value': REGION_LOCATIONS.get(region, 'US East (N. Virginia)')
+        }]
+        
+        response = get_pricing_client().get_products(
+            ServiceCode=service_code,
+            Filters=filters,
+            MaxResults=100
+        )
+        return [json.loads(product_str) for product_str in response['PriceList']]
+    
+    def extract_service_options(self, products):
+        """상품 목록에서 선택 가능한 옵션(인스턴스 타입 등) 추출"""
+        options = set()
+        for product in products:
+            attributes = product.get('product', {}).get('attributes', {})
+            
+            # EC2 인스턴스 타입
+            if 'instanceType' in attributes:
+                options.add(attributes['instanceType'])
+            # RDS 인스턴스 타입
+            elif 'instanceClass' in attributes:
+                options.add(attributes['instanceClass'])
+            # S3 스토리지 클래스
+            elif 'storageClass' in attributes:
+                options.add(attributes['storageClass'])
+            # 기타 서비스는 기본값
+            else:
+                options.add('standard')
+        
+        return list(options)
+    
+    def step2_get_service_prices(self, services, region='us-east-1', on_service_priced=None):
+        """2단계: 각 서비스의 다양한 옵션별 가격 조회 (on_service_priced(이름, 옵션 목록): 서비스별 조회가 끝날 때마다 호출)"""
         priced_services = []
         
         for service in services:
             service_name = service['name']
-            print(f"\n=== Processing {service_name} ===\n")
+            logger.debug("Processing %s", service_name)
             
-            # 해당 서비스의 모든 옵션 가져오기
-            service_options = self.get_service_options(service_name, region)
-            print(f"Found {len(service_options)} options for {service_name}")
+            # 해당 서비스의 모든 옵션 가져오기 (마감 임박 시 캐시/폴백만 사용)
+            cached_only = deadline_near('step2', PRICING_CALL_RESERVE)
+            if cached_only:
+                service_options = (self.options_cache.get(f"{service_name}_{region}")
+                                   or (self.catalog.service_options(service_name, region) if self.catalog else None)
+                                   or list(self.fallback_costs.get(service_name, {})))
+            else:
+                service_options = self.get_service_options(service_name, region)
+            logger.debug("Found %d options for %s", len(service_options), service_name)
             
             options = []
             for option in service_options:
-                price = self.get_pricing(service_name, option, region)
+                cached_only = cached_only or deadline_near('step2', PRICING_CALL_RESERVE)
+                if cached_only:
+                    price = self.get_cached_pricing(service_name, option, region)
+                else:
+                    price = self.get_pricing(service_name, option, region)
                 if price is not None and price > 0:
                     options.append({
                         'type': option,
@@ -427,7 +808,7 @@ class AWSOptimizer:
                         'reason': service['reason']
                     })
                 else:
-                    print(f"  Skipping {option}: No valid pricing data")
+                    log_sampled(logger, logging.DEBUG, "Skipping %s %s: no valid pricing data", service_name, option)
             
             if options:
                 sorted_options = sorted(options, key=lambda x: x['monthly_cost'])
@@ -437,33 +818,87 @@ class AWSOptimizer:
                     'options': sorted_options
                 })
                 
-                print(f"\n{service_name} pricing completed:")
-                for i, opt in enumerate(sorted_options):
-                    print(f"  {i+1}. {opt['type']}: ${opt['monthly_cost']:.2f}/month")
-                print(f"  Total {len(sorted_options)} options available\n")
+                logger.info("%s pricing completed: %d options, cheapest %s $%.2f/month",
+                            service_name, len(sorted_options), sorted_options[0]['type'], sorted_options[0]['monthly_cost'])
             else:
-                print(f"  No valid pricing options found for {service_name}")
+                logger.info("No valid pricing options found for %s", service_name)
+            
+            if on_service_priced:
+                on_service_priced(service_name, priced_services[-1]['options'] if options else [])
         
-        print(f"\n=== Step 2 Complete: {len(priced_services)} services priced ===\n")
+        logger.info("Step 2 complete: %d services priced", len(priced_services))
         return priced_services
-    
+
+    def compare_regions(self, services, regions=None, budget=None):
+        """선택된 아키텍처를 여러 리전에서 동시에 가격 조회하여 리전 × 서비스 비용 행렬 생성"""
+        regions = regions or list(REGION_LOCATIONS)
+
+        # (리전, 서비스, 타입) 조합별로 한 번씩만 조회
+        lookups = sorted({(region, service['name'], service['type']) for region in regions for service in services})
+
+        def lookup(key):
+            region, service_name, service_type = key
+            if deadline_near('compare_regions', PRICING_CALL_RESERVE):
+                return self.get_cached_pricing(service_name, service_type, region)
+            return self.get_pricing(service_name, service_type, region)
+
+        with ThreadPoolExecutor(max_workers=REGION_PRICE_WORKERS) as executor:
+            prices = dict(zip(lookups, executor.map(with_deadline(lookup), lookups)))
+
+        matrix = []
+        region_totals = []
+        for region in regions:
+            row = []
+            for service in services:
+                unit_cost = prices[(region, service['name'], service['type'])]
+                row.append(unit_cost * service.get('quantity', 1) if unit_cost is not None else None)
+            matrix.append(row)
+
+            # 모든 서비스 가격이 있는 리전만 비교 대상
+            priced = all(cost is not None for cost in row)
+            total = sum(cost for cost in row if cost is not None)
+            region_totals.append({
+                'region': region,
+                'total_cost': round(total, 2),
+                'fully_priced': priced,
+                'feasible': priced and (budget is None or total <= budget)
+            })
+
+        feasible_regions = [entry for entry in region_totals if entry['feasible']]
+        cheapest = min(feasible_regions, key=lambda x: x['total_cost'])['region'] if feasible_regions else None
+
+        logger.info("Region comparison: %d regions x %d services, cheapest feasible: %s", len(regions), len(services), cheapest)
+
+        return {
+            'regions': regions,
+            'services': [{'name': s['name'], 'type': s['type'], 'quantity': s.get('quantity', 1)} for s in services],
+            'matrix': matrix,
+            'region_totals': region_totals,
+            'cheapest_feasible_region': cheapest,
+            'budget': budget
+        }
+
     def step3_budget_disaster_optimization(self, priced_services, budget, service_type='', users='', performance='', additional_info='', region='us-east-1', request_uuid=None):
         """3단계: 예산 내 재해대비 최적 서비스 조합 추천"""
+        if deadline_near('step3', BEDROCK_CALL_RESERVE):
+            return self._fallback_disaster_optimization(priced_services, budget)
+        
         try:
-            # 서비스 옵션 정보를 AI에게 전달
-            services_info = []
-            for service in priced_services:
-                service_options = []
-                for option in service['options']:
-                    service_options.append(f"{option['type']}: ${option['monthly_cost']}/월")
+            with metrics.span('stage', stage='step3'):
+                # 서비스 옵션 정보를 AI에게 전달
+                services_info = []
+                for service in priced_services:
+                    service_options = []
+                    for option in service['options']:
+                        service_options.append(f"{option['type']}: ${option['monthly_cost']}/월")
                 
-                services_info.append({
-                    'name': service['name'],
-                    'reason': service['reason'],
-                    'options': service_options
-                })
+                    services_info.append({
+                        'name': service['name'],
+                        'reason': service['reason'],
+                        'options': service_options
+                    })
             
-            bedrock_prompt = f"""
+                bedrock_prompt = f"""
             AWS 서비스 최적화 요청:
             - 예산: ${budget}/월
             - 서비스와 가격 옵션:
@@ -506,48 +941,36 @@ class AWSOptimizer:
             }}
             """
             
-            body = json.dumps({
-                "messages": [{
-                    "role": "user", 
-                    "content": [{"text": bedrock_prompt}]
-                }],
-                "inferenceConfig": {
-                    "max_new_tokens": 32768,
-                    "temperature": 0.12
-                }
-            })
+                body = json.dumps({
+                    "messages": [{
+                        "role": "user", 
+                        "content": [{"text": bedrock_prompt}]
+                    }],
+                    "inferenceConfig": {
+                        "max_new_tokens": 32768,
+                        "temperature": 0.12
+                    }
+                })
             
-            response = bedrock.invoke_model(
-                modelId="us.amazon.nova-premier-v1:0",
-                body=body,
-                contentType="application/json"
-            )
+                response = invoke_bedrock(body)
 
-            result = json.loads(response['body'].read())
-            content = result['output']['message']['content'][0]['text']
+                result = json.loads(response['body'].read())
+                content = result['output']['message']['content'][0]['text']
             
-            # ```json 블록에서 JSON 추출
-            if '```json' in content:
-                start = content.find('```json') + 7
-                end = content.find('```', start)
-                json_str = content[start:end].strip()
-            else:
-                start = content.find('{')
-                end = content.rfind('}') + 1
-                json_str = content[start:end]
-            
-            optimization = json.loads(json_str)
+                optimization = parse_model_json(content, STEP3_SCHEMA, 'step3', repair=repair_model_output)
 
-            update_status(request_uuid, 'step3_complete')
+                update_status(request_uuid, 'step3_complete')
             
             # Step 4: 정확한 가격 계산 및 검증
-            selected_services = self.step4_calculate_exact_costs(optimization['disaster_ready_services'], priced_services)
+            with metrics.span('stage', stage='step4'):
+                selected_services = self.step4_calculate_exact_costs(optimization['disaster_ready_services'], priced_services)
             total_cost = sum(service['total_monthly_cost'] for service in selected_services)
             
             return selected_services, total_cost
                 
         except Exception as e:
-            print(f"Step 3 disaster-ready optimization failed: {e}")
+            logger.warning("Step 3 disaster-ready optimization failed: %s", e)
+            metrics.failure('step3')
         
         # AI 실패 시 기본 재해대비 최적화
         return self._fallback_disaster_optimization(priced_services, budget)
@@ -556,7 +979,7 @@ class AWSOptimizer:
         """4단계: 선택된 서비스들의 정확한 비용 계산"""
         calculated_services = []
         
-        print("\n=== Step 4: Calculating Exact Costs ===")
+        logger.debug("Step 4: calculating exact costs")
         
         for selected in selected_services:
             service_name = selected['name']
@@ -581,11 +1004,11 @@ class AWSOptimizer:
                 if unit_cost is None:
                     # 선택된 타입이 없으면 가장 가까운 가격 사용
                     unit_cost = found_service['options'][0]['monthly_cost'] if found_service['options'] else "pricing unavailable"
-                    print(f"  Warning: {selected_type} not found for {service_name}, using fallback: ${unit_cost}")
+                    logger.info("%s not found for %s, using fallback: $%s", selected_type, service_name, unit_cost)
             else:
                 # 서비스를 찾을 수 없으면 폴백 가격 사용
                 unit_cost = self.fallback_costs.get(service_name, {}).get(selected_type, "pricing unavailable")
-                print(f"  Warning: Service {service_name} not found, using fallback: ${unit_cost}")
+                logger.info("Service %s not found, using fallback: $%s", service_name, unit_cost)
             
             # 총 비용 계산 (단가 × 수량)
             if unit_cost == "pricing unavailable":
@@ -604,16 +1027,20 @@ class AWSOptimizer:
             
             calculated_services.append(calculated_service)
             
-            print(f"  {service_name} ({selected_type}): ${unit_cost}/월 × {quantity}대 = ${total_cost}/월")
+            log_sampled(logger, logging.DEBUG, "%s (%s): $%s/month x %s = $%s/month", service_name, selected_type, unit_cost, quantity, total_cost)
         
         total_monthly_cost = sum(service['total_monthly_cost'] for service in calculated_services if isinstance(service['total_monthly_cost'], (int, float)))
-        print(f"\n  Total Monthly Cost: ${total_monthly_cost:.2f}")
-        print("=== Step 4 Complete ===\n")
+        logger.info("Step 4 complete: total monthly cost $%.2f", total_monthly_cost)
         
         return calculated_services
     
     def step5_user_based_cost_calculation(self, calculated_services, users):
         """5단계: 예상 사용자 수에 맞는 Unit당 Cost 기반 Monthly Cost 재계산"""
+        if deadline_near('step5', BEDROCK_CALL_RESERVE):
+            metrics.fallback('step5')
+            total_cost = sum(service['total_monthly_cost'] for service in calculated_services if isinstance(service['total_monthly_cost'], (int, float)))
+            return calculated_services, total_cost
+        
         try:
             # AI에게 사용자 수 기반 비용 재계산 요청
             services_info = []
@@ -679,54 +1106,43 @@ class AWSOptimizer:
                 }
             })
             
-            response = bedrock.invoke_model(
-                modelId="us.amazon.nova-premier-v1:0",
-                body=body,
-                contentType="application/json"
-            )
+            response = invoke_bedrock(body)
             
             result = json.loads(response['body'].read())
             content = result['output']['message']['content'][0]['text']
             
-            # ```json 블록에서 JSON 추출
-            if '```json' in content:
-                start = content.find('```json') + 7
-                end = content.find('```', start)
-                json_str = content[start:end].strip()
-            else:
-                start = content.find('{')
-                end = content.rfind('}') + 1
-                json_str = content[start:end]
-            
-            recalculation = json.loads(json_str)
+            recalculation = parse_model_json(content, RECALCULATION_SCHEMA, 'step5', repair=repair_model_output)
             recalculated_services = recalculation['recalculated_services']
             total_cost = recalculation['total_cost']
             
-            print("\n=== Step 5: User-Based Cost Recalculation ===")
-            print(f"Expected Users: {users}")
-            print(f"Cost Explanation: {recalculation.get('cost_explanation', '')}")
+            logger.info("Step 5: user-based cost recalculation", extra={'fields': {
+                'users': users,
+                'cost_explanation': recalculation.get('cost_explanation', '')
+            }})
             
             for service in recalculated_services:
                 usage_cost = service.get('user_based_usage_cost', 0)
-                print(f"  {service['name']}: Base ${service['unit_monthly_cost']}/월 + Usage ${usage_cost}/월 = ${service['total_monthly_cost']}/월")
+                log_sampled(logger, logging.DEBUG, "%s: base $%s/month + usage $%s/month = $%s/month", service['name'], service['unit_monthly_cost'], usage_cost, service['total_monthly_cost'])
             
-            print(f"\n  Recalculated Total Cost: ${total_cost:.2f}/월")
-            print("=== Step 5 Complete ===\n")
+            logger.info("Step 5 complete: recalculated total cost $%.2f/month", total_cost)
             
             return recalculated_services, total_cost
             
         except Exception as e:
-            print(f"Step 5 user-based cost calculation failed: {e}")
+            logger.warning("Step 5 user-based cost calculation failed: %s", e)
+            metrics.failure('step5')
             # 폴백: 기존 비용 그대로 반환
+            metrics.fallback('step5')
             total_cost = sum(service['total_monthly_cost'] for service in calculated_services if isinstance(service['total_monthly_cost'], (int, float)))
             return calculated_services, total_cost
     
     def _fallback_disaster_optimization(self, priced_services, budget):
         """기본 재해대비 최적화 로직"""
+        metrics.fallback('step3')
         optimized = []
         total_cost = 0
         
-        print("\n=== Using Fallback Disaster Optimization ===")
+        logger.info("Using fallback disaster optimization")
         
         # 재해대비 우선순위: CDN > 로드밸런서 > Auto Scaling > 모니터링
         priority_services = ['AmazonCloudFront', 'ElasticLoadBalancingV2', 'AmazonEC2', 'AmazonCloudWatch']
@@ -751,7 +1167,7 @@ class AWSOptimizer:
                             'reason': f"{mid_option['reason']} (재해대비)"
                         })
                         total_cost += total_service_cost
-                        print(f"  Added {service['name']} ({mid_option['type']}): ${unit_cost} × {quantity} = ${total_service_cost}")
+                        logger.debug("Fallback added %s (%s): $%s x %s = $%s", service['name'], mid_option['type'], unit_cost, quantity, total_service_cost)
                     break
         
         # 나머지 서비스 처리
@@ -768,48 +1184,90 @@ class AWSOptimizer:
                         'reason': cheapest['reason']
                     })
                     total_cost += cheapest['monthly_cost']
-                    print(f"  Added {service['name']} ({cheapest['type']}): ${cheapest['monthly_cost']}")
+                    logger.debug("Fallback added %s (%s): $%s", service['name'], cheapest['type'], cheapest['monthly_cost'])
         
-        print(f"  Fallback Total: ${total_cost}")
-        print("=== Fallback Complete ===\n")
+        logger.info("Fallback optimization complete: total $%s", total_cost)
         
         return optimized, total_cost
     
-    def analyze_requirements(self, service_type, users, performance, additional_info, budget, region='us-east-1', request_uuid=None):
-        """5단계 재해대비 최적화 프로세스 실행"""
-        print(f"\n{'='*60}")
-        print(f"Starting 5-Step AWS Architecture Optimization")
-        print(f"Budget: ${budget}/month | Region: {region}")
-        print(f"{'='*60}")
+    def analyze_requirements(self, service_type, users, performance, additional_info, budget, region='us-east-1', request_uuid=None, reuse_artifacts=None):
+        """5단계 재해대비 최적화 프로세스 실행 (reuse_artifacts가 있으면 해당 단계 결과 재사용)"""
+        logger.info("Starting 5-step AWS architecture optimization", extra={'fields': {'budget': budget, 'region': region}})
+        
+        priced_services = self.prepare_priced_services(service_type, users, performance, additional_info, region, request_uuid, reuse_artifacts)
+        return self.plan_for_budget(priced_services, budget, service_type, users, performance, additional_info, region, request_uuid)
+    
+    def prepare_priced_services(self, service_type, users, performance, additional_info, region='us-east-1', request_uuid=None, reuse_artifacts=None):
+        """1, 2단계: 예산과 무관한 서비스 목록 추출 및 가격 조회"""
+        reuse_artifacts = reuse_artifacts or {}
+        input_hash = artifact_input_hash({
+            'service_type': service_type,
+            'users': users,
+            'performance': performance,
+            'additional_info': additional_info,
+            'region': region
+        })
         
         # 1단계: 재해상황 대비 필수 서비스 목록 추출
-        required_services = self.step1_disaster_ready_services(service_type, users, performance, additional_info, region)
+        if 'step1' in reuse_artifacts:
+            required_services = reuse_artifacts['step1']
+            logger.info("Reusing step 1 output: %d services", len(required_services))
+        else:
+            with metrics.span('stage', stage='step1'):
+                required_services = self.step1_disaster_ready_services(service_type, users, performance, additional_info, region)
+        self.remember_step1_services(required_services)
+        store_artifact(request_uuid, 'step1', input_hash, required_services)
+        publish_partial(request_uuid, 'services', required_services)
         update_status(request_uuid, 'step1_complete')
         
-        # 2단계: 서비스별 가격 조회
-        priced_services = self.step2_get_service_prices(required_services, region)
+        # 2단계: 서비스별 가격 조회 (서비스마다 끝나는 즉시 /status 에 노출)
+        if 'step2' in reuse_artifacts:
+            priced_services = reuse_artifacts['step2']
+            logger.info("Reusing step 2 output: %d priced services", len(priced_services))
+            publish_partial(request_uuid, 'prices', {service['name']: service['options'] for service in priced_services})
+        else:
+            on_service_priced = (lambda name, options: publish_partial(request_uuid, 'prices', {name: options})) if request_uuid else None
+            with metrics.span('stage', stage='step2'):
+                priced_services = self.step2_get_service_prices(required_services, region, on_service_priced)
+        store_artifact(request_uuid, 'step2', input_hash, priced_services)
         update_status(request_uuid, 'step2_complete')
         
+        return priced_services
+    
+    def plan_for_budget(self, priced_services, budget, service_type, users, performance, additional_info, region='us-east-1', request_uuid=None):
+        """3~5단계: 주어진 예산에 대한 서비스 조합 선택 및 비용 계산"""
         # 3단계: 예산 내 재해대비 최적 조합 추천 + 4단계: 정확한 비용 계산
+        # stage 스팬은 메서드 안에서 3단계가 끝난 뒤 4단계를 따로 잰다 (4단계 시간이 step3 에 겹치지 않도록)
         optimized_services, initial_cost = self.step3_budget_disaster_optimization(priced_services, budget, service_type, users, performance, additional_info, region, request_uuid)
+        publish_partial(request_uuid, 'plan', {'stage': 'step4', 'services': optimized_services, 'total_cost': initial_cost, 'budget': budget})
         update_status(request_uuid, 'step4_complete')
 
         # 5단계: 사용자 수 기반 비용 재계산
-        final_services, total_cost = self.step5_user_based_cost_calculation(optimized_services, users)
+        with metrics.span('stage', stage='step5'):
+            final_services, total_cost = self.step5_user_based_cost_calculation(optimized_services, users)
+        publish_partial(request_uuid, 'plan', {'stage': 'step5', 'services': final_services, 'total_cost': total_cost, 'budget': budget})
         update_status(request_uuid, 'step5_complete')
         
-        print(f"\n{'='*60}")
-        print(f"Optimization Complete!")
-        print(f"Selected {len(final_services)} services")
-        print(f"Initial Cost: ${initial_cost:.2f}/month")
-        print(f"User-Adjusted Cost: ${total_cost:.2f}/month")
-        print(f"Budget Utilization: {((total_cost/budget)*100) if budget > 0 else 0:.1f}%")
-        print(f"{'='*60}\n")
+        logger.info("Optimization complete", extra={'fields': {
+            'services': len(final_services),
+            'initial_cost': round(initial_cost, 2),
+            'total_cost': round(total_cost, 2),
+            'budget_utilization': round((total_cost/budget)*100, 1) if budget > 0 else 0
+        }})
         
         return final_services, total_cost
     
+    def remember_step1_services(self, services):
+        """최근 1단계 결과 서비스 이름 기록 (최대 RECENT_STEP1_LIMIT개)"""
+        with self.recent_lock:
+            for service in services:
+                self.recent_step1_services.pop(service['name'], None)
+                self.recent_step1_services[service['name']] = time.time()
+            while len(self.recent_step1_services) > RECENT_STEP1_LIMIT:
+                self.recent_step1_services.pop(next(iter(self.recent_step1_services)))
+    
     def _fallback_disaster_services(self, service_type):
-        """AI 실패 시 기본 재해대비 서비스 목록"""
+        """AI 실패 시 기본 재해대비 서비스 목록 (폴백 지표는 호출한 1단계에서 기록)"""
         base_disaster_services = [
             {'name': 'AmazonCloudFront', 'reason': 'CDN으로 트래픽 분산 및 DDoS 보호'},
             {'name': 'ElasticLoadBalancingV2', 'reason': '로드밸런서로 트래픽 분산'},
@@ -840,21 +1298,68 @@ class AWSOptimizer:
                 {'name': 'AmazonS3', 'reason': '백업 및 저장소'}
             ]
 
-optimizer = AWSOptimizer()
+optimizer = AWSOptimizer(price_catalog)
+
+def warmup_service_names():
+    """가격 사전 로딩 대상: 폴백 서비스 목록 + 최근 1단계 결과"""
+    names = set()
+    for service_type in ['웹사이트', '데이터베이스', '머신러닝', '']:
+        names.update(service['name'] for service in optimizer._fallback_disaster_services(service_type))
+    names.update(load_recent_step1_services())
+    with optimizer.recent_lock:
+        names.update(optimizer.recent_step1_services)
+    return sorted(names)
 
-def store_request(request_uuid, request_data, response_data=None, status='pending'):
+def load_recent_step1_services(limit=100):
+    """DB에 저장된 최근 1단계 결과에서 서비스 이름 수집 (재시작 후에도 사전 로딩 대상 유지)"""
     try:
         conn = get_db_connection()
+        if not conn:
+            return set()
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            SELECT data FROM job_artifacts
+            WHERE stage = 'step1'
+            ORDER BY created_at DESC
+            LIMIT %s
+        ''', (limit,))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        return {service['name'] for row in rows for service in json.loads(row[0])}
+    except Exception as e:
+        logger.warning("Recent step 1 services load failed: %s", e)
+        return set()
+
+price_refresher = PriceRefresher(optimizer, warmup_service_names, PRICE_WARMUP_REGIONS, PRICE_REFRESH_INTERVAL, PRICE_WARMUP_WORKERS)
+
+def store_in_memory(request_uuid, request_data, response_data, status):
+    previous = memory_storage.get(request_uuid, {})
+    memory_storage[request_uuid] = {
+        'request_data': request_data,
+        'response_data': response_data,
+        'status': status,
+        'created_at': previous.get('created_at', datetime.utcnow().isoformat()),
+        'events': previous.get('events', []),
+        'artifacts': previous.get('artifacts', {})
+    }
+
+@metrics.timed('db', operation='store_request')
+def store_request(request_uuid, request_data, response_data=None, status='pending', connect=None):
+    """요청 상태 저장 (DB에 기록하면 True, DB를 쓸 수 없어 메모리에 저장하면 False)"""
+    if status in ('completed', 'failed', 'cancelled') and isinstance(response_data, dict):
+        waited = queue_waits.pop(request_uuid, None)
+        if waited is not None:
+            response_data['queue_wait_seconds'] = waited
+    try:
+        conn = (connect or get_db_connection)()
         if not conn:
             # 메모리 저장소 사용
-            memory_storage[request_uuid] = {
-                'request_data': request_data,
-                'response_data': response_data,
-                'status': status,
-                'created_at': datetime.utcnow().isoformat()
-            }
-            print(f"Stored in memory: {request_uuid}")
-            return
+            store_in_memory(request_uuid, request_data, response_data, status)
+            logger.debug("Stored in memory: %s", request_uuid)
+            return False
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -868,52 +1373,198 @@ def store_request(request_uuid, request_data, response_data=None, status='pendin
         
         conn.commit()
         conn.close()
+        return True
     except Exception as e:
-        print(f"Database store failed: {e}")
+        logger.warning("Database store failed: %s", e)
+        metrics.failure('db')
         # 메모리 저장소 사용
-        memory_storage[request_uuid] = {
-            'request_data': request_data,
-            'response_data': response_data,
-            'status': status,
-            'created_at': datetime.utcnow().isoformat()
-        }
+        store_in_memory(request_uuid, request_data, response_data, status)
+        return False
+
+class JobEventBuffer:
+    """작업 단계 이벤트를 메모리에 모았다가 job_events 테이블에 배치로 기록"""
+    def __init__(self, flush_size=EVENT_FLUSH_SIZE, flush_interval=EVENT_FLUSH_INTERVAL):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.progress = {}  # uuid -> (최근 단계, 시각)
+        self.lock = Lock()
+        self.wakeup = Event()
+        self.flusher = None
+
+    def add(self, request_uuid, step, payload=None):
+        now = time.time()
+        with self.lock:
+            event_payload = dict(payload or {})
+            previous = self.progress.get(request_uuid)
+            if previous:
+                event_payload['duration'] = round(now - previous[1], 3)
+            self.progress[request_uuid] = (step, now)
+            self.pending.append((request_uuid, step, now, event_payload))
+            should_flush = len(self.pending) >= self.flush_size
+            if self.flusher is None:
+                self.flusher = Thread(target=self._run, daemon=True)
+                self.flusher.start()
+        if should_flush:
+            self.wakeup.set()
+
+    def current_step(self, request_uuid):
+        with self.lock:
+            entry = self.progress.get(request_uuid)
+        return entry[0] if entry else None
+
+    def finish(self, request_uuid):
+        """작업 종료 시 남은 이벤트를 기록하고 진행 상태 정리"""
+        self.flush()
+        with self.lock:
+            self.progress.pop(request_uuid, None)
+
+    def flush(self):
+        with self.lock:
+            batch, self.pending = self.pending, []
+        if not batch:
+            return
+
+        with metrics.span('db', operation='flush_events'):
+            self._write(batch)
 
-def update_status(request_uuid, status):
+    def _write(self, batch):
+        rows = [
+            (request_uuid, step, datetime.utcfromtimestamp(ts), json.dumps(payload) if payload else None)
+            for request_uuid, step, ts, payload in batch
+        ]
+        try:
+            conn = get_db_connection()
+            if not conn:
+                self._store_in_memory(batch)
+                return
+            cursor = conn.cursor()
+
+            cursor.executemany('''
+                INSERT INTO job_events (uuid, step, created_at, payload)
+                VALUES (%s, %s, %s, %s)
+            ''', rows)
+
+            conn.commit()
+            conn.close()
+        except Exception as e:
+            logger.warning("Event flush failed: %s", e)
+            self._store_in_memory(batch)
+
+    def _store_in_memory(self, batch):
+        for request_uuid, step, ts, payload in batch:
+            event = {
+                'step': step,
+                'created_at': datetime.utcfromtimestamp(ts).isoformat(),
+                'payload': payload or None
+            }
+            memory_storage.modify(request_uuid, lambda entry: entry.setdefault('events', []).append(event))
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+event_buffer = JobEventBuffer()
+
+# 진행 중인 작업의 최근 단계 (다른 워커 프로세스가 /status 요청을 받아도 같은 단계를 보이도록 공유)
+job_steps = SharedDict(shared_store, 'job_steps', ttl=JOB_TIMEOUT_MAX, l1_ttl=0)
+
+# 진행 중인 작업의 단계별 부분 결과 (/status 의 partial_results, 작업 종료 시 삭제)
+job_partials = SharedDict(shared_store, 'job_partials', ttl=JOB_TIMEOUT_MAX, l1_ttl=0)
+
+def publish_partial(request_uuid, key, value):
+    """단계 결과를 끝나는 즉시 공개: services(1단계 목록), prices(서비스별 2단계 가격, 추가 병합), plan(3/4단계, 5단계 구성)"""
+    if not request_uuid:
+        return
+    job_partials.setdefault(request_uuid, {'services': None, 'prices': {}, 'plan': None})
+
+    def update(partial):
+        if key == 'prices':
+            partial['prices'].update(value)
+        else:
+            partial[key] = value
+        partial['updated_at'] = datetime.utcnow().isoformat()
+
+    job_partials.modify(request_uuid, update)
+
+def with_partial_results(result, request_uuid):
+    """진행 중인 작업 조회 결과에 부분 결과 추가"""
+    partial = job_partials.get(request_uuid)
+    if partial:
+        result = dict(result, partial_results=partial)
+    return result
+
+def update_status(request_uuid, status, payload=None):
+    """진행 단계 기록 (requests 행은 시작/종료 시에만 갱신, 중간 단계는 이벤트 버퍼로)"""
+    if not request_uuid:
+        return
+    event_buffer.add(request_uuid, status, payload)
+    if status in ('completed', 'failed', 'cancelled'):
+        metrics.registry.inc('clops_jobs_total', {'status': status})
+    memory_storage.modify(request_uuid, lambda entry: entry.update(status=status))
+    if status in ('completed', 'failed', 'cancelled'):
+        job_steps.pop(request_uuid, None)
+        job_partials.pop(request_uuid, None)
+    else:
+        job_steps[request_uuid] = status
+
+@metrics.timed('db', operation='get_events')
+def get_events(request_uuid):
+    """작업의 단계별 이벤트 이력 조회"""
+    event_buffer.flush()
     try:
         conn = get_db_connection()
         if not conn:
-            # 메모리 저장소에서 업데이트
-            if request_uuid in memory_storage:
-                memory_storage[request_uuid]['status'] = status
-            return
-        cursor = conn.cursor()
-        
+            return memory_storage.get(request_uuid, {}).get('events', [])
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+
         cursor.execute('''
-            UPDATE requests
-            SET status = %s, updated_at = CURRENT_TIMESTAMP
-            WHERE uuid = %s
-        ''', (status, request_uuid))
-        
-        conn.commit()
+            SELECT step, created_at, payload FROM job_events
+            WHERE uuid = %s ORDER BY created_at, id
+        ''', (request_uuid,))
+        rows = cursor.fetchall()
+
         conn.close()
+
+        return [{
+            'step': row['step'],
+            'created_at': row['created_at'].isoformat(),
+            'payload': json.loads(row['payload']) if row['payload'] else None
+        } for row in rows]
     except Exception as e:
-        print(f"Database update failed: {e}")
-        # 메모리 저장소에서 업데이트
-        if request_uuid in memory_storage:
-            memory_storage[request_uuid]['status'] = status
+        logger.warning("Database events get failed: %s", e)
+        return memory_storage.get(request_uuid, {}).get('events', [])
 
+@metrics.timed('db', operation='get_request')
 def get_request(request_uuid):
     try:
         conn = get_db_connection()
         if not conn:
             # 메모리 저장소에서 검색
             if request_uuid in memory_storage:
-                return memory_storage[request_uuid]
+                return with_partial_results(memory_storage[request_uuid], request_uuid)
             return {'status': 'not_found'}
         cursor = conn.cursor(pymysql.cursors.DictCursor)
         
         cursor.execute('SELECT * FROM requests WHERE uuid = %s', (request_uuid,))
         result = cursor.fetchone()
+
+        if not result:
+            # 보존 기간이 지나 아카이브된 요청
+            cursor.execute('SELECT * FROM requests_archive WHERE uuid = %s', (request_uuid,))
+            archived = cursor.fetchone()
+            conn.close()
+            if archived:
+                return {
+                    'status': 'archived',
+                    'original_status': archived['status'],
+                    'created_at': archived['created_at'].isoformat(),
+                    'archived_at': archived['archived_at'].isoformat(),
+                    'archive_file': archived['archive_file']
+                }
+            return None
         
         conn.close()
         
@@ -921,19 +1572,166 @@ def get_request(request_uuid):
             result['request_data'] = json.loads(result['request_data'])
             if result['response_data']:
                 result['response_data'] = json.loads(result['response_data'])
+            # 진행 중인 작업은 버퍼의 최신 단계를 상태로 노출
+            if result['status'] == 'processing':
+                result['status'] = event_buffer.current_step(request_uuid) or job_steps.get(request_uuid) or result['status']
+                result['queue_wait_seconds'] = queue_waits.get(request_uuid)
+                result = with_partial_results(result, request_uuid)
+            elif result['status'] == 'queued':
+                result['queue_wait_seconds'] = round((datetime.utcnow() - result['created_at']).total_seconds(), 3)
         
         return result
     except Exception as e:
-        print(f"Database get failed: {e}")
+        logger.warning("Database get failed: %s", e)
+        metrics.failure('db')
         # 메모리 저장소에서 검색
         if request_uuid in memory_storage:
-            return memory_storage[request_uuid]
+            return with_partial_results(memory_storage[request_uuid], request_uuid)
         return {'status': 'error', 'message': 'Database error'}
 
+ARTIFACT_INPUT_FIELDS = ['service_type', 'users', 'performance', 'additional_info', 'region']
+
+def artifact_input_hash(request_data):
+    """1, 2단계 결과가 의존하는 입력값의 해시 (예산은 포함하지 않음)"""
+    key = json.dumps({field: request_data.get(field) for field in ARTIFACT_INPUT_FIELDS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+@metrics.timed('db', operation='store_artifact')
+def store_artifact(request_uuid, stage, input_hash, data):
+    """단계별 중간 결과 저장 (재최적화 시 재사용)"""
+    if not request_uuid:
+        return
+    try:
+        conn = get_db_connection()
+        if not conn:
+            memory_storage.modify(request_uuid, lambda entry: entry['artifacts'].update({stage: {'input_hash': input_hash, 'data': data}}))
+            return
+        cursor = conn.cursor()
+        
+        cursor.execute('''
+            INSERT INTO job_artifacts (uuid, stage, input_hash, data)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+            input_hash = VALUES(input_hash),
+            data = VALUES(data)
+        ''', (request_uuid, stage, input_hash, json.dumps(data, ensure_ascii=False)))
+        
+        conn.commit()
+        conn.close()
+    except Exception as e:
+        logger.warning("Artifact store failed: %s", e)
+        memory_storage.modify(request_uuid, lambda entry: entry['artifacts'].update({stage: {'input_hash': input_hash, 'data': data}}))
+
+@metrics.timed('db', operation='load_artifacts')
+def load_artifacts(request_uuid):
+    """요청의 단계별 중간 결과 조회: {stage: {'input_hash', 'data'}}"""
+    try:
+        conn = get_db_connection()
+        if not conn:
+            return memory_storage.get(request_uuid, {}).get('artifacts', {})
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        
+        cursor.execute('SELECT stage, input_hash, data FROM job_artifacts WHERE uuid = %s', (request_uuid,))
+        rows = cursor.fetchall()
+        
+        conn.close()
+        
+        return {row['stage']: {'input_hash': row['input_hash'], 'data': json.loads(row['data'])} for row in rows}
+    except Exception as e:
+        logger.warning("Artifact load failed: %s", e)
+        return memory_storage.get(request_uuid, {}).get('artifacts', {})
+
+@metrics.timed('db', operation='archive')
+def archive_expired_requests():
+    """보존 기간이 지난 요청을 압축 파일로 아카이브하고 requests 테이블에서 제거"""
+    archived_total = 0
+    now = datetime.utcnow()
+
+    # 메모리 저장소/공유 캐시/만료된 Idempotency-Key 정리
+    shared_store.purge_expired()
+    idempotency.purge_expired()
+    for request_uuid, entry in list(memory_storage.items()):
+        days = RETENTION_DAYS.get(entry.get('status'), RETENTION_DAYS['processing'])
+        created_at = datetime.fromisoformat(entry['created_at'])
+        if days > 0 and created_at < now - timedelta(days=days):
+            memory_storage.pop(request_uuid, None)
+
+    conn = get_db_connection()
+    if not conn:
+        return 0
+
+    try:
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+
+        for status, days in RETENTION_DAYS.items():
+            if days <= 0:
+                continue
+            cutoff = now - timedelta(days=days)
+
+            while True:
+                cursor.execute('''
+                    SELECT * FROM requests
+                    WHERE status = %s AND created_at < %s
+                    ORDER BY created_at
+                    LIMIT %s
+                ''', (status, cutoff, RETENTION_BATCH_SIZE))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                archive_file = os.path.join(ARCHIVE_DIR, f"requests-{status}-{now.strftime('%Y%m%d%H%M%S')}-{archived_total}.jsonl.gz")
+                with gzip.open(archive_file, 'wt', encoding='utf-8') as f:
+                    for row in rows:
+                        f.write(json.dumps({
+                            'uuid': row['uuid'],
+                            'status': row['status'],
+                            'request_data': json.loads(row['request_data']),
+                            'response_data': json.loads(row['response_data']) if row['response_data'] else None,
+                            'created_at': row['created_at'].isoformat(),
+                            'updated_at': row['updated_at'].isoformat() if row['updated_at'] else None
+                        }, ensure_ascii=False) + '\n')
+
+                uuids = [row['uuid'] for row in rows]
+                placeholders = ', '.join(['%s'] * len(uuids))
+                cursor.executemany('''
+                    INSERT INTO requests_archive (uuid, status, created_at, updated_at, archive_file)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE archive_file = VALUES(archive_file)
+                ''', [(row['uuid'], row['status'], row['created_at'], row['updated_at'], os.path.basename(archive_file)) for row in rows])
+                cursor.execute(f'DELETE FROM job_events WHERE uuid IN ({placeholders})', uuids)
+                cursor.execute(f'DELETE FROM job_artifacts WHERE uuid IN ({placeholders})', uuids)
+                cursor.execute(f'DELETE FROM requests WHERE uuid IN ({placeholders})', uuids)
+                conn.commit()
+
+                archived_total += len(rows)
+                logger.info("Archived %d %s requests to %s", len(rows), status, archive_file)
+    except Exception as e:
+        conn.rollback()
+        logger.exception("Request archival failed: %s", e)
+    finally:
+        conn.close()
+
+    return archived_total
+
+def start_retention_worker():
+    """백그라운드에서 주기적으로 보존 기간 정리 실행"""
+    def run():
+        while True:
+            try:
+                archive_expired_requests()
+            except Exception as e:
+                logger.exception("Retention job failed: %s", e)
+            time.sleep(RETENTION_INTERVAL)
+
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
 
 def try_to_squeeze_budget(services, budget, service_type, users, performance, additional_info, region):
     """예산 초과 시, 예산 내로 맞추기 위한 재최적화 시도"""
-    print("\n=== Attempting to Squeeze Budget ===")
+    logger.info("Attempting to squeeze budget", extra={'fields': {'budget': budget}})
     
     # AI 활용하여 예산 안으로 맞추기 시도.
     # 혹시 가능하다면, 서비스 수량 조정, 더 저렴한 옵션 선택 등.
@@ -992,101 +1790,460 @@ def try_to_squeeze_budget(services, budget, service_type, users, performance, ad
                 }
             })
             
-    response = bedrock.invoke_model(
-        modelId="us.amazon.nova-premier-v1:0",
-        body=body,
-        contentType="application/json"
-    )
+    response = invoke_bedrock(body)
 
     result = json.loads(response['body'].read())
-    print(result)
+    logger.debug("Squeeze raw response: %s", result)
     res = result['output']['message']['content'][0]['text']
             
-            # ```json 블록에서 JSON 추출
-    if '```json' in res:
-        start = res.find('```json') + 7
-        end = res.find('```', start)
-        json_str = res[start:end].strip()
-    else:
-        start = res.find('{')
-        end = res.rfind('}') + 1
-        json_str = res[start:end]
-        
-    recalculation = json.loads(json_str)
+    recalculation = parse_model_json(res, RECALCULATION_SCHEMA, 'squeeze', repair=repair_model_output)
     recalculated_services = recalculation['recalculated_services']
     total_cost = recalculation['total_cost']
             
-    print("\n=== Step 6: squeeze ===")
-    print(f"Expected Users: {users}")
-    print(f"Cost Explanation: {recalculation.get('cost_explanation', '')}")
-            
-    print(f"\n  Recalculated Total Cost: ${total_cost:.2f}/월")
-    print("=== Step 6 Complete ===\n")
-                        
-    print(f"\n  Recalculated Total Cost: ${total_cost:.2f}/월")
-    print("=== Step 6 Complete ===\n")
+    logger.info("Squeeze complete: recalculated total cost $%.2f/month", total_cost, extra={'fields': {
+        'users': users,
+        'cost_explanation': recalculation.get('cost_explanation', '')
+    }})
             
     return recalculated_services, total_cost
 
 
 
 
-def process_optimization(request_uuid, service_type, users, performance, additional_info, budget, region):
-    try:
-        request_data = {
-            'service_type': service_type,
-            'users': users,
-            'performance': performance,
-            'additional_info': additional_info,
-            'budget': budget,
-            'region': region
+def finalize_plan(optimized_services, total_cost, budget, service_type, users, performance, additional_info, region):
+    """예산 초과 시 재최적화 후 응답 데이터 생성"""
+    feasible = total_cost <= budget
+
+    if not feasible and not deadline_near('squeeze', BEDROCK_CALL_RESERVE):
+        logger.info("Total cost $%.2f exceeds budget $%.2f", total_cost, budget)
+        try:
+            with metrics.span('stage', stage='squeeze'):
+                optimized_services, total_cost = try_to_squeeze_budget(optimized_services, budget, service_type, users, performance, additional_info, region)
+        except StructuredOutputError as e:
+            # 수리 후에도 형식이 맞지 않으면 재최적화 전 구성을 그대로 반환
+            logger.warning("Budget squeeze output unusable, keeping current plan: %s", e)
+            metrics.failure('squeeze')
+            metrics.fallback('squeeze')
+        except Exception as e:
+            # Bedrock 호출 실패(재시도 소진, 슬롯 대기 시간 초과 등)도 이미 계산된 구성으로 응답 (취소는 JobCancelled 로 전달)
+            logger.warning("Budget squeeze failed, keeping current plan: %s", e)
+            metrics.failure('squeeze')
+            metrics.fallback('squeeze')
+    
+    # 서비스별 상세 비용 정보 포함
+    services_summary = []
+    for service in optimized_services:
+        services_summary.append({
+            'name': service['name'],
+            'type': service['type'],
+            'unit_cost': service['unit_monthly_cost'],
+            'quantity': service['quantity'],
+            'total_cost': service['total_monthly_cost'],
+            'reason': service['reason']
+        })
+    
+    return {
+        'feasible': feasible,
+        'services': services_summary,
+        'total_cost': round(total_cost, 2),
+        'budget': budget,
+        'savings': round(budget - total_cost, 2),
+        'budget_utilization': round((total_cost/budget)*100, 1) if budget > 0 else 0,
+        'region': region,
+        'cost_breakdown': {
+            'compute': sum(s['total_monthly_cost'] for s in optimized_services if ('EC2' in s['name'] or 'Lambda' in s['name']) and isinstance(s['total_monthly_cost'], (int, float))),
+            'storage': sum(s['total_monthly_cost'] for s in optimized_services if ('S3' in s['name'] or 'RDS' in s['name']) and isinstance(s['total_monthly_cost'], (int, float))),
+            'networking': sum(s['total_monthly_cost'] for s in optimized_services if ('CloudFront' in s['name'] or 'LoadBalancing' in s['name']) and isinstance(s['total_monthly_cost'], (int, float))),
+            'other': sum(s['total_monthly_cost'] for s in optimized_services if not any(x in s['name'] for x in ['EC2', 'Lambda', 'S3', 'RDS', 'CloudFront', 'LoadBalancing']) and isinstance(s['total_monthly_cost'], (int, float)))
         }
+    }
+
+def start_job_deadline(request_uuid, timeout):
+    """작업 마감 시간을 등록하고 현재 스레드에 바인딩 (/cancel 대상)"""
+    deadline = JobDeadline(request_uuid, timeout)
+    active_jobs[request_uuid] = deadline
+    bind_deadline(deadline)
+    return deadline
+
+def cancel_local_job(request_uuid):
+    """이 프로세스에서 실행 중인 작업이면 취소 플래그를 세우고 True"""
+    deadline = active_jobs.get(request_uuid)
+    if not deadline:
+        return False
+    deadline.cancel()
+    return True
+
+def finish_job_deadline(request_uuid):
+    active_jobs.pop(request_uuid, None)
+    bind_deadline(None)
+
+def attach_profile(response_data, job_profile):
+    """프로파일링 요청된 작업이면 요약을 응답 데이터에 포함 (/status 로 조회)"""
+    if job_profile:
+        response_data['profile'] = stop_profile(job_profile)
+    return response_data
+
+def parse_job_timeout(data):
+    """요청의 timeout(초)을 JOB_TIMEOUT_MAX 이내로 제한"""
+    try:
+        timeout = float(data.get('timeout', JOB_TIMEOUT))
+    except (TypeError, ValueError):
+        timeout = JOB_TIMEOUT
+    return min(max(timeout, 1), JOB_TIMEOUT_MAX)
+
+def optimization_request_data(service_type, users, performance, additional_info, budget, region, parent_uuid=None, profile=False):
+    """requests.request_data 에 기록할 최적화 입력 (큐 등록 시와 실행 시 같은 형식)"""
+    request_data = {
+        'service_type': service_type,
+        'users': users,
+        'performance': performance,
+        'additional_info': additional_info,
+        'budget': budget,
+        'region': region
+    }
+    if parent_uuid:
+        request_data['reoptimized_from'] = parent_uuid
+    if profile:
+        request_data['profile'] = True
+    return request_data
+
+def sweep_request_data(service_type, users, performance, additional_info, budgets, region):
+    return {
+        'service_type': service_type,
+        'users': users,
+        'performance': performance,
+        'additional_info': additional_info,
+        'budgets': budgets,
+        'region': region
+    }
+
+def comparison_request_data(services, regions, budget, parent_uuid=None):
+    request_data = {
+        'services': services,
+        'regions': regions,
+        'budget': budget
+    }
+    if parent_uuid:
+        request_data['compared_from'] = parent_uuid
+    return request_data
+
+def process_optimization(request_uuid, service_type, users, performance, additional_info, budget, region, reuse_artifacts=None, parent_uuid=None, timeout=JOB_TIMEOUT, profile=False):
+    deadline = start_job_deadline(request_uuid, timeout)
+    job_profile = start_profile(request_uuid) if profile else None
+    try:
+        request_data = optimization_request_data(service_type, users, performance, additional_info, budget, region, parent_uuid, profile)
         
         store_request(request_uuid, request_data, status='processing')
+        update_status(request_uuid, 'started', {'reused_stages': sorted(reuse_artifacts)} if reuse_artifacts else None)
         
         # 5단계 최적화 프로세스 실행
-        optimized_services, total_cost = optimizer.analyze_requirements(service_type, users, performance, additional_info, budget, region, request_uuid)
+        optimized_services, total_cost = optimizer.analyze_requirements(service_type, users, performance, additional_info, budget, region, request_uuid, reuse_artifacts)
+        
+        response_data = finalize_plan(optimized_services, total_cost, budget, service_type, users, performance, additional_info, region)
+        if deadline.fallbacks:
+            response_data['deadline_fallbacks'] = deadline.fallbacks
+        attach_profile(response_data, job_profile)
         
-        # 결과 생성
-        feasible = total_cost <= budget
+        update_status(request_uuid, 'completed')
+        store_request(request_uuid, request_data, response_data, 'completed')
+    except JobCancelled as e:
+        request_data = locals().get('request_data', {})
+        update_status(request_uuid, 'cancelled')
+        store_request(request_uuid, request_data, attach_profile({'error': str(e)}, job_profile), 'cancelled')
+    except Exception as e:
+        error_response = attach_profile({'error': str(e)}, job_profile)
+        request_data = locals().get('request_data', {})
+        update_status(request_uuid, 'failed', {'error': str(e)})
+        store_request(request_uuid, request_data, error_response, 'failed')
+    finally:
+        if job_profile:
+            stop_profile(job_profile)
+        finish_job_deadline(request_uuid)
+        event_buffer.finish(request_uuid)
 
-        if not feasible:
-            print(f"Warning: Total cost ${total_cost:.2f} exceeds budget ${budget:.2f}")
-            optimized_services, total_cost = try_to_squeeze_budget(optimized_services, budget, service_type, users, performance, additional_info, region)
+def process_budget_sweep(request_uuid, service_type, users, performance, additional_info, budgets, region, timeout=JOB_TIMEOUT):
+    """1, 2단계는 한 번만 실행하고 예산별로 3~5단계를 병렬 평가"""
+    deadline = start_job_deadline(request_uuid, timeout)
+    try:
+        request_data = sweep_request_data(service_type, users, performance, additional_info, budgets, region)
         
-            # 서비스별 상세 비용 정보 포함
-        services_summary = []
-        for service in optimized_services:
-            services_summary.append({
-                'name': service['name'],
-                'type': service['type'],
-                'unit_cost': service['unit_monthly_cost'],
-                'quantity': service['quantity'],
-                'total_cost': service['total_monthly_cost'],
-                'reason': service['reason']
-            })
+        store_request(request_uuid, request_data, status='processing')
+        update_status(request_uuid, 'started', {'budget_points': len(budgets)})
+        
+        priced_services = optimizer.prepare_priced_services(service_type, users, performance, additional_info, region, request_uuid)
+        
+        completed = [0]
+        progress_lock = Lock()
+        
+        def evaluate(budget):
+            try:
+                optimized_services, total_cost = optimizer.plan_for_budget(priced_services, budget, service_type, users, performance, additional_info, region)
+                point = finalize_plan(optimized_services, total_cost, budget, service_type, users, performance, additional_info, region)
+            except Exception as e:
+                logger.warning("Sweep point $%s failed: %s", budget, e)
+                point = {'budget': budget, 'error': str(e)}
+            with progress_lock:
+                completed[0] += 1
+                update_status(request_uuid, 'sweep_progress', {'completed': completed[0], 'total': len(budgets)})
+            return point
+        
+        with ThreadPoolExecutor(max_workers=min(SWEEP_MAX_WORKERS, len(budgets))) as executor:
+            points = list(executor.map(with_deadline(evaluate), budgets))
         
         response_data = {
-            'feasible': feasible,
-            'services': services_summary,
-            'total_cost': round(total_cost, 2),
-            'budget': budget,
-            'savings': round(budget - total_cost, 2),
-            'budget_utilization': round((total_cost/budget)*100, 1) if budget > 0 else 0,
+            'sweep': True,
             'region': region,
-            'cost_breakdown': {
-                'compute': sum(s['total_monthly_cost'] for s in optimized_services if ('EC2' in s['name'] or 'Lambda' in s['name']) and isinstance(s['total_monthly_cost'], (int, float))),
-                'storage': sum(s['total_monthly_cost'] for s in optimized_services if ('S3' in s['name'] or 'RDS' in s['name']) and isinstance(s['total_monthly_cost'], (int, float))),
-                'networking': sum(s['total_monthly_cost'] for s in optimized_services if ('CloudFront' in s['name'] or 'LoadBalancing' in s['name']) and isinstance(s['total_monthly_cost'], (int, float))),
-                'other': sum(s['total_monthly_cost'] for s in optimized_services if not any(x in s['name'] for x in ['EC2', 'Lambda', 'S3', 'RDS', 'CloudFront', 'LoadBalancing']) and isinstance(s['total_monthly_cost'], (int, float)))
-            }
+            'points': points
         }
+        if deadline.fallbacks:
+            response_data['deadline_fallbacks'] = deadline.fallbacks
         
+        update_status(request_uuid, 'completed')
         store_request(request_uuid, request_data, response_data, 'completed')
+    except JobCancelled as e:
+        request_data = locals().get('request_data', {})
+        update_status(request_uuid, 'cancelled')
+        store_request(request_uuid, request_data, {'error': str(e)}, 'cancelled')
     except Exception as e:
         error_response = {'error': str(e)}
         request_data = locals().get('request_data', {})
+        update_status(request_uuid, 'failed', {'error': str(e)})
         store_request(request_uuid, request_data, error_response, 'failed')
+    finally:
+        finish_job_deadline(request_uuid)
+        event_buffer.finish(request_uuid)
+
+def parse_sweep_budgets(data):
+    """budgets 목록 또는 budget_range {start, stop, step} 에서 예산 포인트 생성"""
+    if 'budgets' in data:
+        budgets = [float(b) for b in data['budgets']]
+    elif 'budget_range' in data:
+        budget_range = data['budget_range']
+        start = float(budget_range['start'])
+        stop = float(budget_range['stop'])
+        step = float(budget_range.get('step', 0)) or (stop - start) / 9 or 1
+        if step <= 0:
+            raise ValueError('budget_range.step must be positive')
+        budgets = []
+        current = start
+        while current <= stop + 1e-9 and len(budgets) <= SWEEP_MAX_POINTS:
+            budgets.append(round(current, 2))
+            current += step
+    else:
+        raise ValueError('budgets or budget_range is required')
+    
+    budgets = sorted(set(budgets))
+    if not budgets:
+        raise ValueError('at least one budget is required')
+    if len(budgets) > SWEEP_MAX_POINTS:
+        raise ValueError(f'at most {SWEEP_MAX_POINTS} budget points are allowed')
+    return budgets
+
+@app.route('/sweep', methods=['POST'])
+def create_budget_sweep():
+    data = request.json
+    
+    try:
+        budgets = parse_sweep_budgets(data)
+        priority = job_priority(data, 'sweep')
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    service_type = data.get('service_type', '')
+    users = data.get('users', '소규모')
+    performance = data.get('performance', '기본')
+    additional_info = data.get('additional_info', '')
+    region = data.get('region', 'us-east-1')
+    
+    request_uuid = str(uuid.uuid4())
+    
+    status = submit_job('sweep', request_uuid,
+        priority=priority,
+        client_id=request_client_id(),
+        service_type=service_type,
+        users=users,
+        performance=performance,
+        additional_info=additional_info,
+        budgets=budgets,
+        region=region,
+        timeout=parse_job_timeout(data)
+    )
+    
+    return jsonify({'uuid': request_uuid, 'status': status, 'budgets': budgets})
+
+def process_region_comparison(request_uuid, services, regions, budget, parent_uuid=None, timeout=JOB_TIMEOUT):
+    start_job_deadline(request_uuid, timeout)
+    try:
+        request_data = comparison_request_data(services, regions, budget, parent_uuid)
+
+        store_request(request_uuid, request_data, status='processing')
+        update_status(request_uuid, 'started')
+
+        response_data = optimizer.compare_regions(services, regions, budget)
+
+        update_status(request_uuid, 'completed')
+        store_request(request_uuid, request_data, response_data, 'completed')
+    except JobCancelled as e:
+        request_data = locals().get('request_data', {})
+        update_status(request_uuid, 'cancelled')
+        store_request(request_uuid, request_data, {'error': str(e)}, 'cancelled')
+    except Exception as e:
+        error_response = {'error': str(e)}
+        request_data = locals().get('request_data', {})
+        update_status(request_uuid, 'failed', {'error': str(e)})
+        store_request(request_uuid, request_data, error_response, 'failed')
+    finally:
+        finish_job_deadline(request_uuid)
+        event_buffer.finish(request_uuid)
+
+JOB_HANDLERS = {
+    'optimize': process_optimization,
+    'sweep': process_budget_sweep,
+    'compare': process_region_comparison
+}
+JOB_REQUEST_DATA = {
+    'optimize': optimization_request_data,
+    'sweep': sweep_request_data,
+    'compare': comparison_request_data
+}
+
+# 큐에서 기다린 시간 (작업 확보 시 기록, 종료 시 응답에 포함)
+queue_waits = SharedDict(shared_store, 'queue_wait', ttl=JOB_TIMEOUT_MAX, l1_ttl=0)
+
+def record_queue_wait(request_uuid, waited):
+    waited = round(waited, 3)
+    queue_waits[request_uuid] = waited
+    metrics.registry.observe('clops_job_queue_wait_seconds', waited)
+    update_status(request_uuid, 'dequeued', {'queue_wait': waited})
+
+def mark_abandoned(request_uuid):
+    """워커가 반복해서 중단된 작업을 실패로 기록"""
+    update_status(request_uuid, 'failed', {'error': 'worker lost'})
+    store_request(request_uuid, {}, {'error': f'Job abandoned after {JOB_MAX_ATTEMPTS} worker failures'}, 'failed')
+
+job_queue = JobQueue(
+    get_quick_db_connection,
+    JOB_HANDLERS,
+    workers=JOB_WORKERS,
+    poll_interval=JOB_POLL_INTERVAL,
+    max_poll_interval=JOB_POLL_MAX_INTERVAL,
+    heartbeat_interval=JOB_HEARTBEAT_INTERVAL,
+    heartbeat_timeout=JOB_HEARTBEAT_TIMEOUT,
+    max_attempts=JOB_MAX_ATTEMPTS,
+    on_abandoned=mark_abandoned,
+    on_claimed=record_queue_wait,
+    on_cancel_requested=cancel_local_job,
+    client_max_running=JOB_CLIENT_MAX_RUNNING or None,
+    priority_max_running={JOB_PRIORITIES['batch']: JOB_BATCH_MAX_RUNNING} if JOB_BATCH_MAX_RUNNING else None,
+    priority_aging=JOB_PRIORITY_AGING or None
+)
+
+def request_client_id():
+    """공평 분배 단위: X-Client-Id 헤더, 없으면 프론트가 X-Forwarded-For 끝에 붙인 클라이언트 IP
+
+    앞쪽 항목은 클라이언트가 임의로 보낼 수 있으므로 신뢰하는 프록시(프론트)가 추가한 마지막 항목만 사용
+    """
+    client_id = request.headers.get('X-Client-Id')
+    if not client_id:
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        client_id = forwarded.split(',')[-1].strip() or request.remote_addr or 'anonymous'
+    return client_id[:100]
+
+def job_priority(data, kind):
+    """요청의 priority 값 (interactive | batch), 없으면 작업 종류별 기본 등급"""
+    priority = data.get('priority') or JOB_DEFAULT_PRIORITY[kind]
+    if priority not in JOB_PRIORITIES:
+        raise ValueError(f"priority must be one of {sorted(JOB_PRIORITIES)}")
+    return priority
+
+def submit_job(kind, request_uuid, priority=None, client_id='anonymous', **kwargs):
+    """작업을 DB 큐에 등록 (큐 워커가 없거나 DB를 쓸 수 없으면 이 프로세스의 스레드에서 바로 실행)
+
+    요청 스레드에서는 재시도 없는 짧은 연결만 사용: 상태 기록이나 등록이 실패하면 기다리지 않고 바로 로컬 실행
+    """
+    if JOB_QUEUE_ENABLED and job_queue.threads:
+        priority = priority or JOB_DEFAULT_PRIORITY[kind]
+        request_data = JOB_REQUEST_DATA[kind](**{k: v for k, v in kwargs.items() if k not in ('reuse_artifacts', 'timeout')})
+        if (store_request(request_uuid, request_data, status='queued', connect=get_quick_db_connection)
+                and job_queue.enqueue(request_uuid, kind, kwargs, JOB_PRIORITIES[priority], client_id)):
+            return 'queued'
+        logger.warning("Job queue unavailable, running %s locally", request_uuid)
+    
+    thread = Thread(target=JOB_HANDLERS[kind], kwargs=dict(kwargs, request_uuid=request_uuid))
+    thread.start()
+    return 'processing'
+
+idempotency = IdempotencyStore(get_quick_db_connection, SharedDict(shared_store, 'idempotency', ttl=IDEMPOTENCY_TTL, l1_ttl=0), IDEMPOTENCY_TTL)
+
+def claim_idempotency_key(endpoint, data, request_uuid, body):
+    """Idempotency-Key 헤더 처리: 재시도에 돌려줄 응답 반환 (새 요청이면 None)
+
+    body: 이 요청이 돌려줄 응답 본문 (키 선점과 함께 저장해 응답 저장용 연결을 따로 열지 않음)
+    """
+    key = request.headers.get('Idempotency-Key')
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        return jsonify({'status': 'error', 'message': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+    fingerprint = request_fingerprint(data)
+    try:
+        record = idempotency.claim(endpoint, key, fingerprint, request_uuid, body)
+    except Exception as e:
+        logger.warning("Idempotency key claim failed, processing as a new request: %s", e)
+        return None
+    if record['uuid'] == request_uuid:
+        return None
+
+    if record['fingerprint'] != fingerprint:
+        return jsonify({'status': 'error', 'message': 'Idempotency-Key was already used with a different request body'}), 422
+    metrics.registry.inc('clops_idempotent_replays_total', {'endpoint': endpoint})
+    logger.info("Idempotent replay of %s for %s", endpoint, record['uuid'])
+    body = record['response'] or {'uuid': record['uuid'], 'status': 'processing'}
+    return jsonify(body), 200, {'Idempotent-Replayed': 'true'}
+
+@app.route('/compare-regions', methods=['POST'])
+def create_region_comparison():
+    """선택된 아키텍처(services 또는 완료된 요청 uuid)를 지원 리전 전체에서 가격 비교"""
+    data = request.json
+    parent_uuid = data.get('uuid')
+
+    if parent_uuid:
+        previous = get_request(parent_uuid)
+        if not previous or not (previous.get('response_data') or {}).get('services'):
+            return jsonify({'status': 'not_found', 'message': 'Completed request not found'}), 404
+        services = previous['response_data']['services']
+        budget = data.get('budget', previous['response_data'].get('budget'))
+    else:
+        services = data.get('services') or []
+        budget = data.get('budget')
+
+    services = [{'name': s['name'], 'type': s['type'], 'quantity': s.get('quantity', 1)} for s in services if s.get('name') and s.get('type')]
+    if not services:
+        return jsonify({'status': 'error', 'message': 'services is required'}), 400
+
+    regions = data.get('regions') or list(REGION_LOCATIONS)
+    unknown = [region for region in regions if region not in REGION_LOCATIONS]
+    if unknown:
+        return jsonify({'status': 'error', 'message': f'Unsupported regions: {unknown}'}), 400
+    try:
+        priority = job_priority(data, 'compare')
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    request_uuid = str(uuid.uuid4())
+
+    status = submit_job('compare', request_uuid,
+        priority=priority,
+        client_id=request_client_id(),
+        services=services,
+        regions=regions,
+        budget=float(budget) if budget is not None else None,
+        parent_uuid=parent_uuid,
+        timeout=parse_job_timeout(data)
+    )
+
+    return jsonify({'uuid': request_uuid, 'status': status, 'regions': regions})
 
 @app.route('/optimize', methods=['POST'])
 def create_optimization():
@@ -1098,13 +2255,88 @@ def create_optimization():
     additional_info = data.get('additional_info', '')
     budget = float(data.get('budget', 100))
     region = data.get('region', 'us-east-1')
+    try:
+        priority = job_priority(data, 'optimize')
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
     
     request_uuid = str(uuid.uuid4())
+    # 재시도에는 uuid 와 processing 상태를 돌려주고, 실제 진행 상태는 /status 로 확인
+    replay = claim_idempotency_key('optimize', data, request_uuid, {'uuid': request_uuid, 'status': 'processing'})
+    if replay:
+        return replay
     
-    thread = Thread(target=process_optimization, args=(request_uuid, service_type, users, performance, additional_info, budget, region))
-    thread.start()
+    status = submit_job('optimize', request_uuid,
+        priority=priority,
+        client_id=request_client_id(),
+        service_type=service_type,
+        users=users,
+        performance=performance,
+        additional_info=additional_info,
+        budget=budget,
+        region=region,
+        timeout=parse_job_timeout(data),
+        profile=profiling_requested(request)
+    )
+    
+    return jsonify({'uuid': request_uuid, 'status': status})
+
+REOPTIMIZE_FIELDS = ['service_type', 'users', 'performance', 'additional_info', 'budget', 'region']
+
+@app.route('/reoptimize', methods=['POST'])
+def create_reoptimization():
+    """이전 요청의 단계 결과를 재사용하여 변경된 입력만 다시 계산"""
+    data = request.json
+    parent_uuid = data.get('uuid')
+    
+    previous = get_request(parent_uuid) if parent_uuid else None
+    if not previous or 'request_data' not in previous:
+        return jsonify({'status': 'not_found', 'message': 'Previous request not found'}), 404
+    
+    request_data = dict(previous['request_data'] or {})
+    request_data.pop('reoptimized_from', None)
+    request_data.pop('profile', None)
+    for field in REOPTIMIZE_FIELDS:
+        if field in data:
+            request_data[field] = data[field]
+    # 비교 작업이나 입력이 남지 않은 기록(중단/취소 처리된 메모리 기록 등)은 다시 계산할 입력이 없음
+    missing = [field for field in REOPTIMIZE_FIELDS if field not in request_data]
+    if missing:
+        return jsonify({'status': 'error', 'message': f"Previous request is not a reusable optimization (missing {', '.join(missing)})"}), 400
+    try:
+        request_data['budget'] = float(request_data['budget'])
+    except (TypeError, ValueError):
+        return jsonify({'status': 'error', 'message': 'budget must be a number'}), 400
+    try:
+        priority = job_priority(data, 'optimize')
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    
+    # 입력 해시가 같은 단계만 재사용 (1, 2단계는 예산과 무관)
+    input_hash = artifact_input_hash(request_data)
+    reuse_artifacts = {
+        stage: artifact['data']
+        for stage, artifact in load_artifacts(parent_uuid).items()
+        if artifact['input_hash'] == input_hash
+    }
+    
+    request_uuid = str(uuid.uuid4())
+    
+    status = submit_job('optimize', request_uuid,
+        priority=priority,
+        client_id=request_client_id(),
+        service_type=request_data['service_type'],
+        users=request_data['users'],
+        performance=request_data['performance'],
+        additional_info=request_data['additional_info'],
+        budget=request_data['budget'],
+        region=request_data['region'],
+        reuse_artifacts=reuse_artifacts,
+        parent_uuid=parent_uuid,
+        timeout=parse_job_timeout(data)
+    )
     
-    return jsonify({'uuid': request_uuid, 'status': 'processing'})
+    return jsonify({'uuid': request_uuid, 'status': status, 'reused_stages': sorted(reuse_artifacts)})
 
 @app.route('/status/<request_uuid>')
 def get_status(request_uuid):
@@ -1115,41 +2347,175 @@ def get_status(request_uuid):
     
     return jsonify(result)
 
+@app.route('/cancel/<request_uuid>', methods=['POST'])
+def cancel_job(request_uuid):
+    """실행 중인 작업 취소: 다음 단계 경계에서 중단되고 상태가 cancelled로 기록됨
+
+    다른 노드/프로세스가 실행 중인 큐 작업은 jobs 테이블에 취소 요청을 남기고, 소유 워커가 heartbeat 때 취소
+    """
+    if cancel_local_job(request_uuid):
+        return jsonify({'uuid': request_uuid, 'status': 'cancelling'}), 202
+    
+    # 아직 어느 워커도 가져가지 않은 큐 작업은 바로 취소
+    if JOB_QUEUE_ENABLED and job_queue.cancel(request_uuid):
+        update_status(request_uuid, 'cancelled')
+        event_buffer.finish(request_uuid)
+        store_request(request_uuid, {}, {'error': f'Job {request_uuid} was cancelled before it started'}, 'cancelled')
+        return jsonify({'uuid': request_uuid, 'status': 'cancelled'})
+    if JOB_QUEUE_ENABLED and job_queue.request_cancel(request_uuid):
+        return jsonify({'uuid': request_uuid, 'status': 'cancelling'}), 202
+    
+    result = get_request(request_uuid)
+    if not result or result.get('status') == 'not_found':
+        return jsonify({'uuid': request_uuid, 'status': 'not_found'}), 404
+    return jsonify({'uuid': request_uuid, 'status': result.get('status'), 'message': 'Job is not running'}), 409
+
+@app.route('/status/<request_uuid>/events')
+def get_status_events(request_uuid):
+    return jsonify({'uuid': request_uuid, 'events': get_events(request_uuid)})
+
+CONTACT_FIELDS = ['name', 'email', 'subject', 'message']
+contact_writer = ContactWriter(get_db_connection, CONTACT_SPOOL_DIR, CONTACT_FLUSH_SIZE, CONTACT_FLUSH_INTERVAL, fsync=CONTACT_SPOOL_FSYNC)
+
 @app.route('/contact', methods=['POST'])
 def save_contact():
     data = request.json
     contact_uuid = str(uuid.uuid4())
+    # 클라이언트가 붙이는 timestamp 는 재시도마다 달라지므로 저장되는 필드만 비교
+    body = {'status': 'success', 'uuid': contact_uuid}
+    replay = claim_idempotency_key('contact', {field: data.get(field) for field in CONTACT_FIELDS}, contact_uuid, body)
+    if replay:
+        return replay
+    # 로컬 파일에 먼저 기록하고 DB 반영은 백그라운드 배치로 (DB 장애 중에도 유실 없음)
+    contact_writer.add(contact_uuid, data)
+    return jsonify(body)
+
+@app.route('/health')
+def health():
+    return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
+
+def check_dependency(name, check):
+    """의존 서비스 상태 확인 (READINESS_CACHE_SECONDS 동안 결과 캐시)"""
+    cached = dependency_checks.get(name)
+    if cached and time.time() - cached[0] < READINESS_CACHE_SECONDS:
+        return cached[1]
     
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'status': 'success', 'uuid': contact_uuid, 'message': 'Stored locally'})
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO contacts (uuid, name, email, subject, message, status)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        ''', (
-            contact_uuid,
-            data.get('name'),
-            data.get('email'),
-            data.get('subject'),
-            data.get('message'),
-            'received'
-        ))
-        
-        conn.commit()
+        check()
+        result = {'available': True}
+    except Exception as e:
+        result = {'available': False, 'error': str(e)}
+    dependency_checks[name] = (time.time(), result)
+    return result
+
+def check_database():
+    if not db_state['available']:
+        raise RuntimeError(db_state['error'] or 'not initialized')
+    conn = connect_database(connect_timeout=2)
+    try:
+        conn.cursor().execute('SELECT 1')
+    finally:
         conn.close()
-        
-        return jsonify({'status': 'success', 'uuid': contact_uuid})
+
+def check_pricing():
+    get_pricing_client().describe_services(ServiceCode='AmazonEC2', MaxResults=1)
+
+def check_bedrock():
+    get_bedrock_client()
+    if not local_backend_enabled() and boto3.Session().get_credentials() is None:
+        raise RuntimeError('AWS credentials not found')
+
+def update_process_gauges():
+    """이 프로세스의 상태 게이지 갱신"""
+    limiter_stats = bedrock_limiter.stats()
+    metrics.registry.set('clops_bedrock_concurrency_limit', limiter_stats['limit'])
+    metrics.registry.set('clops_bedrock_in_flight', limiter_stats['in_flight'])
+    metrics.registry.set('clops_bedrock_waiting', limiter_stats['waiting'])
+    metrics.registry.set('clops_bedrock_tasks_pending', bedrock_gateway.stats()['tasks_pending'])
+    metrics.registry.set('clops_active_jobs', len(active_jobs))
+    metrics.registry.set('clops_job_workers_busy', job_queue.stats()['running'])
+    metrics.registry.set('clops_pricing_cache_entries', len(optimizer.pricing_cache))
+    metrics.registry.set('clops_step1_cache_entries', len(optimizer.step1_cache))
+    metrics.registry.set('clops_memory_storage_entries', len(memory_storage))
+    contact_spool = contact_writer.stats()
+    metrics.registry.set('clops_contact_spool_segments', contact_spool['segments'])
+    metrics.registry.set('clops_contact_spool_bytes', contact_spool['bytes'])
+
+def publish_worker_metrics():
+    """이 프로세스의 메트릭을 공유 저장소에 기록 (키에 시작 시각을 붙여 재사용된 pid 와 겹치지 않게)"""
+    pid = os.getpid()
+    if metrics_worker['pid'] != pid:
+        metrics_worker.update(pid=pid, key=f"{pid}-{int(time.time())}")
+    update_process_gauges()
+    exported = metrics.registry.export()
+    exported.update(pid=pid, published_at=time.time())
+    worker_metrics[metrics_worker['key']] = exported
+
+def start_metrics_publisher():
+    """백그라운드에서 METRICS_PUBLISH_INTERVAL 초마다 이 워커의 메트릭 기록"""
+    def run():
+        while True:
+            try:
+                publish_worker_metrics()
+            except Exception as e:
+                logger.warning("Publishing worker metrics failed: %s", e)
+            time.sleep(METRICS_PUBLISH_INTERVAL)
+
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus 형식 메트릭 (모든 워커 프로세스의 합계)
+
+    카운터/히스토그램은 종료된 워커의 마지막 값까지 합산하고,
+    게이지는 최근에 기록한 워커만 worker 라벨을 붙여 노출
+    """
+    try:
+        publish_worker_metrics()
+        combined = metrics.MetricsRegistry(metrics.registry.buckets)
+        combined.help = metrics.registry.help
+        fresh_after = time.time() - METRICS_PUBLISH_INTERVAL * 3
+        for _, exported in worker_metrics.items():
+            live = exported['published_at'] >= fresh_after
+            combined.merge(exported, {'worker': exported['pid']} if live else None)
+        body = combined.render()
     except Exception as e:
-        print(f"Contact save failed: {e}")
-        return jsonify({'status': 'success', 'uuid': contact_uuid, 'message': 'Stored locally'})
+        logger.warning("Aggregating worker metrics failed, serving this worker only: %s", e)
+        update_process_gauges()
+        body = metrics.registry.render()
+    return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
 
-@app.route('/health')
-def health():
-    return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
+@app.route('/ready')
+def ready():
+    """준비 상태: 스키마 초기화가 끝나야 200, 의존 서비스 상태는 상세로 보고"""
+    if not db_state['initialized']:
+        return jsonify({'status': 'initializing', 'timestamp': datetime.utcnow().isoformat()}), 503
+    
+    dependencies = {
+        'database': check_dependency('database', check_database),
+        'pricing': check_dependency('pricing', check_pricing),
+        'bedrock': check_dependency('bedrock', check_bedrock)
+    }
+    degraded = not all(dependency['available'] for dependency in dependencies.values())
+    
+    return jsonify({
+        'status': 'degraded' if degraded else 'ready',
+        'dependencies': dependencies,
+        'price_refresh': price_refresher.last_run,
+        'price_catalog': price_catalog.stats() if price_catalog else None,
+        'bedrock_limiter': bedrock_limiter.stats(),
+        'bedrock_gateway': bedrock_gateway.stats(),
+        'job_queue': job_queue.stats() if job_queue.threads else None,
+        'timestamp': datetime.utcnow().isoformat()
+    })
 
 if __name__ == '__main__':
-    init_db()
+    start_db_init()
+    price_refresher.start()
+    start_retention_worker()
+    if JOB_QUEUE_ENABLED:
+        job_queue.start()
+    contact_writer.start()
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
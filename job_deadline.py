@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger('clops.deadline')
+
+class JobCancelled(BaseException):
+    """단계별 폴백용 except Exception 에 잡히지 않도록 BaseException 상속"""
+    pass
+
+class JobDeadline:
+    """작업별 마감 시간과 취소 플래그 (파이프라인 각 단계에서 확인)"""
+    def __init__(self, request_uuid, timeout):
+        self.request_uuid = request_uuid
+        self.expires_at = time.time() + timeout
+        self.cancelled = threading.Event()
+        self.fallbacks = []
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.time())
+
+    def near(self, reserve):
+        """남은 시간이 reserve초 미만이면 True (취소된 작업도 True)"""
+        return self.cancelled.is_set() or self.remaining() < reserve
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise JobCancelled(f"Job {self.request_uuid} was cancelled")
+
+    def record_fallback(self, step):
+        if step not in self.fallbacks:
+            self.fallbacks.append(step)
+            logger.info("Deadline near for %s: %s using fallback (%.0fs left)", self.request_uuid, step, self.remaining())
+
+_local = threading.local()
+
+def current_deadline():
+    return getattr(_local, 'deadline', None)
+
+def bind_deadline(deadline):
+    _local.deadline = deadline
+
+def with_deadline(func):
+    """현재 스레드의 마감 시간을 작업 스레드(Executor 등)로 전달하는 래퍼"""
+    deadline = current_deadline()
+
+    def run(*args, **kwargs):
+        previous = current_deadline()
+        bind_deadline(deadline)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            bind_deadline(previous)
+    return run
+
+def deadline_near(step, reserve):
+    """마감이 임박했으면 폴백 사용을 기록하고 True 반환 (취소 시 JobCancelled)"""
+    deadline = current_deadline()
+    if deadline is None:
+        return False
+    deadline.check()
+    if deadline.near(reserve):
+        deadline.record_fallback(step)
+        return True
+    return False
+
+def remaining_time(default=None):
+    deadline = current_deadline()
+    return deadline.remaining() if deadline is not None else default
+
+def check_cancelled():
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check()
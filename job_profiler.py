@@ -0,0 +1,107 @@
+import cProfile
+import os
+import pstats
+import threading
+import time
+
+import metrics
+from job_deadline import current_deadline
+
+# /optimize 의 X-Clops-Profile 헤더 또는 ?profile=1 로 요청별 프로파일링 (PROFILING_ENABLED 일 때만)
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_TOP_N = int(os.environ.get('PROFILE_TOP_N', 15))
+
+JSON_FUNCTIONS = {
+    ('json/__init__.py', 'loads'): 'json_parse',
+    ('json/__init__.py', 'dumps'): 'json_serialize'
+}
+
+class JobProfile:
+    """작업 스레드의 cProfile 결과와 외부 호출(span) 대기 시간을 모아 요약"""
+    def __init__(self, request_uuid):
+        self.request_uuid = request_uuid
+        self.profiler = cProfile.Profile()
+        self.cpu_profiled = False
+        self.io = {}  # kind.operation -> [count, seconds]
+        self.lock = threading.Lock()
+        self.started = None
+        self.wall = None
+
+    def record_span(self, labels, elapsed):
+        key = f"{labels.get('kind')}.{labels.get('operation', labels.get('stage', ''))}"
+        with self.lock:
+            entry = self.io.setdefault(key, [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def summary(self, top_n=PROFILE_TOP_N):
+        entries = []
+        json_time = {}
+        stats = pstats.Stats(self.profiler) if self.cpu_profiled else None
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in (stats.stats.items() if stats else ()):
+            for (suffix, func), label in JSON_FUNCTIONS.items():
+                if name == func and filename.endswith(suffix):
+                    json_time[label] = json_time.get(label, 0.0) + cumtime
+            entries.append({
+                'function': f"{os.path.basename(filename)}:{line}({name})",
+                'calls': calls,
+                'self_seconds': round(tottime, 4),
+                'cumulative_seconds': round(cumtime, 4)
+            })
+
+        with self.lock:
+            io = {key: {'calls': count, 'seconds': round(seconds, 4)} for key, (count, seconds) in sorted(self.io.items())}
+        stage_keys = [key for key in io if key.startswith('stage.')]
+
+        return {
+            'wall_seconds': round(self.wall, 4) if self.wall is not None else None,
+            'profiled_cpu_seconds': round(stats.total_tt, 4) if stats else None,
+            'json_seconds': {label: round(json_time.get(label, 0.0), 4) for label in JSON_FUNCTIONS.values()},
+            # db.connect 는 다른 db span 안에서 측정되므로 합계에서 제외
+            'io_blocked_seconds': round(sum(v['seconds'] for k, v in io.items() if k not in stage_keys and k != 'db.connect'), 4),
+            'io': {k: v for k, v in io.items() if k not in stage_keys},
+            'stages': {k[len('stage.'):]: v for k, v in io.items() if k in stage_keys},
+            'top_cumulative': sorted(entries, key=lambda e: e['cumulative_seconds'], reverse=True)[:top_n],
+            'top_self': sorted(entries, key=lambda e: e['self_seconds'], reverse=True)[:top_n],
+            'note': 'cProfile covers the job thread; io includes calls made from worker threads'
+        }
+
+active_profiles = {}  # request_uuid -> JobProfile
+
+def record_span(labels, elapsed):
+    """metrics.span 리스너: 현재 작업이 프로파일링 중이면 외부 호출 시간을 누적"""
+    deadline = current_deadline()
+    profile = active_profiles.get(deadline.request_uuid) if deadline else None
+    if profile is not None:
+        profile.record_span(labels, elapsed)
+
+metrics.span_listeners.append(record_span)
+
+def profiling_requested(req):
+    """요청 헤더/쿼리의 프로파일링 플래그 (설정으로 허용된 경우에만 True)"""
+    if not PROFILING_ENABLED:
+        return False
+    flag = req.headers.get('X-Clops-Profile') or req.args.get('profile') or ''
+    return flag.lower() in ('1', 'true', 'yes')
+
+def start_profile(request_uuid):
+    """현재 스레드에서 cProfile 시작 (외부 호출 시간은 span 리스너로 수집)"""
+    profile = JobProfile(request_uuid)
+    active_profiles[request_uuid] = profile
+    profile.started = time.perf_counter()
+    try:
+        profile.profiler.enable()
+        profile.cpu_profiled = True
+    except ValueError:
+        # 다른 프로파일러가 이미 활성화된 경우 (Python 3.12+ 는 프로세스당 하나) 외부 호출 시간만 수집
+        pass
+    return profile
+
+def stop_profile(profile):
+    """프로파일링 종료 후 요약 반환 (여러 번 호출해도 안전)"""
+    if profile.wall is None:
+        if profile.cpu_profiled:
+            profile.profiler.disable()
+        profile.wall = time.perf_counter() - profile.started
+        active_profiles.pop(profile.request_uuid, None)
+    return profile.summary()
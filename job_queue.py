@@ -0,0 +1,320 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('clops.queue')
+
+class JobQueue:
+    """jobs 테이블 기반 작업 큐: 여러 백엔드 노드가 같은 DB에서 작업을 나눠 처리
+
+    - claim: 우선순위 등급 → 실행 중인 작업이 적은 클라이언트 → 오래된 작업 순으로 선택하고,
+      SELECT ... FOR UPDATE SKIP LOCKED 로 다른 워커가 잡은 행을 건너뛰고 1건 확보
+      (클라이언트별/등급별 동시 실행 상한은 노드 전체 기준이며, 동시에 확보하는 경우 잠깐 넘을 수 있음)
+    - heartbeat: 실행 중인 작업의 heartbeat_at 을 주기적으로 갱신
+    - requeue_stale: heartbeat 가 끊긴 작업(워커 프로세스 종료 등)을 다시 queued 로 되돌림
+    - request_cancel: 다른 노드/프로세스가 실행 중인 작업에 취소 요청을 기록하고, 소유 워커가 heartbeat 때 확인해 전달
+    워커/관리 스레드는 각자 연결 하나를 유지해 재사용하고, 확보할 작업이 없거나 실패하면 폴링 간격을 지수적으로 늘림
+    """
+    def __init__(self, connect, handlers, workers=8, poll_interval=1.0, heartbeat_interval=10, heartbeat_timeout=60, max_attempts=3,
+                 on_abandoned=None, on_claimed=None, client_max_running=None, priority_max_running=None, priority_aging=None,
+                 max_poll_interval=None, on_cancel_requested=None):
+        """
+        connect: DB 연결을 반환하는 함수 (연결 불가 시 None, 재시도 없이 빨리 실패해야 함)
+        handlers: {kind: 함수(**payload)} 작업 종류별 실행 함수
+        on_abandoned: 최대 시도 횟수를 넘겨 포기한 작업의 uuid 를 받는 함수
+        on_claimed: 작업을 확보했을 때 (uuid, 대기 시간 초) 를 받는 함수
+        on_cancel_requested: 이 워커가 실행 중인 작업에 취소 요청이 기록되어 있으면 uuid 를 받는 함수 (heartbeat 마다 호출)
+        client_max_running: 클라이언트별 동시 실행 상한 (None 이면 제한 없음)
+        priority_max_running: {우선순위: 동시 실행 상한} (낮은 등급이 워커를 모두 차지하지 않도록)
+        priority_aging: 이 시간(초)을 기다릴 때마다 한 등급씩 올려 낮은 등급 작업이 무한히 밀리지 않도록 (None 이면 사용 안 함)
+        max_poll_interval: 빈/실패한 확보가 이어질 때 늘어나는 폴링 간격의 상한 (None 이면 poll_interval 고정)
+        """
+        self.connect = connect
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(poll_interval, max_poll_interval or poll_interval)
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.on_abandoned = on_abandoned
+        self.on_claimed = on_claimed
+        self.on_cancel_requested = on_cancel_requested
+        self.client_max_running = client_max_running
+        self.priority_max_running = priority_max_running or {}
+        self.priority_aging = priority_aging
+        self.worker_id = self._new_worker_id()
+        self.wakeup = threading.Event()
+        self.running = set()
+        self.lock = threading.Lock()
+        self.threads = []
+        self.local = threading.local()
+
+    @contextmanager
+    def _connection(self):
+        """현재 스레드가 유지하는 연결 (없으면 새로 연결, 사용 중 오류가 나면 닫고 다음 호출에서 다시 연결)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.connect()
+        if conn is None:
+            yield None
+            return
+        try:
+            yield conn
+        except Exception:
+            self.local.conn = None
+            try:
+                conn.close()
+            except Exception:
+                pass
+            raise
+
+    def enqueue(self, request_uuid, kind, payload, priority=0, client_id='anonymous'):
+        """작업을 큐에 등록 (DB를 쓸 수 없으면 False, 호출 측에서 직접 실행)
+
+        priority: 작을수록 먼저 실행되는 등급, client_id: 공평 분배 단위
+        """
+        conn = self.connect()
+        if not conn:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO jobs (uuid, kind, payload, status, priority, client_id, attempts, created_at)
+                VALUES (%s, %s, %s, 'queued', %s, %s, 0, %s)
+            ''', (request_uuid, kind, json.dumps(payload, ensure_ascii=False), priority, client_id, datetime.utcnow()))
+            conn.commit()
+        except Exception as e:
+            logger.warning("Job enqueue failed for %s: %s", request_uuid, e)
+            return False
+        finally:
+            conn.close()
+        self.wakeup.set()
+        return True
+
+    def claim(self):
+        """대기 중인 작업 1건을 이 워커 소유로 변경 후 (uuid, kind, payload, 대기 시간) 반환"""
+        with self._connection() as conn:
+            if not conn:
+                return None
+            cursor = conn.cursor()
+            for client_id, priority in self._candidates(cursor):
+                cursor.execute('''
+                    SELECT uuid, kind, payload, created_at FROM jobs
+                    WHERE status = 'queued' AND client_id = %s AND priority = %s
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                ''', (client_id, priority))
+                row = cursor.fetchone()
+                if not row:
+                    continue
+
+                # 행 잠금이 없는 저장소(SQLite)에서도 중복 확보되지 않도록 상태 조건을 함께 검사
+                now = datetime.utcnow()
+                cursor.execute('''
+                    UPDATE jobs SET status = 'running', worker_id = %s, heartbeat_at = %s, attempts = attempts + 1
+                    WHERE uuid = %s AND status = 'queued'
+                ''', (self.worker_id, now, row[0]))
+                if cursor.rowcount == 1:
+                    conn.commit()
+                    return row[0], row[1], json.loads(row[2]), max(0.0, (now - row[3]).total_seconds())
+            conn.rollback()
+            return None
+
+    def _candidates(self, cursor):
+        """(client_id, priority) 대기열 앞부분을 실행 순서대로 반환 (상한에 걸린 클라이언트/등급 제외)
+
+        같은 등급 안에서는 현재 실행 중인 작업이 적은 클라이언트가 먼저 (한 클라이언트의 대량 요청이 다른 클라이언트를 막지 않도록)
+        """
+        cursor.execute('''
+            SELECT client_id, priority, COUNT(*) FROM jobs
+            WHERE status = 'running'
+            GROUP BY client_id, priority
+        ''')
+        running_by_client = {}
+        running_by_priority = {}
+        for client_id, priority, count in cursor.fetchall():
+            running_by_client[client_id] = running_by_client.get(client_id, 0) + count
+            running_by_priority[priority] = running_by_priority.get(priority, 0) + count
+
+        cursor.execute('''
+            SELECT client_id, priority, MIN(created_at) FROM jobs
+            WHERE status = 'queued'
+            GROUP BY client_id, priority
+        ''')
+        heads = []
+        now = datetime.utcnow()
+        for client_id, priority, oldest in cursor.fetchall():
+            if self.client_max_running is not None and running_by_client.get(client_id, 0) >= self.client_max_running:
+                continue
+            limit = self.priority_max_running.get(priority)
+            if limit is not None and running_by_priority.get(priority, 0) >= limit:
+                continue
+            if isinstance(oldest, str):
+                oldest = datetime.fromisoformat(oldest)  # SQLite 는 집계 결과를 문자열로 반환
+            effective = priority
+            if self.priority_aging:
+                effective = max(0, priority - int((now - oldest).total_seconds() // self.priority_aging))
+            heads.append((effective, running_by_client.get(client_id, 0), oldest, client_id, priority))
+        return [(client_id, priority) for _, _, _, client_id, priority in sorted(heads)]
+
+    def complete(self, request_uuid):
+        with self._connection() as conn:
+            if not conn:
+                return
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM jobs WHERE uuid = %s AND worker_id = %s', (request_uuid, self.worker_id))
+            conn.commit()
+
+    def cancel(self, request_uuid):
+        """아직 어느 워커도 가져가지 않은 작업 취소 (취소되면 True)"""
+        conn = self.connect()
+        if not conn:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM jobs WHERE uuid = %s AND status = 'queued'", (request_uuid,))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def request_cancel(self, request_uuid):
+        """실행 중인 작업에 취소 요청 기록 (어느 워커가 실행 중이든 다음 heartbeat 에서 전달, 기록되면 True)"""
+        conn = self.connect()
+        if not conn:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE jobs SET cancel_requested = 1 WHERE uuid = %s AND status = 'running'", (request_uuid,))
+            conn.commit()
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def heartbeat(self):
+        """이 워커가 실행 중인 작업 전체의 heartbeat 를 한 번에 갱신하고 취소 요청된 작업을 on_cancel_requested 로 전달"""
+        with self.lock:
+            if not self.running:
+                return
+        with self._connection() as conn:
+            if not conn:
+                return
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE jobs SET heartbeat_at = %s
+                WHERE worker_id = %s AND status = 'running'
+            ''', (datetime.utcnow(), self.worker_id))
+            cursor.execute('''
+                SELECT uuid FROM jobs
+                WHERE worker_id = %s AND status = 'running' AND cancel_requested = 1
+            ''', (self.worker_id,))
+            cancel_requested = [row[0] for row in cursor.fetchall()]
+            conn.commit()
+
+        for request_uuid in cancel_requested:
+            logger.info("Cancel requested for job %s", request_uuid)
+            if self.on_cancel_requested:
+                self.on_cancel_requested(request_uuid)
+
+    def requeue_stale(self):
+        """heartbeat 가 끊긴 작업을 다시 대기열로 (시도 횟수 초과 시 포기)"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.heartbeat_timeout)
+        with self._connection() as conn:
+            if not conn:
+                return 0, []
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT uuid FROM jobs
+                WHERE status = 'running' AND heartbeat_at < %s AND attempts >= %s
+                FOR UPDATE SKIP LOCKED
+            ''', (cutoff, self.max_attempts))
+            abandoned = [row[0] for row in cursor.fetchall()]
+            if abandoned:
+                placeholders = ', '.join(['%s'] * len(abandoned))
+                cursor.execute(f'DELETE FROM jobs WHERE uuid IN ({placeholders})', abandoned)
+
+            cursor.execute('''
+                UPDATE jobs SET status = 'queued', worker_id = NULL
+                WHERE status = 'running' AND heartbeat_at < %s
+            ''', (cutoff,))
+            requeued = cursor.rowcount
+            conn.commit()
+
+        if requeued:
+            logger.warning("Requeued %d jobs with a stale heartbeat", requeued)
+            self.wakeup.set()
+        for request_uuid in abandoned:
+            logger.error("Job %s abandoned after %d attempts", request_uuid, self.max_attempts)
+            if self.on_abandoned:
+                self.on_abandoned(request_uuid)
+        return requeued, abandoned
+
+    def stats(self):
+        with self.lock:
+            return {'worker_id': self.worker_id, 'workers': self.workers, 'running': len(self.running)}
+
+    def _new_worker_id(self):
+        return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+    def start(self):
+        # fork 된 워커 프로세스마다 다른 id 를 쓰도록 시작 시점에 다시 생성
+        self.worker_id = self._new_worker_id()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        thread = threading.Thread(target=self._maintain, name='job-heartbeat', daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        return self.threads
+
+    def _work(self):
+        idle = 0  # 연속으로 빈/실패한 확보 횟수
+        while True:
+            try:
+                job = self.claim()
+            except Exception as e:
+                log = logger.warning if idle == 0 else logger.debug
+                log("Job claim failed: %s", e)
+                job = None
+            if job is None:
+                # 새 작업이 등록되면(wakeup) 바로 깨어나고 간격도 처음부터
+                delay = min(self.poll_interval * 2 ** min(idle, 16), self.max_poll_interval)
+                idle = 0 if self.wakeup.wait(delay) else idle + 1
+                self.wakeup.clear()
+                continue
+            idle = 0
+
+            request_uuid, kind, payload, waited = job
+            with self.lock:
+                self.running.add(request_uuid)
+            try:
+                if self.on_claimed:
+                    self.on_claimed(request_uuid, waited)
+                self.handlers[kind](request_uuid=request_uuid, **payload)
+            except Exception as e:
+                logger.exception("Job %s (%s) crashed: %s", request_uuid, kind, e)
+            finally:
+                with self.lock:
+                    self.running.discard(request_uuid)
+                try:
+                    self.complete(request_uuid)
+                except Exception as e:
+                    logger.warning("Job completion failed for %s: %s", request_uuid, e)
+
+    def _maintain(self):
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                self.heartbeat()
+                self.requeue_stale()
+            except Exception as e:
+                logger.warning("Job queue maintenance failed: %s", e)
@@ -0,0 +1,427 @@
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import boto3
+from botocore.exceptions import ClientError
+
+from cassettes import wrap_client
+from structured_output import REPAIR_MARKER, parse_lenient
+
+# CLOPS_BACKEND=local 이면 AWS/RDS 대신 프로세스 내 가짜 구현 사용 (오프라인 벤치마크/회귀 측정용)
+CLOPS_BACKEND = os.environ.get('CLOPS_BACKEND', 'aws')
+LOCAL_DB_PATH = os.environ.get('LOCAL_DB_PATH', 'clops_local.db')
+LOCAL_PRICING_SNAPSHOT = os.environ.get('LOCAL_PRICING_SNAPSHOT', '')
+LOCAL_BEDROCK_RESPONSES = os.environ.get('LOCAL_BEDROCK_RESPONSES', '')
+LOCAL_BEDROCK_LATENCY = float(os.environ.get('LOCAL_BEDROCK_LATENCY', 0.5))  # 호출당 평균 지연(초)
+LOCAL_BEDROCK_JITTER = float(os.environ.get('LOCAL_BEDROCK_JITTER', 0.2))    # 지연의 ± 비율
+LOCAL_BEDROCK_THROTTLE_RATE = float(os.environ.get('LOCAL_BEDROCK_THROTTLE_RATE', 0.0))
+LOCAL_PRICING_LATENCY = float(os.environ.get('LOCAL_PRICING_LATENCY', 0.05))
+
+def local_backend_enabled():
+    return CLOPS_BACKEND == 'local'
+
+def create_client(service_name, region_name, config=None):
+    """CLOPS_BACKEND 설정에 따라 boto3 클라이언트 또는 가짜 클라이언트 생성 (카세트 모드면 기록/재생 래퍼 적용)
+
+    config: botocore Config (연결 풀/타임아웃/재시도, 가짜 클라이언트에서는 무시)
+    """
+    return wrap_client(service_name, lambda: _create_client(service_name, region_name, config))
+
+def _create_client(service_name, region_name, config=None):
+    if not local_backend_enabled():
+        return boto3.client(service_name, region_name=region_name, config=config)
+    factory = LOCAL_CLIENTS.get(service_name)
+    if factory is None:
+        raise ValueError(f"No local backend for {service_name}")
+    return factory()
+
+def simulate_latency(seconds, jitter=0.0):
+    if seconds > 0:
+        time.sleep(max(0.0, seconds * (1 + random.uniform(-jitter, jitter))))
+
+# ---------------------------------------------------------------------------
+# bedrock-runtime
+
+class FakeBedrockRuntime:
+    """스크립트된 응답을 돌려주는 bedrock-runtime 대체 구현
+
+    responses 파일 형식 (JSON 목록, 위에서부터 처음 일치하는 규칙 사용):
+        [{"match": "프롬프트에 포함된 문자열", "text": "모델 응답 텍스트", "latency": 1.5}]
+    일치하는 규칙이 없으면 프롬프트 종류(1/3/5단계, 예산 조정, JSON 수리)에 맞는 기본 응답을 생성
+    """
+    def __init__(self, responses_path=LOCAL_BEDROCK_RESPONSES, latency=LOCAL_BEDROCK_LATENCY,
+                 jitter=LOCAL_BEDROCK_JITTER, throttle_rate=LOCAL_BEDROCK_THROTTLE_RATE):
+        self.rules = []
+        if responses_path:
+            with open(responses_path, encoding='utf-8') as f:
+                self.rules = json.load(f)
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        with self.lock:
+            self.calls += 1
+        if self.throttle_rate and random.random() < self.throttle_rate:
+            simulate_latency(0.05)
+            raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded (local)'}}, 'InvokeModel')
+
+        request = json.loads(body)
+        prompt = '\n'.join(
+            part.get('text', '')
+            for message in request.get('messages', [])
+            for part in message.get('content', [])
+        )
+
+        rule = next((rule for rule in self.rules if rule.get('match', '') in prompt), None)
+        if rule is not None:
+            simulate_latency(rule.get('latency', self.latency), self.jitter)
+            text = rule['text'] if isinstance(rule['text'], str) else json.dumps(rule['text'], ensure_ascii=False)
+        else:
+            simulate_latency(self.latency, self.jitter)
+            text = default_model_response(prompt)
+
+        payload = {
+            'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+            'stopReason': 'end_turn',
+            'usage': {'inputTokens': len(prompt) // 4, 'outputTokens': len(text) // 4}
+        }
+        return {'body': io.BytesIO(json.dumps(payload, ensure_ascii=False).encode('utf-8')), 'contentType': 'application/json'}
+
+DEFAULT_STEP1_SERVICES = [
+    {'name': 'AmazonCloudFront', 'reason': 'CDN으로 트래픽 분산 및 DDoS 보호'},
+    {'name': 'AWSWAF', 'reason': '웹 애플리케이션 방화벽으로 악성 트래픽 차단'},
+    {'name': 'ElasticLoadBalancingV2', 'reason': '다중 인스턴스 간 로드밸런싱'},
+    {'name': 'AmazonEC2', 'reason': 'Auto Scaling으로 트래픽 급증 대응'},
+    {'name': 'AmazonRDS', 'reason': 'Multi-AZ 데이터베이스'},
+    {'name': 'AmazonCloudWatch', 'reason': '모니터링 및 알림'}
+]
+
+DEFAULT_STEP3_SERVICES = [
+    {'name': 'AmazonCloudFront', 'type': 'standard', 'quantity': 1, 'reason': 'CDN으로 트래픽 분산, DDoS 보호'},
+    {'name': 'ElasticLoadBalancingV2', 'type': 'standard', 'quantity': 1, 'reason': '로드밸런싱'},
+    {'name': 'AmazonEC2', 'type': 't3.medium', 'quantity': 2, 'reason': 'Auto Scaling 웹서버'},
+    {'name': 'AmazonRDS', 'type': 'db.t3.micro', 'quantity': 1, 'reason': '데이터베이스'}
+]
+
+def default_model_response(prompt):
+    """프롬프트 종류를 보고 파이프라인이 파싱할 수 있는 결정적 응답 생성"""
+    if REPAIR_MARKER in prompt:
+        # 수리 요청: 삽입된 조각의 문법만 고쳐 그대로 반환 (형식 오류는 고치지 않음)
+        result, _ = parse_lenient(prompt.split('JSON 조각:', 1)[1])
+    elif 'recalculated_services' in prompt:
+        services = _embedded_json(prompt, ('현재 서비스 구성:', '현재 선택된 서비스들입니다:'))
+        if services and isinstance(services[0], list):
+            services = services[0]
+        recalculated = []
+        for service in services or []:
+            unit_cost = service.get('unit_monthly_cost', service.get('monthly_cost', 0)) or 0
+            quantity = service.get('quantity', 1) or 1
+            recalculated.append({
+                'name': service.get('name'),
+                'type': service.get('type', 'standard'),
+                'unit_monthly_cost': unit_cost,
+                'quantity': quantity,
+                'user_based_usage_cost': 0,
+                'total_monthly_cost': round(unit_cost * quantity, 2),
+                'reason': service.get('reason', '')
+            })
+        result = {
+            'recalculated_services': recalculated,
+            'total_cost': round(sum(service['total_monthly_cost'] for service in recalculated), 2),
+            'cost_explanation': 'local backend: 기존 비용 유지'
+        }
+    elif '서비스와 가격 옵션' in prompt:
+        result = {
+            'disaster_ready_services': [dict(service, monthly_cost=0) for service in DEFAULT_STEP3_SERVICES],
+            'total_cost': 0,
+            'disaster_readiness_score': 80,
+            'explanation': 'local backend 기본 구성'
+        }
+    elif 'disaster_ready_services' in prompt:
+        result = {'disaster_ready_services': DEFAULT_STEP1_SERVICES}
+    else:
+        return 'local backend response'
+    return '```json\n' + json.dumps(result, ensure_ascii=False, indent=2) + '\n```'
+
+def _embedded_json(prompt, markers):
+    """프롬프트에 삽입된 JSON 값을 marker 뒤에서 찾아 파싱"""
+    decoder = json.JSONDecoder()
+    for marker in markers:
+        index = prompt.find(marker)
+        if index < 0:
+            continue
+        start = min((i for i in (prompt.find('[', index), prompt.find('{', index)) if i >= 0), default=-1)
+        if start < 0:
+            continue
+        try:
+            return decoder.raw_decode(prompt[start:])[0]
+        except ValueError:
+            continue
+    return None
+
+# ---------------------------------------------------------------------------
+# pricing
+
+# 스냅샷이 없을 때 사용하는 합성 가격표 (시간당 USD, us-east-1 기준)
+SYNTHETIC_HOURLY_PRICES = {
+    'AmazonEC2': {
+        't2.nano': 0.0058, 't2.micro': 0.0116, 't2.small': 0.023, 't2.medium': 0.0464,
+        't3.micro': 0.0104, 't3.small': 0.0208, 't3.medium': 0.0416, 't3.large': 0.0832,
+        'm5.large': 0.096, 'm5.xlarge': 0.192, 'c5.large': 0.085, 'c5.xlarge': 0.17
+    },
+    'AmazonRDS': {
+        'db.t3.micro': 0.017, 'db.t3.small': 0.034, 'db.t3.medium': 0.068, 'db.t3.large': 0.136,
+        'db.m5.large': 0.171
+    },
+    'AmazonElastiCache': {'cache.t3.micro': 0.017, 'cache.t3.small': 0.034, 'cache.t3.medium': 0.068},
+    'AmazonCloudFront': {None: 0.0116},
+    'AWSWAF': {None: 0.0069},
+    'ElasticLoadBalancingV2': {None: 0.0225},
+    'AmazonS3': {None: 0.0032},
+    'AmazonRoute53': {None: 0.0007},
+    'AmazonCloudWatch': {None: 0.0041}
+}
+
+class FakePricing:
+    """로컬 상품 스냅샷으로 get_products / describe_services 를 제공하는 pricing 대체 구현
+
+    스냅샷 형식: {"ServiceCode": [Pricing API의 PriceList 항목(dict), ...]}
+    (save_pricing_snapshot 으로 실제 API에서 저장 가능)
+    """
+    def __init__(self, snapshot_path=LOCAL_PRICING_SNAPSHOT, latency=LOCAL_PRICING_LATENCY):
+        self.latency = latency
+        self.snapshot = None
+        if snapshot_path:
+            with open(snapshot_path, encoding='utf-8') as f:
+                self.snapshot = json.load(f)
+        self.synthetic = {}  # (service_code, location) -> products
+        self.lock = threading.Lock()
+
+    def describe_services(self, ServiceCode=None, MaxResults=100, **kwargs):
+        simulate_latency(self.latency)
+        codes = sorted(self.snapshot) if self.snapshot is not None else sorted(SYNTHETIC_HOURLY_PRICES)
+        if ServiceCode:
+            codes = [code for code in codes if code == ServiceCode]
+        return {'Services': [{'ServiceCode': code, 'AttributeNames': []} for code in codes[:MaxResults]]}
+
+    def get_products(self, ServiceCode, Filters=None, MaxResults=100, NextToken=None, **kwargs):
+        simulate_latency(self.latency)
+        filters = {f['Field']: f['Value'] for f in Filters or [] if f.get('Type') == 'TERM_MATCH'}
+        products = self._products(ServiceCode, filters.get('location'))
+        matched = [product for product in products if _matches(product, filters)]
+
+        offset = int(NextToken or 0)
+        page = matched[offset:offset + MaxResults]
+        response = {'FormatVersion': 'aws_v1', 'PriceList': [json.dumps(product) for product in page]}
+        if offset + MaxResults < len(matched):
+            response['NextToken'] = str(offset + MaxResults)
+        return response
+
+    def _products(self, service_code, location):
+        if self.snapshot is not None:
+            return self.snapshot.get(service_code, [])
+        key = (service_code, location)
+        with self.lock:
+            if key not in self.synthetic:
+                self.synthetic[key] = synthetic_products(service_code, location or 'US East (N. Virginia)')
+            return self.synthetic[key]
+
+def _matches(product, filters):
+    attributes = product.get('product', {}).get('attributes', {})
+    for field, value in filters.items():
+        if field == 'ServiceCode':
+            continue
+        if str(attributes.get(field, '')).lower() != str(value).lower():
+            return False
+    return True
+
+def synthetic_products(service_code, location):
+    """합성 가격표로 PriceList 형식의 상품 생성 (리전별 가격은 location 해시로 결정적으로 변동)"""
+    prices = SYNTHETIC_HOURLY_PRICES.get(service_code)
+    if not prices:
+        return []
+    multiplier = 1.0 if location == 'US East (N. Virginia)' else 1 + int(hashlib.md5(location.encode('utf-8')).hexdigest(), 16) % 25 / 100
+
+    products = []
+    for instance_type, hourly in prices.items():
+        attributes = {'location': location, 'servicecode': service_code}
+        if instance_type:
+            attributes['instanceType'] = instance_type
+        if service_code == 'AmazonEC2':
+            attributes.update({'operatingSystem': 'Linux', 'tenancy': 'Shared'})
+        elif service_code == 'AmazonRDS':
+            attributes['databaseEngine'] = 'MySQL'
+        sku = hashlib.md5(f"{service_code}/{location}/{instance_type}".encode('utf-8')).hexdigest()[:16].upper()
+        products.append({
+            'product': {'sku': sku, 'productFamily': 'Local', 'attributes': attributes},
+            'serviceCode': service_code,
+            'publicationDate': '2024-01-01T00:00:00Z',
+            'terms': {'OnDemand': {f'{sku}.JRTCKXETXF': {
+                'sku': sku,
+                'priceDimensions': {f'{sku}.JRTCKXETXF.6YS6EN2CT7': {
+                    'unit': 'Hrs',
+                    'pricePerUnit': {'USD': f'{hourly * multiplier:.6f}'}
+                }}
+            }}}
+        })
+    return products
+
+def save_pricing_snapshot(client, service_codes, locations, path, max_products=100):
+    """실제 Pricing API 결과를 FakePricing 스냅샷 파일로 저장"""
+    snapshot = {}
+    for service_code in service_codes:
+        products = []
+        for location in locations:
+            response = client.get_products(
+                ServiceCode=service_code,
+                Filters=[{'Type': 'TERM_MATCH', 'Field': 'location', 'Value': location}],
+                MaxResults=max_products
+            )
+            products.extend(json.loads(product) for product in response['PriceList'])
+        snapshot[service_code] = products
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    return snapshot
+
+# ---------------------------------------------------------------------------
+# rds / ssm 탐색
+
+class FakeRDS:
+    def describe_db_instances(self, **kwargs):
+        return {'DBInstances': [{
+            'DBInstanceIdentifier': 'team02-hackathon-db-local',
+            'DBInstanceStatus': 'available',
+            'Endpoint': {'Address': 'localhost', 'Port': 3306},
+            'MasterUsername': 'admin',
+            'DBName': 'clops'
+        }]}
+
+class FakeSSM:
+    def __init__(self, parameters=None):
+        self.parameters = parameters or {'/team02-hackathon/rds/password': 'local'}
+
+    def get_parameter(self, Name, WithDecryption=False, **kwargs):
+        if Name not in self.parameters:
+            raise ClientError({'Error': {'Code': 'ParameterNotFound', 'Message': Name}}, 'GetParameter')
+        return {'Parameter': {'Name': Name, 'Type': 'SecureString', 'Value': self.parameters[Name]}}
+
+LOCAL_CLIENTS = {
+    'bedrock-runtime': FakeBedrockRuntime,
+    'pricing': FakePricing,
+    'rds': FakeRDS,
+    'ssm': FakeSSM
+}
+
+# ---------------------------------------------------------------------------
+# MySQL 대체 SQLite 저장소
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(sep=' '))
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode('utf-8')))
+
+SQL_REWRITES = [
+    (re.compile(r'\b(?:BIG)?INT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY', re.I), 'INTEGER PRIMARY KEY AUTOINCREMENT'),
+    (re.compile(r'\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP', re.I), ''),
+    (re.compile(r'\bTIMESTAMP\(\d\)', re.I), 'TIMESTAMP'),
+    (re.compile(r'\bVALUES\((\w+)\)', re.I), r'excluded.\1'),
+    (re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.I), 'ON CONFLICT DO UPDATE SET'),
+    (re.compile(r'\s+FOR\s+UPDATE(\s+SKIP\s+LOCKED)?', re.I), ''),
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.I), 'INSERT OR IGNORE'),
+    (re.compile(r'\bNOW\(\)', re.I), 'CURRENT_TIMESTAMP'),
+    (re.compile(r'%s'), '?')
+]
+INLINE_INDEX = re.compile(r',\s*(?:UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\(([^)]*)\)', re.I)
+CREATE_TABLE = re.compile(r'CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+(\w+)', re.I)
+INDEX_LOOKUP = re.compile(r'information_schema\.statistics', re.I)
+COLUMN_LOOKUP = re.compile(r'information_schema\.columns', re.I)
+
+def translate_sql(sql):
+    """이 저장소에서 쓰는 MySQL 구문을 SQLite 문장 목록으로 변환"""
+    if INDEX_LOOKUP.search(sql):
+        return ["SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name = ?"]
+    if COLUMN_LOOKUP.search(sql):
+        return ["SELECT COUNT(*) FROM pragma_table_info(?) WHERE name = ?"]
+
+    statements = []
+    table = CREATE_TABLE.search(sql)
+    if table:
+        for name, columns in INLINE_INDEX.findall(sql):
+            statements.append(f'CREATE INDEX IF NOT EXISTS {name} ON {table.group(1)} ({columns})')
+        sql = INLINE_INDEX.sub('', sql)
+
+    for pattern, replacement in SQL_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return [sql] + statements
+
+class SQLiteCursor:
+    def __init__(self, cursor, as_dict):
+        self.cursor = cursor
+        self.as_dict = as_dict
+
+    def execute(self, sql, params=()):
+        statements = translate_sql(sql)
+        self.cursor.execute(statements[0], tuple(params or ()))
+        for statement in statements[1:]:
+            self.cursor.execute(statement)
+        return self.cursor.rowcount
+
+    def executemany(self, sql, rows):
+        statements = translate_sql(sql)
+        self.cursor.executemany(statements[0], [tuple(row) for row in rows])
+        return self.cursor.rowcount
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        return self._row(row) if row is not None else None
+
+    def fetchall(self):
+        return [self._row(row) for row in self.cursor.fetchall()]
+
+    def _row(self, row):
+        if not self.as_dict:
+            return tuple(row)
+        return {column[0]: value for column, value in zip(self.cursor.description, row)}
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+    def close(self):
+        self.cursor.close()
+
+class SQLiteConnection:
+    """pymysql 연결과 같은 인터페이스(cursor/commit/rollback/close)의 SQLite 연결"""
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=30, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+
+    def cursor(self, cursor_class=None):
+        as_dict = cursor_class is not None and cursor_class.__name__ == 'DictCursor'
+        return SQLiteCursor(self.conn.cursor(), as_dict)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+def connect_sqlite(path=LOCAL_DB_PATH):
+    return SQLiteConnection(path)
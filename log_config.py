@@ -0,0 +1,98 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+from job_deadline import current_deadline
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json | text
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))  # 반복 루프 내 상세 로그 샘플링 비율
+
+class RequestContextFilter(logging.Filter):
+    """현재 스레드에 바인딩된 작업의 uuid를 로그에 추가 (큐에 넣기 전, 호출 스레드에서 실행)"""
+    def filter(self, record):
+        deadline = current_deadline()
+        record.request_uuid = deadline.request_uuid if deadline else None
+        return True
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        if getattr(record, 'request_uuid', None):
+            entry['request_uuid'] = record.request_uuid
+        if getattr(record, 'fields', None):
+            entry.update(record.fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        message = super().format(record)
+        if getattr(record, 'request_uuid', None):
+            message = f"[{record.request_uuid}] {message}"
+        if getattr(record, 'fields', None):
+            message += ' ' + ' '.join(f"{k}={v}" for k, v in record.fields.items())
+        return message
+
+_listener = None
+
+def setup_logging():
+    """clops 로거에 비동기 큐 핸들러 설정: 호출 스레드는 큐에 넣기만 하고 출력은 별도 스레드에서"""
+    global _listener
+    root = logging.getLogger('clops')
+    if _listener is not None:
+        return root
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == 'text':
+        stream_handler.setFormatter(TextFormatter('%(asctime)s %(levelname)s %(name)s %(message)s'))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter())
+
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+    root.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    os.register_at_fork(after_in_child=lambda: _restart_listener(queue_handler))
+    return root
+
+def _restart_listener(queue_handler):
+    """fork 된 워커 프로세스에는 출력 스레드가 복제되지 않으므로 새 큐와 스레드로 다시 시작"""
+    global _listener
+    log_queue = queue.SimpleQueue()
+    queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def get_logger(name):
+    return logging.getLogger(f'clops.{name}')
+
+def sampled(rate=None):
+    """반복 루프 내 로그를 rate 비율로만 남기기 위한 판정"""
+    rate = LOG_SAMPLE_RATE if rate is None else rate
+    return rate >= 1 or random.random() < rate
+
+def log_sampled(logger, level, msg, *args, **kwargs):
+    """레벨이 활성화되어 있고 샘플에 포함될 때만 기록 (메시지 포맷 비용도 생략)"""
+    if logger.isEnabledFor(level) and sampled():
+        logger.log(level, msg, *args, **kwargs)
@@ -0,0 +1,170 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+class MetricsRegistry:
+    """Prometheus 텍스트 형식으로 노출하는 카운터/히스토그램 저장소"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counters = {}    # (name, labels) -> value
+        self.gauges = {}      # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket_counts, sum, count]
+        self.help = {}
+        self.lock = threading.Lock()
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, self._labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, labels=None):
+        with self.lock:
+            self.gauges[(name, self._labels(labels))] = value
+
+    def observe(self, name, value, labels=None):
+        key = (name, self._labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = [[0] * len(self.buckets), 0.0, 0]
+                self.histograms[key] = histogram
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def snapshot(self):
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self.histograms.items()}
+        return counters, gauges, histograms
+
+    def export(self):
+        """다른 프로세스에 넘길 수 있는 JSON 형식 스냅샷 (merge 로 합침)"""
+        counters, gauges, histograms = self.snapshot()
+        return {
+            'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+            'gauges': [[name, labels, value] for (name, labels), value in gauges.items()],
+            'histograms': [[name, labels, list(histogram)] for (name, labels), histogram in histograms.items()],
+        }
+
+    def merge(self, exported, gauge_labels=None):
+        """export() 결과를 더함: 카운터/히스토그램은 합산, 게이지는 gauge_labels 를 붙여 기록 (None 이면 건너뜀)"""
+        with self.lock:
+            for name, labels, value in exported['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                self.counters[key] = self.counters.get(key, 0) + value
+            if gauge_labels is not None:
+                extra = self._labels(gauge_labels)
+                for name, labels, value in exported['gauges']:
+                    self.gauges[(name, tuple(sorted(set(map(tuple, labels)) | set(extra))))] = value
+            for name, labels, (bucket_counts, total, count) in exported['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = [[0] * len(self.buckets), 0.0, 0]
+                    self.histograms[key] = histogram
+                for i, bucket_count in enumerate(bucket_counts[:len(self.buckets)]):
+                    histogram[0][i] += bucket_count
+                histogram[1] += total
+                histogram[2] += count
+
+    def render(self):
+        counters, gauges, histograms = self.snapshot()
+        lines = []
+
+        for name in sorted({key[0] for key in gauges}):
+            self._header(lines, name, 'gauge')
+            for (metric, labels), value in sorted(gauges.items()):
+                if metric == name:
+                    lines.append(f"{name}{self._format(labels)} {value}")
+
+        for name in sorted({key[0] for key in counters}):
+            self._header(lines, name, 'counter')
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{self._format(labels)} {value}")
+
+        for name in sorted({key[0] for key in histograms}):
+            self._header(lines, name, 'histogram')
+            for (metric, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    lines.append(f"{name}_bucket{self._format(labels + (('le', str(bound)),))} {bucket_count}")
+                lines.append(f"{name}_bucket{self._format(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{self._format(labels)} {total:.6f}")
+                lines.append(f"{name}_count{self._format(labels)} {count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def _header(self, lines, name, metric_type):
+        if name in self.help:
+            lines.append(f"# HELP {name} {self.help[name]}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+    def _labels(self, labels):
+        return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+    def _format(self, labels):
+        if not labels:
+            return ''
+        escaped = [(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in labels]
+        return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+registry = MetricsRegistry()
+registry.describe('clops_span_seconds', 'Duration of pipeline stages and external calls')
+registry.describe('clops_span_errors_total', 'Spans that ended with an exception')
+registry.describe('clops_cache_total', 'Cache lookups by cache and result')
+registry.describe('clops_fallbacks_total', 'Deterministic fallbacks used, by step')
+registry.describe('clops_failures_total', 'Handled failures, by stage')
+registry.describe('clops_jobs_total', 'Finished jobs, by terminal status')
+registry.describe('clops_structured_output_total', 'Model JSON outputs by step and outcome (parsed, repaired_locally, repaired_by_model, failed)')
+
+span_listeners = []  # (labels, elapsed) 를 받는 함수 목록 (요청별 프로파일링 등)
+
+@contextmanager
+def span(kind, **labels):
+    """블록 실행 시간을 clops_span_seconds{kind=...} 히스토그램에 기록"""
+    labels['kind'] = kind
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.inc('clops_span_errors_total', labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe('clops_span_seconds', elapsed, labels)
+        for listener in span_listeners:
+            listener(labels, elapsed)
+
+def timed(kind, **labels):
+    """함수 실행 시간을 기록하는 데코레이터"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(kind, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def cache_result(cache, hit):
+    registry.inc('clops_cache_total', {'cache': cache, 'result': 'hit' if hit else 'miss'})
+
+def fallback(step):
+    registry.inc('clops_fallbacks_total', {'step': step})
+
+def failure(stage):
+    registry.inc('clops_failures_total', {'stage': stage})
+
+def structured_output(step, outcome):
+    registry.inc('clops_structured_output_total', {'step': step, 'outcome': outcome})
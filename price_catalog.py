@@ -0,0 +1,220 @@
+"""오프라인 가격 카탈로그
+
+지원 리전의 서비스/옵션별 월 가격을 압축된 바이너리 파일로 만들고, 백엔드는 시작 시 이를 메모리 매핑해
+Pricing API 호출 없이 조회합니다.
+
+    python3 price_catalog.py build --output run/price_catalog.bin            # 기본: 사전 로딩 대상 서비스 × 전체 리전
+    python3 price_catalog.py build --regions us-east-1,ap-northeast-2 --services AmazonEC2,AmazonRDS
+    python3 price_catalog.py show run/price_catalog.bin --service AmazonEC2 --region us-east-1
+
+파일 형식 (리틀 엔디언):
+    헤더      magic 'CLPC', version u32, 행 수 u32, 문자열 수 u32, 생성 시각 f64
+    문자열표  오프셋 u32[문자열 수 + 1] + UTF-8 바이트 (정렬된 고유 문자열, 번호 순서 = 사전 순서)
+    열        service u32[행 수], region u32[행 수], option u32[행 수], monthly_price f64[행 수] (NaN: 가격 없음)
+행은 (service, region, option) 순으로 정렬되어 있어 이진 탐색으로 조회합니다.
+"""
+import argparse
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MAGIC = b'CLPC'
+VERSION = 1
+HEADER = struct.Struct('<4sIIId')
+
+logger = logging.getLogger('clops.catalog')
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def write_catalog(path, rows, built_at=None):
+    """rows: (service, region, option, 월 가격 또는 None) 목록을 카탈로그 파일로 기록 (임시 파일에 쓴 뒤 교체)"""
+    latest = {}
+    for service, region, option, price in rows:
+        latest[(service, region, option)] = price
+    strings = sorted({value for key in latest for value in key})
+    ids = {value: index for index, value in enumerate(strings)}
+    entries = sorted((ids[service], ids[region], ids[option], price) for (service, region, option), price in latest.items())
+
+    encoded = [value.encode('utf-8') for value in strings]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+
+    count = len(entries)
+    blob = bytearray(HEADER.pack(MAGIC, VERSION, count, len(strings), built_at or time.time()))
+    blob += struct.pack(f'<{len(offsets)}I', *offsets)
+    blob += b''.join(encoded)
+    blob += b'\0' * (_align(len(blob)) - len(blob))
+    for column in range(3):
+        blob += struct.pack(f'<{count}I', *(entry[column] for entry in entries))
+    blob += b'\0' * (_align(len(blob)) - len(blob))
+    blob += struct.pack(f'<{count}d', *(math.nan if entry[3] is None else entry[3] for entry in entries))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp = f"{path}.{os.getpid()}.tmp"
+    with open(temp, 'wb') as f:
+        f.write(blob)
+    os.replace(temp, path)
+    return count
+
+class PriceCatalog:
+    """메모리 매핑된 카탈로그 조회: 문자열은 해시 조회, 행은 (service, region, option) 이진 탐색"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, string_count, self.built_at = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path}: not a price catalog (version {version})')
+        self.count = count
+
+        view = memoryview(self.mm)
+        position = HEADER.size
+        offsets = view[position:position + 4 * (string_count + 1)].cast('I')
+        position += 4 * (string_count + 1)
+        self.strings = [bytes(view[position + offsets[i]:position + offsets[i + 1]]).decode('utf-8') for i in range(string_count)]
+        self.ids = {value: index for index, value in enumerate(self.strings)}
+        position = _align(position + offsets[string_count])
+
+        self.services = view[position:position + 4 * count].cast('I')
+        self.regions = view[position + 4 * count:position + 8 * count].cast('I')
+        self.options = view[position + 8 * count:position + 12 * count].cast('I')
+        position = _align(position + 12 * count)
+        self.prices = view[position:position + 8 * count].cast('d')
+
+    @classmethod
+    def open(cls, path):
+        """파일이 없거나 읽을 수 없으면 None"""
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            catalog = cls(path)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning("Price catalog %s unusable: %s", path, e)
+            return None
+        logger.info("Loaded price catalog %s (%d prices, built %s)", path, catalog.count,
+                    time.strftime('%Y-%m-%d %H:%M', time.gmtime(catalog.built_at)))
+        return catalog
+
+    def _key(self, index):
+        return (self.services[index], self.regions[index], self.options[index])
+
+    def _lower_bound(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def lookup(self, service, option, region):
+        """(카탈로그에 있는지, 월 가격 또는 None) 반환"""
+        key = (self.ids.get(service), self.ids.get(region), self.ids.get(option))
+        if None in key:
+            return False, None
+        index = self._lower_bound(key)
+        if index >= self.count or self._key(index) != key:
+            return False, None
+        price = self.prices[index]
+        return True, None if math.isnan(price) else price
+
+    def _range(self, service, region):
+        service_id, region_id = self.ids.get(service), self.ids.get(region)
+        if service_id is None or region_id is None:
+            return range(0)
+        return range(self._lower_bound((service_id, region_id, 0)), self._lower_bound((service_id, region_id + 1, 0)))
+
+    def service_options(self, service, region):
+        """리전의 서비스 옵션 목록 (카탈로그에 없으면 None)"""
+        rows = self._range(service, region)
+        return [self.strings[self.options[i]] for i in rows] or None
+
+    def region_costs(self, region):
+        """리전의 {서비스: {옵션: 월 가격}} (가격 있는 항목만)"""
+        region_id = self.ids.get(region)
+        costs = {}
+        for i in range(self.count):
+            if self.regions[i] == region_id and not math.isnan(self.prices[i]):
+                costs.setdefault(self.strings[self.services[i]], {})[self.strings[self.options[i]]] = self.prices[i]
+        return costs
+
+    def stats(self):
+        return {'path': self.path, 'prices': self.count, 'bytes': len(self.mm), 'built_at': self.built_at}
+
+def collect_rows(optimizer, services, regions, workers=4):
+    """Pricing API(또는 로컬 가짜 구현)에서 서비스 × 리전별 옵션과 월 가격 수집 (AWSOptimizer 조회 로직 재사용)"""
+    def collect(target):
+        service, region = target
+        try:
+            options = optimizer.extract_service_options(optimizer.fetch_service_products(service, region))
+        except Exception as e:
+            logger.warning("Catalog build skipped %s (%s): %s", service, region, e)
+            return []
+        rows = []
+        for option in options:
+            try:
+                price = optimizer._get_aws_service_price(service, option, region)
+            except Exception as e:
+                logger.debug("Catalog price failed for %s %s (%s): %s", service, option, region, e)
+                price = None
+            rows.append((service, region, option, price if price and price > 0 else None))
+        return rows
+
+    targets = [(service, region) for region in regions for service in services]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [row for rows in executor.map(collect, targets) for row in rows]
+
+def main():
+    parser = argparse.ArgumentParser(description='오프라인 가격 카탈로그 생성/조회')
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help='Pricing API 에서 가격을 수집해 카탈로그 생성')
+    build.add_argument('--output', '-o', default=None, help='카탈로그 파일 (기본: PRICE_CATALOG_PATH)')
+    build.add_argument('--regions', default=None, help='쉼표로 구분한 리전 (기본: 지원 리전 전체)')
+    build.add_argument('--services', default=None, help='쉼표로 구분한 서비스 코드 (기본: 가격 사전 로딩 대상)')
+    build.add_argument('--workers', type=int, default=4)
+    show = commands.add_parser('show', help='카탈로그 내용 출력')
+    show.add_argument('path')
+    show.add_argument('--service', default=None)
+    show.add_argument('--region', default='us-east-1')
+    args = parser.parse_args()
+
+    if args.command == 'show':
+        catalog = PriceCatalog(args.path)
+        costs = catalog.region_costs(args.region)
+        if args.service:
+            costs = {args.service: costs.get(args.service, {})}
+        print(json.dumps({'catalog': catalog.stats(), 'region': args.region, 'costs': costs}, ensure_ascii=False, indent=2))
+        return 0
+
+    sys.path.insert(0, ROOT)
+    import imsi_new as backend
+
+    regions = args.regions.split(',') if args.regions else list(backend.REGION_LOCATIONS)
+    services = args.services.split(',') if args.services else backend.warmup_service_names()
+    started = time.perf_counter()
+    rows = collect_rows(backend.optimizer, services, regions, max(1, args.workers))
+    output = args.output or backend.PRICE_CATALOG_PATH
+    count = write_catalog(output, rows)
+    print(json.dumps({
+        'output': output,
+        'services': len(services),
+        'regions': len(regions),
+        'prices': count,
+        'priced': sum(1 for row in rows if row[3] is not None),
+        'bytes': os.path.getsize(output),
+        'elapsed_seconds': round(time.perf_counter() - started, 2)
+    }, ensure_ascii=False, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
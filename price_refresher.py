@@ -0,0 +1,86 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger('clops.prices')
+
+class PriceRefresher:
+    def __init__(self, optimizer, service_names, regions, interval=6 * 3600, max_workers=4):
+        """
+        optimizer: AWSOptimizer (pricing_cache / options_cache를 채움)
+        service_names: 사전 로딩할 서비스 이름 목록을 반환하는 함수
+        """
+        self.optimizer = optimizer
+        self.service_names = service_names
+        self.regions = regions
+        self.interval = interval
+        self.max_workers = max_workers
+        self.fingerprints = {}
+        self.last_run = None
+        self.thread = None
+
+    def start(self):
+        """시작 시 1회 로딩 후 주기적으로 변경분만 갱신"""
+        def run():
+            while True:
+                try:
+                    self.refresh_all()
+                except Exception as e:
+                    logger.exception("Price refresh failed: %s", e)
+                time.sleep(self.interval)
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def refresh_all(self):
+        started = time.time()
+        targets = [(service, region) for region in self.regions for service in self.service_names()]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            changed = sum(executor.map(lambda target: self.refresh_service(*target), targets))
+
+        self.last_run = {
+            'finished_at': time.time(),
+            'duration': round(time.time() - started, 2),
+            'services': len(targets),
+            'changed': changed
+        }
+        logger.info("Price refresh complete: %d/%d service-regions changed in %ss", changed, len(targets), self.last_run['duration'])
+        return changed
+
+    def refresh_service(self, service, region):
+        """상품 목록의 SKU/게시일 지문이 바뀐 경우에만 옵션별 가격을 다시 조회"""
+        key = (service, region)
+        try:
+            products = self.optimizer.fetch_service_products(service, region)
+        except Exception as e:
+            logger.warning("Price refresh skipped for %s (%s): %s", service, region, e)
+            return False
+
+        fingerprint = self._fingerprint(products)
+        if self.fingerprints.get(key) == fingerprint:
+            return False
+
+        options = self.optimizer.extract_service_options(products)
+        for option in options:
+            try:
+                price = self.optimizer._get_aws_service_price(service, option, region)
+            except Exception as e:
+                logger.debug("Price refresh failed for %s %s (%s): %s", service, option, region, e)
+                continue
+            self.optimizer.pricing_cache[f"{service}_{option}_{region}"] = price
+
+        self.optimizer.options_cache[f"{service}_{region}"] = options
+        self.fingerprints[key] = fingerprint
+        return True
+
+    def _fingerprint(self, products):
+        entries = sorted(
+            (product.get('product', {}).get('sku', ''), product.get('publicationDate', ''))
+            for product in products
+        )
+        return hashlib.sha256(json.dumps(entries).encode('utf-8')).hexdigest()
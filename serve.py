@@ -0,0 +1,113 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 운영 실행: 하나의 리스닝 소켓을 N개의 워커 프로세스가 함께 accept (커널이 연결을 분배)
+SERVE_WORKERS = int(os.environ.get('SERVE_WORKERS', os.cpu_count() or 2))
+SERVE_HOST = os.environ.get('SERVE_HOST', '0.0.0.0')
+SERVE_PORT = int(os.environ.get('SERVE_PORT', 5000))
+SERVE_BACKLOG = int(os.environ.get('SERVE_BACKLOG', 128))
+SERVE_RESPAWN_DELAY = float(os.environ.get('SERVE_RESPAWN_DELAY', 1.0))
+
+logger = logging.getLogger('clops.serve')
+
+def run_worker(backend, index, workers, sock):
+    """워커 프로세스: 가격 갱신/보존 정리는 0번 워커만, 작업 큐 워커와 HTTP 서버는 모든 워커에서 실행"""
+    from werkzeug.serving import make_server
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # Bedrock 동시 호출 상한은 계정 단위이므로 워커 수로 나눠 적용
+    limiter = backend.bedrock_limiter
+    limiter.maximum = max(limiter.minimum, limiter.maximum // workers)
+    limiter.limit = min(limiter.limit, limiter.maximum)
+
+    if index == 0:
+        backend.price_refresher.start()
+        backend.start_retention_worker()
+    if backend.JOB_QUEUE_ENABLED:
+        backend.job_queue.start()
+    # 이전 실행에서 DB에 반영되지 못한 문의 세그먼트도 이어서 반영
+    backend.contact_writer.start()
+    # /metrics 는 모든 워커가 공유 저장소에 기록한 값을 합쳐서 응답
+    backend.start_metrics_publisher()
+
+    server = make_server(SERVE_HOST, SERVE_PORT, backend.app, threaded=True, fd=sock.fileno())
+    logger.info("Worker %d (pid %d) serving on %s:%d", index, os.getpid(), SERVE_HOST, SERVE_PORT)
+    server.serve_forever()
+
+def serve(workers=SERVE_WORKERS):
+    # 가격/1단계 결과/폴백 작업 상태를 워커 간에 공유 (백엔드 모듈을 불러오기 전에 설정해야 함)
+    os.environ.setdefault('SHARED_CACHE_PATH', os.path.join(ROOT, 'run', 'shared_cache.db'))
+    sys.path.insert(0, ROOT)
+    import imsi_new as backend
+
+    # 스키마 초기화는 fork 전에 한 번만 (워커마다 같은 DDL 을 실행하지 않도록)
+    backend.initialize_database()
+    # 이전 실행의 워커별 메트릭은 버림 (재시작 시 카운터가 0부터 다시 시작)
+    backend.worker_metrics.clear()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((SERVE_HOST, SERVE_PORT))
+    sock.listen(SERVE_BACKLOG)
+    sock.set_inheritable(True)
+
+    children = {}  # pid -> 워커 번호
+    state = {'stopping': False}
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                run_worker(backend, index, workers, sock)
+            except Exception as e:
+                logger.exception("Worker %d crashed: %s", index, e)
+                code = 1
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        children[pid] = index
+
+    def stop(signum, frame):
+        state['stopping'] = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for index in range(workers):
+        spawn(index)
+    logger.info("Started %d backend workers on %s:%d (shared cache: %s)", workers, SERVE_HOST, SERVE_PORT, os.environ['SHARED_CACHE_PATH'])
+
+    # 종료된 워커는 같은 번호로 다시 실행 (0번 워커가 재시작되면 백그라운드 작업도 함께 재개)
+    while children:
+        pid, status = os.wait()
+        index = children.pop(pid, None)
+        if index is None or state['stopping']:
+            continue
+        logger.warning("Worker %d (pid %d) exited with status %d, restarting", index, pid, os.waitstatus_to_exitcode(status))
+        time.sleep(SERVE_RESPAWN_DELAY)
+        spawn(index)
+    sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='ClOps 백엔드를 여러 워커 프로세스로 실행')
+    parser.add_argument('--workers', type=int, default=SERVE_WORKERS)
+    args = parser.parse_args()
+    serve(max(1, args.workers))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+
+logger = logging.getLogger('clops.shared_cache')
+
+# 여러 워커 프로세스가 공유하는 캐시/폴백 저장소 파일 (비어 있으면 프로세스 내 dict 사용)
+SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH', '')
+SHARED_CACHE_L1_TTL = float(os.environ.get('SHARED_CACHE_L1_TTL', 30))  # 프로세스 내 사본을 다시 읽기 전까지의 시간 (초)
+
+_MISSING = object()
+
+class SharedStore:
+    """namespace/key 단위 JSON 값 저장소: 같은 SQLite(WAL) 파일을 여러 프로세스가 함께 읽고 씀
+
+    path 가 비어 있으면 잠금으로 보호되는 프로세스 내 dict 로 동작 (단일 프로세스 실행과 동일)
+    """
+    def __init__(self, path=SHARED_CACHE_PATH):
+        self.path = path
+        self.local = threading.local()
+        self.memory = {}  # (namespace, key) -> (value, expires_at)
+        self.lock = threading.Lock()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with self._connection() as conn:
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS shared_cache (
+                        namespace TEXT NOT NULL,
+                        key TEXT NOT NULL,
+                        value TEXT,
+                        expires_at REAL,
+                        updated_at REAL NOT NULL,
+                        PRIMARY KEY (namespace, key)
+                    )
+                ''')
+
+    @property
+    def shared(self):
+        return bool(self.path)
+
+    def _connection(self):
+        """스레드별 연결 (fork 후에는 부모 프로세스의 연결을 쓰지 않고 새로 연결)"""
+        pid = os.getpid()
+        if getattr(self.local, 'pid', None) != pid:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn, self.local.pid = conn, pid
+        return self.local.conn
+
+    def get(self, namespace, key, default=None):
+        if not self.shared:
+            with self.lock:
+                value, expires_at = self.memory.get((namespace, key), (_MISSING, None))
+            if value is _MISSING or (expires_at is not None and expires_at < time.time()):
+                return default
+            return value
+
+        row = self._connection().execute(
+            'SELECT value FROM shared_cache WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at >= ?)',
+            (namespace, key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl else None
+        if not self.shared:
+            with self.lock:
+                self.memory[(namespace, key)] = (value, expires_at)
+            return
+        self._connection().execute('''
+            INSERT INTO shared_cache (namespace, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at, updated_at = excluded.updated_at
+        ''', (namespace, key, json.dumps(value, ensure_ascii=False, default=str), expires_at, time.time()))
+
+    def delete(self, namespace, key):
+        if not self.shared:
+            with self.lock:
+                return self.memory.pop((namespace, key), None) is not None
+        return self._connection().execute('DELETE FROM shared_cache WHERE namespace = ? AND key = ?', (namespace, key)).rowcount == 1
+
+    def setdefault(self, namespace, key, value, ttl=None):
+        """값이 없을 때만 저장하고, 저장된 값을 반환 (여러 프로세스가 동시에 호출해도 하나만 저장됨)"""
+        expires_at = time.time() + ttl if ttl else None
+        if not self.shared:
+            with self.lock:
+                current, current_expires = self.memory.get((namespace, key), (_MISSING, None))
+                if current is not _MISSING and (current_expires is None or current_expires >= time.time()):
+                    return current
+                self.memory[(namespace, key)] = (value, expires_at)
+                return value
+
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('DELETE FROM shared_cache WHERE namespace = ? AND key = ? AND expires_at < ?', (namespace, key, time.time()))
+            conn.execute('''
+                INSERT OR IGNORE INTO shared_cache (namespace, key, value, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)
+            ''', (namespace, key, json.dumps(value, ensure_ascii=False, default=str), expires_at, time.time()))
+            row = conn.execute('SELECT value FROM shared_cache WHERE namespace = ? AND key = ?', (namespace, key)).fetchone()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return json.loads(row[0])
+
+    def modify(self, namespace, key, update):
+        """저장된 값을 update(value) 로 제자리 수정 (다른 프로세스의 수정과 겹치지 않도록 쓰기 잠금 안에서, 값이 없으면 False)"""
+        if not self.shared:
+            with self.lock:
+                value, expires_at = self.memory.get((namespace, key), (_MISSING, None))
+                if value is _MISSING:
+                    return False
+                update(value)
+                return True
+
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT value FROM shared_cache WHERE namespace = ? AND key = ?', (namespace, key)).fetchone()
+            if row:
+                value = json.loads(row[0])
+                update(value)
+                conn.execute(
+                    'UPDATE shared_cache SET value = ?, updated_at = ? WHERE namespace = ? AND key = ?',
+                    (json.dumps(value, ensure_ascii=False, default=str), time.time(), namespace, key)
+                )
+            conn.execute('COMMIT')
+            return row is not None
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def items(self, namespace):
+        now = time.time()
+        if not self.shared:
+            with self.lock:
+                return [(key, value) for (ns, key), (value, expires_at) in self.memory.items()
+                        if ns == namespace and (expires_at is None or expires_at >= now)]
+        rows = self._connection().execute(
+            'SELECT key, value FROM shared_cache WHERE namespace = ? AND (expires_at IS NULL OR expires_at >= ?)',
+            (namespace, now)
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def count(self, namespace):
+        if not self.shared:
+            return len(self.items(namespace))
+        return self._connection().execute(
+            'SELECT COUNT(*) FROM shared_cache WHERE namespace = ? AND (expires_at IS NULL OR expires_at >= ?)',
+            (namespace, time.time())
+        ).fetchone()[0]
+
+    def purge_expired(self):
+        """만료된 항목 삭제 (삭제 건수 반환)"""
+        now = time.time()
+        if not self.shared:
+            with self.lock:
+                expired = [k for k, (_, expires_at) in self.memory.items() if expires_at is not None and expires_at < now]
+                for k in expired:
+                    del self.memory[k]
+                return len(expired)
+        return self._connection().execute('DELETE FROM shared_cache WHERE expires_at < ?', (now,)).rowcount
+
+class SharedDict(MutableMapping):
+    """SharedStore 의 한 namespace 를 dict 처럼 사용 (기존 dict 캐시 자리에 그대로 대체)
+
+    l1_ttl > 0 이면 읽은 값을 프로세스 내에 잠시 보관해 반복 조회 시 파일을 읽지 않음
+    (다른 프로세스의 갱신은 최대 l1_ttl 초 늦게 반영되므로 작업 상태처럼 즉시 일관돼야 하는 값은 0)
+    """
+    def __init__(self, store, namespace, ttl=None, l1_ttl=SHARED_CACHE_L1_TTL):
+        self.store = store
+        self.namespace = namespace
+        self.ttl = ttl
+        self.l1_ttl = l1_ttl if store.shared else 0
+        self.l1 = {}  # key -> (value, loaded_at)
+
+    def _lookup(self, key):
+        if self.l1_ttl > 0:
+            cached = self.l1.get(key)
+            if cached and time.time() - cached[1] < self.l1_ttl:
+                return cached[0]
+        value = self.store.get(self.namespace, key, _MISSING)
+        if value is not _MISSING and self.l1_ttl > 0:
+            self.l1[key] = (value, time.time())
+        return value
+
+    def __getitem__(self, key):
+        value = self._lookup(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self._lookup(key) is not _MISSING
+
+    def get(self, key, default=None):
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def __setitem__(self, key, value):
+        self.store.set(self.namespace, key, value, self.ttl)
+        if self.l1_ttl > 0:
+            self.l1[key] = (value, time.time())
+
+    def __delitem__(self, key):
+        self.l1.pop(key, None)
+        if not self.store.delete(self.namespace, key):
+            raise KeyError(key)
+
+    def pop(self, key, default=None):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            return default
+        self.l1.pop(key, None)
+        self.store.delete(self.namespace, key)
+        return value
+
+    def setdefault(self, key, default=None):
+        """값이 없을 때만 저장 (공유 모드에서도 원자적), 저장된 값 반환"""
+        value = self.store.setdefault(self.namespace, key, default, self.ttl)
+        if self.l1_ttl > 0:
+            self.l1[key] = (value, time.time())
+        return value
+
+    def modify(self, key, update):
+        """값을 update(value) 로 제자리 수정 (공유 모드에서는 다른 프로세스와 겹치지 않게 원자적으로)"""
+        self.l1.pop(key, None)
+        return self.store.modify(self.namespace, key, update)
+
+    def items(self):
+        return self.store.items(self.namespace)
+
+    def __iter__(self):
+        return iter([key for key, _ in self.items()])
+
+    def __len__(self):
+        return self.store.count(self.namespace)
+
+shared_store = SharedStore()
@@ -17,7 +17,7 @@ echo "RDS_PASSWORD set: $([ -n "$RDS_PASSWORD" ] && echo 'Yes' || echo 'No')"
 # 백엔드 서버 (RDS 자동 연결) 실행
 echo "Starting backend server with RDS auto-discovery on port 5000..."
 cd /home/ec2-user/repo
-RDS_PASSWORD="$RDS_PASSWORD" python3 imsi_new.py &
+RDS_PASSWORD="$RDS_PASSWORD" python3 serve.py &
 BACKEND_PID=$!
 
 # 프론트엔드 서버 실행
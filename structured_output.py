@@ -0,0 +1,384 @@
+import json
+import logging
+import re
+
+import metrics
+
+logger = logging.getLogger('clops.structured_output')
+
+REPAIR_MARKER = 'JSON 형식 복구 요청'
+_BARE_KEY = re.compile(r'[^:,{}\[\]\s]+')
+
+class StructuredOutputError(ValueError):
+    """모델 응답에서 단계별 형식의 JSON 을 얻지 못함 (호출한 단계는 기존 폴백 사용)"""
+
+class _Optional:
+    def __init__(self, schema, default):
+        self.schema = schema
+        self.default = default
+
+def optional(schema, default=None):
+    """스키마에서 없어도 되는 키 (없거나 null 이면 default 로 채움)"""
+    return _Optional(schema, default)
+
+NUMBER = 'number'  # int/float 또는 "$1,234.5" 같은 숫자 문자열 → float
+ANY = 'any'
+
+class _Truncated(Exception):
+    """값 도중에 입력이 끝남 (partial: 그때까지 읽은 컨테이너 내용, 컨테이너가 아니면 None)"""
+    def __init__(self, partial=None):
+        super().__init__()
+        self.partial = partial
+
+class _LenientParser:
+    """관대한 JSON 파서: 뒤따르는 쉼표, 따옴표 없는 키/값, 작은따옴표, 잘린 출력, 뒤에 붙은 텍스트를 허용
+
+    잘린 경우 열린 컨테이너를 그때까지의 내용으로 닫되, 잘린 객체/문자열/숫자는 상위 컨테이너에 넣지 않음
+    (완성된 항목이 남은 목록과 최상위 값만 유지: 빈 객체 항목이 검증 오류와 헛된 수리 호출을 만들지 않도록)
+    """
+    BARE_STOP = ',}]\n'
+
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.issues = []
+
+    def issue(self, name):
+        if name not in self.issues:
+            self.issues.append(name)
+
+    def eof(self):
+        return self.pos >= len(self.text)
+
+    def skip_ws(self):
+        while not self.eof() and self.text[self.pos] in ' \t\r\n':
+            self.pos += 1
+
+    def parse(self):
+        try:
+            value = self.value()
+        except _Truncated as truncated:
+            if truncated.partial is None:
+                raise StructuredOutputError('no JSON value in model output')
+            value = truncated.partial
+        self.skip_ws()
+        if not self.eof():
+            self.issue('extra_text')
+        return value
+
+    def value(self):
+        self.skip_ws()
+        if self.eof():
+            raise _Truncated()
+        c = self.text[self.pos]
+        if c == '{':
+            return self.container('}')
+        if c == '[':
+            return self.container(']')
+        if c in '"\'':
+            return self.string()
+        return self.bare()
+
+    def container(self, close):
+        is_object = close == '}'
+        self.pos += 1
+        result = {} if is_object else []
+        after_comma = False
+        while True:
+            self.skip_ws()
+            if self.eof():
+                self.issue('truncated')
+                raise _Truncated(result)
+            c = self.text[self.pos]
+            if c == close:
+                if after_comma:
+                    self.issue('trailing_comma')
+                self.pos += 1
+                return result
+            if c in '}]':
+                # 짝이 맞지 않는 닫는 괄호: 현재 컨테이너를 닫은 것으로 보고 상위에서 다시 처리
+                self.issue('mismatched_bracket')
+                return result
+            if c == ',':
+                if after_comma or not result:
+                    self.issue('extra_comma')
+                after_comma = True
+                self.pos += 1
+                continue
+            after_comma = False
+            try:
+                if is_object:
+                    key = self.key()
+                    self.skip_ws()
+                    if not self.eof() and self.text[self.pos] == ':':
+                        self.pos += 1
+                    else:
+                        self.issue('missing_colon')
+                    result[key] = self.value()
+                else:
+                    result.append(self.value())
+            except _Truncated as truncated:
+                self.issue('truncated')
+                if isinstance(truncated.partial, list) and truncated.partial:
+                    if is_object:
+                        result[key] = truncated.partial
+                    else:
+                        result.append(truncated.partial)
+                raise _Truncated(result)
+
+    def key(self):
+        if self.text[self.pos] in '"\'':
+            return self.string()
+        match = _BARE_KEY.match(self.text, self.pos)
+        if not match:
+            raise StructuredOutputError(f'unexpected character {self.text[self.pos]!r} at {self.pos}')
+        self.issue('unquoted_key')
+        self.pos = match.end()
+        return match.group(0)
+
+    def string(self):
+        quote = self.text[self.pos]
+        if quote == "'":
+            self.issue('single_quotes')
+        start = self.pos = self.pos + 1
+        while True:
+            if self.eof():
+                raise _Truncated()
+            c = self.text[self.pos]
+            if c == '\\':
+                self.pos += 2
+                continue
+            if c == quote:
+                raw = self.text[start:self.pos]
+                self.pos += 1
+                break
+            self.pos += 1
+        if quote == "'":
+            raw = raw.replace("\\'", "'").replace('"', '\\"')
+        try:
+            return json.loads(f'"{raw}"', strict=False)
+        except ValueError:
+            self.issue('bad_escape')
+            return raw
+
+    def bare(self):
+        start = self.pos
+        while not self.eof() and self.text[self.pos] not in self.BARE_STOP:
+            self.pos += 1
+        token = self.text[start:self.pos].strip()
+        if not token:
+            raise StructuredOutputError(f'unexpected character {self.text[start]!r} at {start}')
+        if self.eof():
+            raise _Truncated()  # 컨테이너가 닫히지 않은 채 끝남: 숫자 등이 잘렸을 수 있으므로 버림
+        lowered = token.lower()
+        if lowered in ('true', 'false'):
+            return lowered == 'true'
+        if lowered in ('null', 'none'):
+            return None
+        try:
+            return json.loads(token)
+        except ValueError:
+            pass
+        self.issue('bare_value')
+        return token
+
+_FENCE = re.compile(r'```([A-Za-z0-9_+-]*)[ \t]*\n?')
+
+def _fenced_blocks(text):
+    """(언어, 내용) 목록: 여는 ``` 와 다음 ``` 사이를 한 블록으로 (닫는 ``` 가 없으면 끝까지)"""
+    blocks = []
+    pos = 0
+    while True:
+        opening = _FENCE.search(text, pos)
+        if not opening:
+            return blocks
+        end = text.find('```', opening.end())
+        blocks.append((opening.group(1).lower(), text[opening.end():end if end >= 0 else len(text)]))
+        if end < 0:
+            return blocks
+        pos = end + 3
+
+def extract_json_text(text):
+    """모델 출력에서 JSON 후보 구간 찾기: ```json 블록 → 언어 표시 없는 ``` 블록 → 첫 '{' 부터"""
+    blocks = _fenced_blocks(text)
+    for language in ('json', ''):
+        for block_language, content in blocks:
+            start = content.find('{')
+            if block_language == language and start >= 0:
+                return content[start:]
+    start = text.find('{')
+    if start < 0:
+        raise StructuredOutputError('no JSON object in model output')
+    return text[start:]
+
+def parse_lenient(text):
+    """관대한 파싱: (값, 복구한 문제 목록) 반환"""
+    parser = _LenientParser(extract_json_text(text))
+    value = parser.parse()
+    return value, parser.issues
+
+def _coerce_number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if isinstance(value, str):
+        cleaned = value.strip().replace(',', '').replace('$', '').replace('USD', '').strip()
+        try:
+            return float(cleaned)
+        except ValueError:
+            return None
+    return None
+
+def validate(value, schema, path=''):
+    """스키마에 맞게 값 검증/변환: (변환된 값, [(경로, 오류)]) 반환
+
+    스키마: dict(키별 스키마, optional() 로 선택 키 표시) / [항목 스키마] / str / int / NUMBER / ANY
+    """
+    if schema == ANY:
+        return value, []
+    if schema == NUMBER:
+        number = _coerce_number(value)
+        return (number, []) if number is not None else (value, [(path, 'expected number')])
+    if schema is int:
+        number = _coerce_number(value)
+        if number is None or number != int(number):
+            return value, [(path, 'expected integer')]
+        return int(number), []
+    if schema is str:
+        if isinstance(value, str):
+            return value, []
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return str(value), []
+        return value, [(path, 'expected string')]
+    if isinstance(schema, list):
+        if not isinstance(value, list):
+            return value, [(path, 'expected list')]
+        items, errors = [], []
+        for index, item in enumerate(value):
+            item, item_errors = validate(item, schema[0], f'{path}[{index}]')
+            items.append(item)
+            errors.extend(item_errors)
+        return items, errors
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            return value, [(path, 'expected object')]
+        result, errors = dict(value), []
+        for key, sub in schema.items():
+            sub_path = f'{path}.{key}' if path else key
+            if isinstance(sub, _Optional):
+                if value.get(key) is None:
+                    result[key] = sub.default
+                    continue
+                sub = sub.schema
+            elif key not in value:
+                errors.append((sub_path, 'missing'))
+                continue
+            result[key], sub_errors = validate(value[key], sub, sub_path)
+            errors.extend(sub_errors)
+        return result, errors
+    raise TypeError(f'unsupported schema {schema!r}')
+
+def describe_schema(schema):
+    """수리 프롬프트에 넣을 스키마 표현"""
+    if isinstance(schema, _Optional):
+        return describe_schema(schema.schema) + ' (optional)'
+    if isinstance(schema, dict):
+        return '{' + ', '.join(f'"{key}": {describe_schema(sub)}' for key, sub in schema.items()) + '}'
+    if isinstance(schema, list):
+        return '[' + describe_schema(schema[0]) + ', ...]'
+    if schema is str:
+        return 'string'
+    if schema is int:
+        return 'integer'
+    return schema
+
+def repair_prompt(fragment, schema, errors):
+    problems = '\n'.join(f'- {path or "(root)"}: {message}' for path, message in errors[:20])
+    return f"""{REPAIR_MARKER}
+다음 JSON 조각을 아래 형식에 맞는 올바른 JSON 으로 고쳐서 ```json 블록 하나로만 출력하세요.
+값의 의미는 바꾸지 말고 문법과 형식만 고치세요. 설명은 쓰지 마세요.
+
+형식: {describe_schema(schema)}
+문제:
+{problems}
+
+JSON 조각:
+```json
+{fragment}
+```
+"""
+
+def _invalid_items(value, schema, errors):
+    """오류가 모두 최상위 목록 항목 안에 있으면 {키: [항목 번호]} 반환 (아니면 None)"""
+    if not isinstance(schema, dict):
+        return None
+    broken = {}
+    for path, _ in errors:
+        match = re.match(r'^(\w+)\[(\d+)\]', path)
+        if not match or not isinstance(schema.get(match.group(1)), list):
+            return None
+        broken.setdefault(match.group(1), set()).add(int(match.group(2)))
+    return {key: sorted(indexes) for key, indexes in broken.items()}
+
+def _repair(fragment, schema, errors, repair):
+    prompt = repair_prompt(json.dumps(fragment, ensure_ascii=False, indent=2) if not isinstance(fragment, str) else fragment, schema, errors)
+    value, _ = parse_lenient(repair(prompt))
+    return validate(value, schema)
+
+def parse_model_json(text, schema, step, repair=None):
+    """모델 출력 텍스트에서 단계 스키마에 맞는 JSON 추출
+
+    1) 관대한 파서로 파싱 (문법 문제는 호출 없이 복구)
+    2) 스키마 검증/변환
+    3) 그래도 맞지 않으면 깨진 부분(목록 항목 또는 JSON 구간)만 repair(prompt) 로 짧게 다시 요청
+    실패 시 StructuredOutputError
+    """
+    try:
+        value, issues = parse_lenient(text)
+        value, errors = validate(value, schema)
+    except StructuredOutputError as e:
+        value, issues, errors = None, [], [('', str(e))]
+
+    if not errors:
+        outcome = 'repaired_locally' if issues else 'parsed'
+        if issues:
+            logger.info("%s output repaired locally", step, extra={'fields': {'issues': issues}})
+        metrics.structured_output(step, outcome)
+        return value
+
+    logger.warning("%s output does not match schema", step, extra={'fields': {'issues': issues, 'errors': errors[:10]}})
+    if repair is None:
+        metrics.structured_output(step, 'failed')
+        raise StructuredOutputError(f'{step}: {errors[0][0] or "output"} {errors[0][1]}')
+
+    try:
+        broken = _invalid_items(value, schema, errors) if value is not None else None
+        if broken:
+            # 깨진 목록 항목만 다시 요청하고 나머지는 그대로 사용
+            for key, indexes in broken.items():
+                position = {index: i for i, index in enumerate(indexes)}
+                item_errors = [(re.sub(r'^\w+\[(\d+)\]', lambda m: f'{key}[{position[int(m.group(1))]}]', path), message)
+                               for path, message in errors if path.startswith(f'{key}[')]
+                fixed, fixed_errors = _repair({key: [value[key][i] for i in indexes]}, {key: schema[key]}, item_errors, repair)
+                if fixed_errors or len(fixed[key]) != len(indexes):
+                    raise StructuredOutputError(f'{step}: repair did not fix {key}')
+                for index, item in zip(indexes, fixed[key]):
+                    value[key][index] = item
+        else:
+            try:
+                fragment = extract_json_text(text)
+            except StructuredOutputError:
+                fragment = text
+            value, fixed_errors = _repair(fragment, schema, errors, repair)
+            if fixed_errors:
+                raise StructuredOutputError(f'{step}: repair did not fix {fixed_errors[0][0]} {fixed_errors[0][1]}')
+    except StructuredOutputError:
+        metrics.structured_output(step, 'failed')
+        raise
+    except Exception as e:
+        metrics.structured_output(step, 'failed')
+        raise StructuredOutputError(f'{step}: repair failed: {e}') from e
+
+    metrics.structured_output(step, 'repaired_by_model')
+    return value
@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from contact_writer import ContactWriter
+
+class RecordingConnection:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sql, rows):
+        self.rows.extend(row[0] for row in rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def test_add_during_flush_is_not_lost(tmp_path):
+    stored = []
+    writer = ContactWriter(lambda: RecordingConnection(stored), str(tmp_path), flush_size=1000)
+    writer.start = lambda: None  # 백그라운드 기록 스레드 없이 flush 순서를 직접 제어
+    for i in range(3):
+        writer.add(f'c{i}', {'name': 'n'})
+
+    # flush 가 세그먼트를 닫은 직후, 그리고 세그먼트를 읽는 사이에 새 문의가 들어오는 순서를 재현
+    seal = writer._seal
+    def seal_and_add():
+        seal()
+        writer._seal = seal
+        writer.add('after_seal', {'name': 'n'})
+    writer._seal = seal_and_add
+
+    read = writer._read
+    def read_and_add(path):
+        rows = read(path)
+        if any(row[0] == 'after_seal' for row in rows):
+            writer._read = read
+            writer.add('during_read', {'name': 'n'})
+        return rows
+    writer._read = read_and_add
+
+    for _ in range(3):
+        writer.flush()
+    assert sorted(stored) == ['after_seal', 'c0', 'c1', 'c2', 'during_read']
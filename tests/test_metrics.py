@@ -0,0 +1,33 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import MetricsRegistry
+
+def worker_registry(jobs, seconds, busy):
+    registry = MetricsRegistry()
+    registry.inc('clops_jobs_total', {'status': 'completed'}, jobs)
+    registry.observe('clops_span_seconds', seconds, {'kind': 'stage', 'stage': 'step1'})
+    registry.set('clops_job_workers_busy', busy)
+    # 공유 저장소를 거치는 것과 같이 JSON 으로 왕복
+    return json.loads(json.dumps(registry.export()))
+
+def test_merge_sums_counters_and_histograms_across_workers():
+    combined = MetricsRegistry()
+    combined.merge(worker_registry(2, 0.2, 1), {'worker': 101})
+    combined.merge(worker_registry(3, 3.0, 4), {'worker': 102})
+    text = combined.render()
+    assert 'clops_jobs_total{status="completed"} 5' in text
+    assert 'clops_span_seconds_count{kind="stage",stage="step1"} 2' in text
+    assert 'clops_span_seconds_bucket{kind="stage",stage="step1",le="0.25"} 1' in text
+    assert 'clops_job_workers_busy{worker="101"} 1' in text
+    assert 'clops_job_workers_busy{worker="102"} 4' in text
+
+def test_merge_without_gauge_labels_skips_gauges():
+    combined = MetricsRegistry()
+    combined.merge(worker_registry(1, 0.1, 2))
+    text = combined.render()
+    assert 'clops_jobs_total{status="completed"} 1' in text
+    assert 'clops_job_workers_busy' not in text
@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('CLOPS_BACKEND', 'local')
+
+from imsi_new import STEP1_SCHEMA, STEP3_SCHEMA
+from structured_output import extract_json_text, parse_lenient, parse_model_json
+
+def no_repair(prompt):
+    raise AssertionError('repair should not be called for a truncated trailing item')
+
+def test_truncated_step1_drops_incomplete_service():
+    text = '```json\n{"disaster_ready_services": [{"name": "Amazon EC2", "reason": "웹 서버"}, {"name": "Amazon RD'
+    result = parse_model_json(text, STEP1_SCHEMA, 'step1', repair=no_repair)
+    assert result == {'disaster_ready_services': [{'name': 'Amazon EC2', 'reason': '웹 서버'}]}
+
+def test_truncated_step3_drops_incomplete_service():
+    text = ('{"disaster_ready_services": ['
+            '{"name": "Amazon EC2", "type": "t3.medium", "quantity": 2, "reason": "웹 서버"}, '
+            '{"name": "Amazon RDS", "type": "db.t3.micro", "quan')
+    result = parse_model_json(text, STEP3_SCHEMA, 'step3', repair=no_repair)
+    assert result == {'disaster_ready_services': [
+        {'name': 'Amazon EC2', 'type': 't3.medium', 'quantity': 2, 'reason': '웹 서버'}
+    ]}
+
+def test_truncated_nested_values_are_not_kept_as_partials():
+    assert parse_lenient('{"a": [1, 2') == ({'a': [1]}, ['truncated'])
+    assert parse_lenient('{"a": 1, "b": {"x": 1') == ({'a': 1}, ['truncated'])
+    assert parse_lenient('{"a": 1, "b": [{"name": "RD') == ({'a': 1}, ['truncated'])
+    assert parse_lenient('{"a": 1, "b": "tex') == ({'a': 1}, ['truncated'])
+
+def test_truncated_list_without_complete_items_is_repaired():
+    prompts = []
+    def repair(prompt):
+        prompts.append(prompt)
+        return '{"disaster_ready_services": [{"name": "Amazon RDS"}]}'
+
+    result = parse_model_json('{"disaster_ready_services": [{"name": "Amazon RD', STEP1_SCHEMA, 'step1', repair=repair)
+    assert len(prompts) == 1
+    assert result == {'disaster_ready_services': [{'name': 'Amazon RDS', 'reason': ''}]}
+
+def test_json_fence_is_preferred_over_other_fences():
+    text = '설명:\n```text\nsee {below}\n```\n```json\n{"disaster_ready_services": [{"name": "Amazon EC2"}]}\n```'
+    assert extract_json_text(text) == '{"disaster_ready_services": [{"name": "Amazon EC2"}]}\n'
+    result = parse_model_json(text, STEP1_SCHEMA, 'step1', repair=no_repair)
+    assert result == {'disaster_ready_services': [{'name': 'Amazon EC2', 'reason': ''}]}
+
+def test_bare_fence_and_unfenced_json():
+    assert extract_json_text('결과\n```\n{"a": 1}\n```') == '{"a": 1}\n'
+    assert extract_json_text('결과: {"a": 1}') == '{"a": 1}'